@@ -0,0 +1,36 @@
+"""
+Vectorized analytics kernels
+"""
+from .cube import (
+    SalesCube,
+    current_sales_cube,
+    get_sales_cube,
+    init_sales_cube,
+    mark_sales_cube_stale,
+    refresh_sales_cube,
+    team_monthly_series
+)
+from .kpi_batch import batch_kpis, kpi_records, kpi_window, month_range, pivot_monthly, trailing_months
+from .topk import TopK, top_k, top_k_indices
+from .trends import batch_trends, summarize_trends
+
+__all__ = [
+    "SalesCube",
+    "TopK",
+    "batch_kpis",
+    "batch_trends",
+    "current_sales_cube",
+    "get_sales_cube",
+    "init_sales_cube",
+    "kpi_records",
+    "kpi_window",
+    "mark_sales_cube_stale",
+    "month_range",
+    "pivot_monthly",
+    "refresh_sales_cube",
+    "summarize_trends",
+    "team_monthly_series",
+    "top_k",
+    "top_k_indices",
+    "trailing_months"
+]
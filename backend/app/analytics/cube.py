@@ -0,0 +1,455 @@
+"""
+Columnar in-memory sales cube with memory-mapped snapshots
+
+The cube keeps one NumPy array per column of the sales table: dictionary
+encoded rep / client / product ids (int32 codes into per-dimension value
+arrays), integer yyyymm periods and float revenue / quantity / target.
+Filters are vectorized masks and group-bys are a single bincount over the
+combined group codes.
+
+Snapshots are directories of .npy files loaded with mmap_mode="r", so
+workers share the page cache instead of re-querying the database. A
+snapshot records a watermark (highest sales id and latest updated_at);
+refresh() pulls only rows inserted or updated after it. Deletes leave no
+trace in the watermark, so refresh() also compares the row count with the
+table's and drops the rows whose ids are gone when they differ.
+
+When loaded (ANALYTICS_CUBE_ENABLED), the cube serves the team KPI
+endpoint's rep x month (x product) series. Sales change events (see
+graphs.cache_invalidation), deletes included, mark it stale, and the next
+read catches up through refresh() first.
+"""
+import asyncio
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.analytics.topk import top_k_indices
+from backend.app.core.logging import get_logger
+from backend.app.db.models import Product, Sales
+
+logger = get_logger(__name__)
+
+DIMENSIONS = ("rep", "client", "product", "period")
+MEASURES = ("revenue", "quantity", "target")
+
+# Dictionary-encoded dimensions and the dtype of their values
+_ENCODED = {"rep": np.int64, "client": np.int64, "product": np.str_}
+
+_FETCH_BATCH = 100_000
+_SNAPSHOT_VERSION = 1
+
+
+def _empty_columns() -> Dict[str, np.ndarray]:
+    columns = {"id": np.empty(0, dtype=np.int64), "period": np.empty(0, dtype=np.int32)}
+    columns.update({dimension: np.empty(0, dtype=np.int32) for dimension in _ENCODED})
+    columns.update({measure: np.empty(0, dtype=np.float64) for measure in MEASURES})
+    return columns
+
+
+class SalesCube:
+    """
+    Immutable columnar snapshot of the sales table
+    refresh() returns a new cube, so readers holding the old one are unaffected
+    """
+
+    def __init__(
+        self,
+        columns: Dict[str, np.ndarray],
+        dictionaries: Dict[str, np.ndarray],
+        watermark: Optional[Dict[str, Any]] = None
+    ):
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self.watermark = watermark or {"max_id": 0, "updated_at": None}
+        self._codes: Dict[str, Dict[Any, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.columns["id"])
+
+    # Building and refreshing
+
+    @classmethod
+    def empty(cls) -> "SalesCube":
+        return cls(_empty_columns(), {dimension: np.empty(0, dtype=dtype) for dimension, dtype in _ENCODED.items()})
+
+    @classmethod
+    async def build(cls, session: AsyncSession) -> "SalesCube":
+        """Load the whole sales table"""
+        return await cls.empty().refresh(session)
+
+    async def refresh(self, session: AsyncSession) -> "SalesCube":
+        """New cube with the rows inserted or updated after this cube's watermark, without deleted rows"""
+        query = (
+            select(
+                Sales.id, Sales.rep_user_id, Sales.client_id, Product.code, Sales.period,
+                Sales.revenue, Sales.quantity, Sales.target, Sales.updated_at
+            )
+            .join(Product, Product.id == Sales.product_id)
+            .order_by(Sales.id)
+        )
+        if self.watermark["max_id"] or self.watermark["updated_at"]:
+            conditions = [Sales.id > self.watermark["max_id"]]
+            if self.watermark["updated_at"]:
+                # >=: rows updated within the watermark's timestamp tick are re-read and replaced by id
+                conditions.append(Sales.updated_at >= datetime.fromisoformat(self.watermark["updated_at"]))
+            query = query.where(or_(*conditions))
+
+        dictionaries = {dimension: list(values) for dimension, values in self.dictionaries.items()}
+        codes = {dimension: dict(self._code_map(dimension)) for dimension in _ENCODED}
+        batches: List[Dict[str, np.ndarray]] = []
+        max_id = self.watermark["max_id"]
+        updated_at = self.watermark["updated_at"]
+        latest_update = datetime.fromisoformat(updated_at) if updated_at else None
+
+        result = await session.stream(query)
+        async for partition in result.partitions(_FETCH_BATCH):
+            ids, reps, clients, products, periods, revenue, quantity, target, updated = zip(*partition)
+            batch = {
+                "id": np.fromiter(ids, dtype=np.int64, count=len(ids)),
+                "period": np.fromiter(periods, dtype=np.int32, count=len(ids)),
+                "revenue": np.fromiter((float(v or 0) for v in revenue), dtype=np.float64, count=len(ids)),
+                "quantity": np.fromiter((float(v or 0) for v in quantity), dtype=np.float64, count=len(ids)),
+                "target": np.fromiter((float(v or 0) for v in target), dtype=np.float64, count=len(ids))
+            }
+            for dimension, values in (("rep", reps), ("client", clients), ("product", products)):
+                batch[dimension] = self._encode(values, dictionaries[dimension], codes[dimension])
+            batches.append(batch)
+
+            max_id = max(max_id, int(batch["id"].max()))
+            latest = max((u for u in updated if u is not None), default=None)
+            if latest is not None and (latest_update is None or latest > latest_update):
+                latest_update = latest
+
+        if not batches:
+            return await self._drop_deleted(session)
+
+        fetched = {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+        updated_at = latest_update.isoformat() if latest_update else None
+        if max_id == self.watermark["max_id"] and updated_at == self.watermark["updated_at"] and self._contains(fetched):
+            return await self._drop_deleted(session)
+
+        columns = self._merge(fetched)
+        cube = SalesCube(
+            columns,
+            {dimension: np.asarray(values, dtype=_ENCODED[dimension]) for dimension, values in dictionaries.items()},
+            {"max_id": max_id, "updated_at": updated_at}
+        )
+        logger.info("Sales cube refreshed", fetched=len(fetched["id"]), rows=len(cube))
+        return await cube._drop_deleted(session)
+
+    async def _drop_deleted(self, session: AsyncSession) -> "SalesCube":
+        """Cube without the rows deleted from the sales table (an id scan, only when the row counts differ)"""
+        count = await session.scalar(select(func.count()).select_from(Sales))
+        if count == len(self):
+            return self
+
+        ids = []
+        result = await session.stream(select(Sales.id))
+        async for partition in result.partitions(_FETCH_BATCH):
+            ids.append(np.fromiter((row[0] for row in partition), dtype=np.int64, count=len(partition)))
+        present = np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+        keep = np.isin(self.columns["id"], present, assume_unique=True)
+        if keep.all():
+            # Rows inserted since the refresh query; the next refresh picks them up
+            return self
+
+        cube = SalesCube({name: column[keep] for name, column in self.columns.items()}, self.dictionaries, self.watermark)
+        logger.info("Sales cube dropped deleted rows", removed=len(self) - len(cube), rows=len(cube))
+        return cube
+
+    @staticmethod
+    def _encode(values: Sequence[Any], dictionary: List[Any], codes: Dict[Any, int]) -> np.ndarray:
+        out = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(dictionary)
+                dictionary.append(value)
+            out[i] = code
+        return out
+
+    def _contains(self, fetched: Dict[str, np.ndarray]) -> bool:
+        """Whether every fetched row is already in the cube unchanged"""
+        current = self.columns
+        if not len(current["id"]):
+            return False
+
+        position = np.minimum(np.searchsorted(current["id"], fetched["id"]), len(current["id"]) - 1)
+        return all(np.array_equal(current[name][position], fetched[name]) for name in current)
+
+    def _merge(self, fetched: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Replace updated rows in place and append new ones (rows stay sorted by id)"""
+        current = self.columns
+        if not len(current["id"]):
+            return fetched
+
+        position = np.searchsorted(current["id"], fetched["id"])
+        position = np.minimum(position, len(current["id"]) - 1)
+        existing = current["id"][position] == fetched["id"]
+
+        columns = {}
+        for name, column in current.items():
+            merged = np.array(column)  # Copy: snapshots may be read-only memory maps
+            merged[position[existing]] = fetched[name][existing]
+            columns[name] = np.concatenate([merged, fetched[name][~existing]])
+
+        order = np.argsort(columns["id"], kind="stable")
+        if not np.all(order[:-1] < order[1:]):
+            columns = {name: column[order] for name, column in columns.items()}
+        return columns
+
+    # Snapshots
+
+    def save(self, directory: str, keep: int = 2) -> Path:
+        """
+        Write a snapshot and point directory/CURRENT at it
+        Snapshots are written to a fresh subdirectory and published with an
+        atomic rename, so concurrent readers never see a partial snapshot
+        """
+        root = Path(directory)
+        root.mkdir(parents=True, exist_ok=True)
+        name = f"snapshot-{self.watermark['max_id']}-{time.time_ns()}"
+        target = root / name
+        staging = root / f".{name}.tmp"
+        staging.mkdir()
+
+        for column_name, column in self.columns.items():
+            np.save(staging / f"{column_name}.npy", np.ascontiguousarray(column))
+        for dimension, values in self.dictionaries.items():
+            np.save(staging / f"dict_{dimension}.npy", values)
+        (staging / "meta.json").write_text(json.dumps({
+            "version": _SNAPSHOT_VERSION,
+            "rows": len(self),
+            "watermark": self.watermark
+        }))
+        os.replace(staging, target)
+
+        pointer = root / ".CURRENT.tmp"
+        pointer.write_text(name)
+        os.replace(pointer, root / "CURRENT")
+
+        # Keep the newest snapshots; readers may still map older ones
+        snapshots = sorted(p for p in root.glob("snapshot-*") if p.is_dir())
+        snapshots.sort(key=lambda p: int(p.name.rsplit("-", 1)[1]))
+        for old in snapshots[:-keep]:
+            shutil.rmtree(old, ignore_errors=True)
+
+        logger.info("Sales cube snapshot saved", path=str(target), rows=len(self))
+        return target
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> Optional["SalesCube"]:
+        """Open the current snapshot (memory-mapped by default); None if there is none"""
+        root = Path(directory)
+        try:
+            snapshot = root / (root / "CURRENT").read_text().strip()
+            meta = json.loads((snapshot / "meta.json").read_text())
+        except FileNotFoundError:
+            return None
+
+        if meta.get("version") != _SNAPSHOT_VERSION:
+            logger.warning("Ignoring sales cube snapshot with another format version", path=str(snapshot))
+            return None
+
+        mode = "r" if mmap else None
+        columns = {
+            name: np.load(snapshot / f"{name}.npy", mmap_mode=mode)
+            for name in ("id", "period", *_ENCODED, *MEASURES)
+        }
+        dictionaries = {dimension: np.load(snapshot / f"dict_{dimension}.npy") for dimension in _ENCODED}
+        return cls(columns, dictionaries, meta["watermark"])
+
+    # Queries
+
+    def _code_map(self, dimension: str) -> Dict[Any, int]:
+        codes = self._codes.get(dimension)
+        if codes is None:
+            codes = self._codes[dimension] = {value.item(): i for i, value in enumerate(self.dictionaries[dimension])}
+        return codes
+
+    def mask(
+        self,
+        period: Optional[Tuple[str, str]] = None,
+        reps: Optional[Iterable[int]] = None,
+        clients: Optional[Iterable[int]] = None,
+        products: Optional[Iterable[str]] = None
+    ) -> np.ndarray:
+        """Boolean row mask for the given filters (None = no filter)"""
+        selected = np.ones(len(self), dtype=bool)
+        if period is not None:
+            periods = self.columns["period"]
+            selected &= (periods >= int(period[0])) & (periods <= int(period[1]))
+
+        for dimension, values in (("rep", reps), ("client", clients), ("product", products)):
+            if values is None:
+                continue
+            codes = self._code_map(dimension)
+            wanted = [codes[value] for value in values if value in codes]
+            selected &= np.isin(self.columns[dimension], np.asarray(wanted, dtype=np.int32))
+        return selected
+
+    def group_by(
+        self,
+        dimensions: Sequence[str],
+        mask: Optional[np.ndarray] = None,
+        measures: Sequence[str] = MEASURES
+    ) -> Dict[str, np.ndarray]:
+        """
+        Sum measures per distinct combination of dimensions among masked rows
+        Returns decoded dimension value arrays and one array per measure
+        """
+        for dimension in dimensions:
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Unknown cube dimension: {dimension}")
+
+        index = np.flatnonzero(mask) if mask is not None else np.arange(len(self))
+        if not dimensions:
+            return {measure: np.array([self.columns[measure][index].sum()]) for measure in measures}
+
+        keys = []
+        for dimension in dimensions:
+            column = self.columns[dimension][index]
+            if dimension == "period":
+                # Periods are not dictionary encoded; compact them for the combined key
+                values, column = np.unique(column, return_inverse=True)
+                keys.append((values, column))
+            else:
+                keys.append((self.dictionaries[dimension], column))
+
+        combined = np.ravel_multi_index(
+            [codes for _, codes in keys],
+            [max(len(values), 1) for values, _ in keys]
+        ) if index.size else np.empty(0, dtype=np.int64)
+        groups, inverse = np.unique(combined, return_inverse=True)
+        group_codes = np.unravel_index(groups, [max(len(values), 1) for values, _ in keys])
+
+        result = {
+            dimension: values[codes]
+            for dimension, (values, _), codes in zip(dimensions, keys, group_codes)
+        }
+        for measure in measures:
+            result[measure] = np.bincount(inverse, weights=self.columns[measure][index], minlength=len(groups))
+        return result
+
+    def aggregate(
+        self,
+        group_by: Sequence[str],
+        period: Optional[Tuple[str, str]] = None,
+        reps: Optional[Iterable[int]] = None,
+        clients: Optional[Iterable[int]] = None,
+        products: Optional[Iterable[str]] = None,
+        order_by: str = "revenue",
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Filter, group and sort in one call; returns row dicts"""
+        grouped = self.group_by(group_by, self.mask(period, reps, clients, products))
+        values = grouped[order_by]
+        order = top_k_indices(values, limit if limit is not None else len(values))
+
+        rows = []
+        for i in order:
+            row = {dimension: grouped[dimension][i].item() for dimension in group_by}
+            if "period" in row:
+                row["period"] = f"{row['period']:06d}"
+            row.update({measure: float(grouped[measure][i]) for measure in MEASURES})
+            rows.append(row)
+        return rows
+
+
+def team_monthly_series(
+    cube: SalesCube,
+    start: str,
+    end: str,
+    rep_user_ids: Optional[Sequence[int]] = None,
+    by_product: bool = False
+) -> List[Tuple[Any, str, float, float]]:
+    """
+    (key, yyyymm, revenue, target) rows, where key is the rep id, or (rep
+    id, product code) when by_product is set; same rows as
+    db.analytics.team_monthly_sales, from one mask and one group-by
+    """
+    dimensions = ("rep", "product", "period") if by_product else ("rep", "period")
+    grouped = cube.group_by(dimensions, cube.mask((start, end), reps=rep_user_ids or None), ("revenue", "target"))
+    reps = grouped["rep"].tolist()
+    keys = list(zip(reps, grouped["product"].tolist())) if by_product else reps
+    return list(zip(
+        keys,
+        (f"{period:06d}" for period in grouped["period"].tolist()),
+        np.round(grouped["revenue"], 2).tolist(),
+        np.round(grouped["target"], 2).tolist()
+    ))
+
+
+# Process-wide cube
+_sales_cube: Optional[SalesCube] = None
+# Set by sales change events, cleared when a refresh starts
+_stale = False
+_refresh_lock = asyncio.Lock()
+
+
+def get_sales_cube() -> Optional[SalesCube]:
+    """Get the process-wide sales cube (None until init_sales_cube ran)"""
+    return _sales_cube
+
+
+async def init_sales_cube(session: AsyncSession, directory: str) -> SalesCube:
+    """
+    Open the latest snapshot (or build one), catch up on newer rows and
+    publish a new snapshot if anything changed
+    """
+    global _sales_cube
+
+    cube = SalesCube.load(directory)
+    if cube is None:
+        cube = await SalesCube.build(session)
+        cube.save(directory)
+    else:
+        refreshed = await cube.refresh(session)
+        if refreshed is not cube:
+            refreshed.save(directory)
+        cube = refreshed
+
+    _sales_cube = cube
+    return cube
+
+
+async def refresh_sales_cube(session: AsyncSession, directory: Optional[str] = None) -> Optional[SalesCube]:
+    """Catch the process-wide cube up with the sales table, saving a snapshot to directory if it changed"""
+    global _sales_cube, _stale
+
+    if _sales_cube is None:
+        return None
+
+    async with _refresh_lock:
+        _stale = False
+        refreshed = await _sales_cube.refresh(session)
+        if refreshed is not _sales_cube and directory:
+            refreshed.save(directory)
+        _sales_cube = refreshed
+    return refreshed
+
+
+def mark_sales_cube_stale(events: Sequence[Dict[str, Any]]) -> int:
+    """Node cache invalidation observer: sales change events make the next read refresh the cube"""
+    global _stale
+
+    changed = sum(1 for event in events if event.get("source") == "sales")
+    if changed and _sales_cube is not None:
+        _stale = True
+    return changed
+
+
+async def current_sales_cube(session: AsyncSession) -> Optional[SalesCube]:
+    """The process-wide cube caught up with pending sales changes, None when it is not loaded"""
+    if _sales_cube is not None and _stale:
+        return await refresh_sales_cube(session)
+    return _sales_cube
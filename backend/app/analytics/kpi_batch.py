@@ -0,0 +1,194 @@
+"""
+Vectorized KPI computation over entity x month matrices
+
+Rows are entities (reps, or rep x product pairs), columns are consecutive
+months. Window sums come from one cumulative sum per matrix, so every KPI
+costs O(rows) after a single O(rows x months) pass.
+"""
+from typing import Any, Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+# Thresholds used by calculate_kpi_node for its status and recommendations
+ON_TRACK_THRESHOLD = 90.0
+LOW_ACHIEVEMENT_THRESHOLD = 80.0
+LOW_GROWTH_THRESHOLD = 10.0
+
+
+def month_range(start: str, end: str) -> List[str]:
+    """Consecutive yyyymm strings from start to end inclusive"""
+    year, month = int(start[:4]), int(start[4:6])
+    end_year, end_month = int(end[:4]), int(end[4:6])
+    months = []
+    while (year, month) <= (end_year, end_month):
+        months.append(f"{year:04d}{month:02d}")
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return months
+
+
+def trailing_months(end: str, count: int) -> List[str]:
+    """The count consecutive yyyymm strings ending at end"""
+    last = _month_number(end)
+    return [f"{number // 12:04d}{number % 12 + 1:02d}" for number in range(last - count + 1, last + 1)]
+
+
+def _month_number(yyyymm: str) -> int:
+    return int(yyyymm[:4]) * 12 + int(yyyymm[4:6]) - 1
+
+
+def pivot_monthly(
+    rows: Sequence[Tuple[Hashable, str, float, float]],
+    months: Sequence[str]
+) -> Tuple[List[Hashable], np.ndarray, np.ndarray]:
+    """
+    Build revenue and target matrices from (key, yyyymm, revenue, target) rows
+    Months outside the given range are ignored; missing cells are zero
+    """
+    keys: List[Hashable] = []
+    row_index: Dict[Hashable, int] = {}
+    column_index = {month: i for i, month in enumerate(months)}
+
+    rows_idx, cols_idx, revenue_values, target_values = [], [], [], []
+    for key, yyyymm, revenue, target in rows:
+        column = column_index.get(yyyymm)
+        if column is None:
+            continue
+        row = row_index.get(key)
+        if row is None:
+            row = row_index[key] = len(keys)
+            keys.append(key)
+        rows_idx.append(row)
+        cols_idx.append(column)
+        revenue_values.append(float(revenue or 0))
+        target_values.append(float(target or 0))
+
+    revenue = np.zeros((len(keys), len(months)))
+    target = np.zeros((len(keys), len(months)))
+    # add.at accumulates duplicate (key, month) rows
+    np.add.at(revenue, (rows_idx, cols_idx), revenue_values)
+    np.add.at(target, (rows_idx, cols_idx), target_values)
+    return keys, revenue, target
+
+
+def _window(cumulative: np.ndarray, first: int, last: int) -> np.ndarray:
+    """Row sums over columns first..last (clamped to the matrix)"""
+    months = cumulative.shape[1] - 1
+    first, last = max(first, 0), min(last, months - 1)
+    if last < first:
+        return np.zeros(cumulative.shape[0])
+    return cumulative[:, last + 1] - cumulative[:, first]
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray, scale: float = 100.0) -> np.ndarray:
+    """numerator / denominator * scale, NaN where the denominator is zero"""
+    out = np.full(numerator.shape, np.nan)
+    np.divide(numerator * scale, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def batch_kpis(
+    revenue: np.ndarray,
+    target: np.ndarray,
+    months: Sequence[str],
+    period: Dict[str, str]
+) -> Dict[str, np.ndarray]:
+    """
+    YoY growth, YTD achievement, target achievement, quarterly revenue and
+    status flags for every row at once
+
+    months labels the matrix columns and must be consecutive; the matrices
+    should start early enough to cover the previous-year window and January
+    of the period's end year (earlier months count as zero).
+    Ratios are NaN where their denominator is zero.
+    """
+    if revenue.shape != target.shape or revenue.shape[1] != len(months):
+        raise ValueError("revenue, target and months must describe the same matrix")
+    if months and _month_number(months[-1]) - _month_number(months[0]) != len(months) - 1:
+        raise ValueError("months must be consecutive")
+
+    base = _month_number(months[0]) if months else 0
+    start = _month_number(period["start"]) - base
+    end = _month_number(period["end"]) - base
+    ytd_start = _month_number(f"{period['end'][:4]}01") - base
+
+    zeros = np.zeros((revenue.shape[0], 1))
+    revenue_cumulative = np.hstack([zeros, np.cumsum(revenue, axis=1)])
+    target_cumulative = np.hstack([zeros, np.cumsum(target, axis=1)])
+
+    current = _window(revenue_cumulative, start, end)
+    current_target = _window(target_cumulative, start, end)
+    previous = _window(revenue_cumulative, start - 12, end - 12)
+    ytd_revenue = _window(revenue_cumulative, ytd_start, end)
+    ytd_target = _window(target_cumulative, ytd_start, end)
+
+    quarterly = np.stack([
+        _window(revenue_cumulative, ytd_start + quarter * 3, ytd_start + quarter * 3 + 2)
+        for quarter in range(4)
+    ], axis=1)
+
+    yoy_growth = _ratio(current - previous, previous)
+    ytd_achievement = _ratio(ytd_revenue, ytd_target)
+    target_achievement_rate = _ratio(current, current_target)
+
+    # NaN compares False, so rows without targets/history are never on track
+    on_track = target_achievement_rate >= ON_TRACK_THRESHOLD
+    growing = yoy_growth > 0
+    needs_attention = ~(target_achievement_rate >= LOW_ACHIEVEMENT_THRESHOLD) | ~(yoy_growth >= LOW_GROWTH_THRESHOLD)
+
+    return {
+        "current_revenue": current,
+        "current_target": current_target,
+        "previous_year_revenue": previous,
+        "ytd_revenue": ytd_revenue,
+        "ytd_target": ytd_target,
+        "monthly_avg": current / max(end - start + 1, 1),
+        "quarterly_performance": quarterly,
+        "yoy_growth": yoy_growth,
+        "ytd_achievement": ytd_achievement,
+        "target_achievement_rate": target_achievement_rate,
+        "on_track": on_track,
+        "growing": growing,
+        "needs_attention": needs_attention
+    }
+
+
+def _number(value: float) -> Any:
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def kpi_records(keys: Sequence[Hashable], kpis: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Per-row result dicts (NaN ratios become None)"""
+    records = []
+    for i, key in enumerate(keys):
+        records.append({
+            "key": key,
+            "yoy_growth": _number(kpis["yoy_growth"][i]),
+            "ytd_achievement": _number(kpis["ytd_achievement"][i]),
+            "target_achievement_rate": _number(kpis["target_achievement_rate"][i]),
+            "metrics": {
+                "current_revenue": float(kpis["current_revenue"][i]),
+                "previous_year_revenue": float(kpis["previous_year_revenue"][i]),
+                "ytd_revenue": float(kpis["ytd_revenue"][i]),
+                "ytd_target": float(kpis["ytd_target"][i]),
+                "monthly_avg": float(kpis["monthly_avg"][i]),
+                "quarterly_performance": {
+                    f"Q{quarter + 1}": float(kpis["quarterly_performance"][i, quarter])
+                    for quarter in range(4)
+                }
+            },
+            "status": {
+                "performance_status": "on_track" if kpis["on_track"][i] else "below_target",
+                "growth_status": "positive" if kpis["growing"][i] else "negative",
+                "needs_attention": bool(kpis["needs_attention"][i])
+            }
+        })
+    return records
+
+
+def kpi_window(period: Dict[str, str]) -> Tuple[str, str]:
+    """First and last month a KPI matrix for the period has to cover"""
+    start, end = period["start"], period["end"]
+    previous_start = f"{int(start[:4]) - 1:04d}{start[4:6]}"
+    return min(previous_start, f"{end[:4]}01"), end
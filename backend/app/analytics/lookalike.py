@@ -0,0 +1,402 @@
+"""
+Lookalike client search over an in-process nearest-neighbour index
+
+Every client is a vector of feature blocks:
+    products - revenue share per product over the trailing window (unit length)
+    type     - one-hot client type
+    tier     - tier value (see analytics.scoring.TIER_VALUES)
+    visits   - visit cadence, log-scaled visits per month over the window
+Each block is scaled by the square root of its LOOKALIKE_WEIGHTS weight,
+so a squared Euclidean distance is the weighted sum of the per-block
+distances and at most the total weight; similarity is 1 - distance / total.
+
+Queries are exact: distances to every row come from
+|q|^2 + |x|^2 - 2 q.x, computed as one matrix product per block of index
+rows, and each block keeps only its k best rows per query (argpartition)
+before the blocks are merged. Memory per query batch stays at
+queries x _BLOCK_ROWS.
+
+All features of a row depend on that client alone, so sales, client and
+visit change events (see graphs.cache_invalidation) only mark clients
+dirty; the next lookup re-reads and replaces those rows. Too many dirty
+clients, a new product or client type, an event without a client or an
+expired TTL trigger a full rebuild instead.
+"""
+import asyncio
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import Float, func, or_, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.analytics.kpi_batch import trailing_months
+from backend.app.analytics.partials import lookup_by_id
+from backend.app.analytics.scoring import TIER_VALUES
+from backend.app.core.config import settings
+from backend.app.core.logging import get_logger
+from backend.app.db.analytics import period_key
+from backend.app.db.models import Client, Product, Sales, Visit
+
+logger = get_logger(__name__)
+
+FEATURE_BLOCKS = ("products", "type", "tier", "visits")
+
+# Index rows per matrix product in a query
+_BLOCK_ROWS = 16_384
+# Ids per IN query when reloading dirty clients
+_CLIENT_CHUNK = 10_000
+# Visits per month scoring the full cadence feature
+_CADENCE_CAP = 8.0
+
+
+def _month_start(yyyymm: str) -> date:
+    return date(int(yyyymm[:4]), int(yyyymm[4:6]), 1)
+
+
+def _next_month_start(yyyymm: str) -> date:
+    year, month = int(yyyymm[:4]), int(yyyymm[4:6])
+    return date(year + month // 12, month % 12 + 1, 1)
+
+
+async def _load_clients(session: AsyncSession, months: Sequence[str], client_ids: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+    """
+    Clients (all, or the given ids) with their window sales per product
+    and visit counts, as arrays
+    """
+    client_ids = None if client_ids is None else sorted(client_ids)
+    chunks = [None] if client_ids is None else [
+        client_ids[start:start + _CLIENT_CHUNK] for start in range(0, len(client_ids), _CLIENT_CHUNK)
+    ]
+    first, last = period_key(months[0]), period_key(months[-1])
+    clients, cells, visits = [], [], []
+    for chunk in chunks:
+        # Chunks are in id order, so ordering each one keeps the rows sorted
+        clients_query = select(Client.id, Client.owner_user_id, Client.type, Client.tier).order_by(Client.id)
+        sales_query = (
+            select(Sales.client_id, Sales.product_id, type_coerce(func.sum(Sales.revenue), Float))
+            .where(Sales.period.between(first, last))
+            .group_by(Sales.client_id, Sales.product_id)
+        )
+        visits_query = (
+            select(Visit.client_id, func.count())
+            .where(Visit.visit_date >= _month_start(months[0]), Visit.visit_date < _next_month_start(months[-1]))
+            .where(or_(Visit.status.is_(None), Visit.status != "cancelled"))
+            .group_by(Visit.client_id)
+        )
+        if chunk is not None:
+            clients_query = clients_query.where(Client.id.in_(chunk))
+            sales_query = sales_query.where(Sales.client_id.in_(chunk))
+            visits_query = visits_query.where(Visit.client_id.in_(chunk))
+        clients.extend((await session.execute(clients_query)).all())
+        cells.extend((await session.execute(sales_query)).all())
+        visits.extend((await session.execute(visits_query)).all())
+
+    ids, owners, types, tiers = zip(*clients) if clients else ((), (), (), ())
+    cell_clients, cell_products, cell_revenue = zip(*cells) if cells else ((), (), ())
+    visit_clients, visit_counts = zip(*visits) if visits else ((), ())
+    return {
+        "client_id": np.fromiter(ids, dtype=np.int64, count=len(ids)),
+        "owner": np.fromiter((-1 if o is None else o for o in owners), dtype=np.int64, count=len(ids)),
+        "type": list(types),
+        "tier": np.fromiter((TIER_VALUES.get(tier, 0.0) for tier in tiers), dtype=np.float64, count=len(ids)),
+        "cell_client": np.fromiter(cell_clients, dtype=np.int64, count=len(cells)),
+        "cell_product": np.fromiter(cell_products, dtype=np.int64, count=len(cells)),
+        "cell_revenue": np.fromiter((v or 0 for v in cell_revenue), dtype=np.float64, count=len(cells)),
+        "visit_client": np.fromiter(visit_clients, dtype=np.int64, count=len(visits)),
+        "visit_count": np.fromiter(visit_counts, dtype=np.float64, count=len(visits))
+    }
+
+
+def _positions(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Positions of ids in sorted_ids, -1 for ids not in it"""
+    if not len(sorted_ids):
+        return np.full(len(ids), -1, dtype=np.int64)
+    positions = np.searchsorted(sorted_ids, ids).clip(max=len(sorted_ids) - 1)
+    return np.where(sorted_ids[positions] == ids, positions, -1)
+
+
+def client_vectors(
+    data: Dict[str, Any],
+    months: int,
+    product_ids: np.ndarray,
+    types: List[Optional[str]],
+    weights: Optional[Dict[str, float]] = None
+) -> np.ndarray:
+    """Clients x features matrix (float32) of loaded client data; products and types outside the vocabularies are ignored"""
+    weights = weights or settings.LOOKALIKE_WEIGHTS
+    scale = {block: np.sqrt(max(weights.get(block, 0.0), 0.0)) for block in FEATURE_BLOCKS}
+    count, products = len(data["client_id"]), len(product_ids)
+    vectors = np.zeros((count, products + len(types) + 2), dtype=np.float32)
+
+    rows = _positions(data["client_id"], data["cell_client"])
+    columns = _positions(product_ids, data["cell_product"])
+    known = (rows >= 0) & (columns >= 0)
+    rows, columns = rows[known], columns[known]
+    revenue = np.clip(data["cell_revenue"][known], 0, None)
+    # Unit-length product mix; two mixes are at most sqrt(2) apart, hence the 1/sqrt(2)
+    norms = np.sqrt(np.bincount(rows, weights=revenue ** 2, minlength=count))
+    vectors[rows, columns] = revenue / np.where(norms > 0, norms, 1)[rows] * (scale["products"] / np.sqrt(2))
+
+    type_codes = {client_type: i for i, client_type in enumerate(types)}
+    type_of = np.fromiter((type_codes.get(t, -1) for t in data["type"]), dtype=np.int64, count=count)
+    typed = np.flatnonzero(type_of >= 0)
+    vectors[typed, products + type_of[typed]] = scale["type"] / np.sqrt(2)
+
+    vectors[:, products + len(types)] = data["tier"] * scale["tier"]
+
+    cadence = np.zeros(count)
+    visited = _positions(data["client_id"], data["visit_client"])
+    cadence[visited[visited >= 0]] = data["visit_count"][visited >= 0] / max(months, 1)
+    vectors[:, products + len(types) + 1] = np.minimum(np.log1p(cadence) / np.log1p(_CADENCE_CAP), 1) * scale["visits"]
+    return vectors
+
+
+class LookalikeIndex:
+    """
+    Client feature vectors with their squared norms, rows sorted by client id
+    Immutable: refresh() returns a new index
+    """
+
+    def __init__(
+        self,
+        client_ids: np.ndarray,
+        owner: np.ndarray,
+        vectors: np.ndarray,
+        months: List[str],
+        product_ids: np.ndarray,
+        types: List[Optional[str]],
+        weight: float
+    ):
+        self.client_ids = client_ids
+        self.owner = owner
+        self.vectors = vectors
+        self.sq_norms = np.einsum("ij,ij->i", vectors, vectors)
+        self.months = months  # Window the features cover
+        self.product_ids = product_ids  # Product block columns
+        self.types = types  # Type block columns
+        self.weight = weight  # Total feature weight (the largest possible distance)
+        self.built_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.client_ids)
+
+    @classmethod
+    async def build(cls, session: AsyncSession, months: Optional[List[str]] = None) -> "LookalikeIndex":
+        """Index of every client over the trailing LOOKALIKE_MONTHS up to the latest month with sales"""
+        if months is None:
+            latest = await session.scalar(select(func.max(Sales.period)))
+            end = f"{latest:06d}" if latest else date.today().strftime("%Y%m")
+            months = trailing_months(end, settings.LOOKALIKE_MONTHS)
+
+        data = await _load_clients(session, months)
+        product_ids = np.asarray((await session.execute(select(Product.id).order_by(Product.id))).scalars().all(), dtype=np.int64)
+        types = sorted(set(data["type"]), key=lambda t: (t is None, t or ""))
+        return cls._from_data(data, months, product_ids, types)
+
+    @classmethod
+    def _from_data(cls, data: Dict[str, Any], months: List[str], product_ids: np.ndarray, types: List[Optional[str]]) -> "LookalikeIndex":
+        weights = settings.LOOKALIKE_WEIGHTS
+        total = sum(max(weights.get(block, 0.0), 0.0) for block in FEATURE_BLOCKS)
+        if total <= 0:
+            raise ValueError("Lookalike feature weights must add up to a positive value")
+        vectors = client_vectors(data, len(months), product_ids, types, weights)
+        return cls(data["client_id"], data["owner"], vectors, months, product_ids, types, total)
+
+    async def refresh(self, session: AsyncSession, client_ids: Set[int]) -> Optional["LookalikeIndex"]:
+        """
+        New index with the given clients' rows reloaded (deleted clients
+        dropped, new ones added); None when they need a full rebuild
+        (a product or client type the index has no column for)
+        """
+        ids = sorted(client_ids)
+        data = await _load_clients(session, self.months, ids)
+        if (
+            not np.isin(data["cell_product"], self.product_ids).all()
+            or not set(data["type"]) <= set(self.types)
+        ):
+            return None
+
+        vectors = client_vectors(data, len(self.months), self.product_ids, self.types)
+        keep = ~np.isin(self.client_ids, np.asarray(ids, dtype=np.int64))
+        client_ids = np.concatenate([self.client_ids[keep], data["client_id"]])
+        order = np.argsort(client_ids, kind="stable")
+        index = LookalikeIndex(
+            client_ids[order],
+            np.concatenate([self.owner[keep], data["owner"]])[order],
+            np.concatenate([self.vectors[keep], vectors])[order],
+            self.months, self.product_ids, self.types, self.weight
+        )
+        index.built_at = self.built_at
+        return index
+
+    def rows(self, client_ids: Sequence[int]) -> np.ndarray:
+        """Row of each client id, -1 for clients not in the index"""
+        return _positions(self.client_ids, np.asarray(client_ids, dtype=np.int64))
+
+    def query(
+        self,
+        rows: np.ndarray,
+        k: int,
+        candidates: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        For each query row, the rows of its k nearest other clients (nearest
+        first, ties by client id; -1 where fewer candidates exist) and their
+        similarities; candidates optionally masks the rows that may be returned
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        queries = self.vectors[rows]
+        query_norms = self.sq_norms[rows]
+        best_distance = np.empty((len(rows), 0), dtype=np.float32)
+        best_row = np.empty((len(rows), 0), dtype=np.int64)
+
+        for start in range(0, len(self), _BLOCK_ROWS):
+            stop = min(start + _BLOCK_ROWS, len(self))
+            distance = query_norms[:, None] + self.sq_norms[None, start:stop] - 2 * (queries @ self.vectors[start:stop].T)
+            inside = np.flatnonzero((rows >= start) & (rows < stop))
+            distance[inside, rows[inside] - start] = np.inf
+            if candidates is not None:
+                distance[:, ~candidates[start:stop]] = np.inf
+
+            keep = min(k, stop - start)
+            if keep <= 0:
+                continue
+            part = np.argpartition(distance, keep - 1, axis=1)[:, :keep] if keep < stop - start else np.broadcast_to(np.arange(stop - start), distance.shape)
+            best_distance = np.concatenate([best_distance, np.take_along_axis(distance, part, axis=1)], axis=1)
+            best_row = np.concatenate([best_row, part + start], axis=1)
+            if best_distance.shape[1] > k:
+                part = np.argpartition(best_distance, k - 1, axis=1)[:, :k]
+                best_distance = np.take_along_axis(best_distance, part, axis=1)
+                best_row = np.take_along_axis(best_row, part, axis=1)
+
+        order = np.lexsort((self.client_ids[best_row], best_distance), axis=1)
+        best_distance = np.take_along_axis(best_distance, order, axis=1)
+        best_row = np.where(np.isfinite(best_distance), np.take_along_axis(best_row, order, axis=1), -1)
+        similarity = np.where(best_row >= 0, 1 - np.clip(best_distance, 0, None) / self.weight, np.nan)
+        return best_row, similarity
+
+
+class LookalikeIndexCache:
+    """
+    The process-wide lookalike index with its pending dirty clients;
+    lookups apply them incrementally or rebuild the index
+    """
+
+    def __init__(self, ttl: float, max_incremental: float):
+        self.ttl = ttl
+        self.max_incremental = max_incremental  # Share of the clients refreshed in place
+        self._index: Optional[LookalikeIndex] = None
+        self._dirty: Set[int] = set()
+        self._stale = False
+        self._lock = threading.Lock()
+        self._refresh_lock = asyncio.Lock()
+
+        # Counters
+        self.builds = 0
+        self.refreshes = 0
+
+    def invalidate(self, events: Sequence[Dict[str, Any]]) -> int:
+        """Mark the clients of sales, client and visit change events (node cache events) dirty"""
+        marked = 0
+        with self._lock:
+            months = set(self._index.months) if self._index is not None else None
+            for event in events:
+                source, client, period = event.get("source"), event.get("client"), event.get("period")
+                if source not in ("sales", "clients", "visits"):
+                    continue
+                if source == "sales" and months is not None and period is not None and str(period) not in months:
+                    continue
+                if client is None:
+                    self._stale = True
+                else:
+                    self._dirty.add(client)
+                marked += 1
+        return marked
+
+    async def get(self, session: AsyncSession) -> LookalikeIndex:
+        """The current index, with pending changes applied"""
+        async with self._refresh_lock:
+            with self._lock:
+                index, dirty, stale = self._index, self._dirty, self._stale
+                self._dirty, self._stale = set(), False
+
+            started = time.perf_counter()
+            if index is not None and not stale and index.built_at + self.ttl > time.monotonic():
+                if not dirty:
+                    return index
+                if len(dirty) <= self.max_incremental * len(index):
+                    refreshed = await index.refresh(session, dirty)
+                    if refreshed is not None:
+                        self._index = refreshed
+                        self.refreshes += 1
+                        logger.debug("Lookalike index refreshed", clients=len(dirty), seconds=round(time.perf_counter() - started, 3))
+                        return refreshed
+
+            index = await LookalikeIndex.build(session)
+            self._index = index
+            self.builds += 1
+            logger.info("Lookalike index built", clients=len(index), dimensions=index.vectors.shape[1], seconds=round(time.perf_counter() - started, 3))
+            return index
+
+    def clear(self) -> None:
+        with self._lock:
+            self._index = None
+            self._dirty = set()
+            self._stale = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self._index) if self._index is not None else 0,
+            "dirty": len(self._dirty),
+            "builds": self.builds,
+            "refreshes": self.refreshes
+        }
+
+
+# Process-wide lookalike index
+_lookalike_cache = LookalikeIndexCache(settings.LOOKALIKE_INDEX_TTL, settings.LOOKALIKE_MAX_INCREMENTAL)
+
+
+def get_lookalike_cache() -> LookalikeIndexCache:
+    """Get the process-wide lookalike index cache"""
+    return _lookalike_cache
+
+
+async def find_lookalikes(
+    session: AsyncSession,
+    client_ids: Sequence[int],
+    k: Optional[int] = None,
+    owner_user_id: Optional[int] = None
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    The k clients most similar to each given client (optionally only
+    clients owned by owner_user_id), most similar first; clients missing
+    from the index are left out
+    """
+    k = k or settings.LOOKALIKE_TOP_K
+    index = await _lookalike_cache.get(session)
+    rows = index.rows(client_ids)
+    found = rows >= 0
+    if not found.any():
+        return {}
+
+    candidates = index.owner == owner_user_id if owner_user_id is not None else None
+    neighbours, similarity = index.query(rows[found], k, candidates)
+    names = await lookup_by_id(session, Client.id, (Client.name,), index.client_ids[neighbours[neighbours >= 0]])
+
+    results = {}
+    for client_id, row_neighbours, row_similarity in zip(np.asarray(client_ids)[found].tolist(), neighbours, similarity):
+        results[client_id] = [
+            {
+                "client_id": int(index.client_ids[row]),
+                "name": names.get(int(index.client_ids[row]), (None,))[0],
+                "owner_user_id": int(index.owner[row]) if index.owner[row] >= 0 else None,
+                "similarity": round(float(value), 4)
+            }
+            for row, value in zip(row_neighbours.tolist(), row_similarity.tolist())
+            if row >= 0
+        ]
+    return results
@@ -0,0 +1,494 @@
+"""
+Per-(rep, month) partial aggregates for period-range analytics
+
+A partial is one month of one rep's sales as client x product cells
+(revenue, quantity, target arrays). Every window the analytics nodes read
+(the requested period, the same window a year earlier, the trailing trend
+window, January to date) is assembled from its months: cached months are
+reused and only the missing ones are read from sales_monthly_rollup, which
+already holds these cells, all in one query. A cold read costs the cells
+of the months, not the sales rows behind them.
+Overlapping requests (202401-202412, then 202401-202411, then
+202402-202412) therefore only go to the database for months not seen yet.
+
+Partials are kept unfiltered, so requests narrowed to some clients or
+products reuse them too. They are dropped by the node cache's data change
+events (see graphs.cache_invalidation), after a TTL as a safety net, and
+least recently used first once the cached cells exceed the budget.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Float, func, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.analytics.kpi_batch import month_range, trailing_months
+from backend.app.analytics.topk import top_k_indices
+from backend.app.core.config import settings
+from backend.app.core.logging import get_logger
+from backend.app.db.analytics import compute_kpis, money, period_key, previous_year
+from backend.app.db.models import Client, Product, SalesMonthlyRollup
+
+logger = get_logger(__name__)
+
+PartialKey = Tuple[Optional[int], str]  # (rep user id or None for all reps, yyyymm)
+
+_FETCH_BATCH = 100_000
+# Ids per IN query when looking up names (SQLite allows 32766 bound parameters)
+_LOOKUP_CHUNK = 10_000
+
+
+class MonthlyPartial:
+    """One month of sales as client x product cells"""
+
+    __slots__ = ("client", "product", "revenue", "quantity", "target")
+
+    def __init__(
+        self,
+        client: np.ndarray,
+        product: np.ndarray,
+        revenue: np.ndarray,
+        quantity: np.ndarray,
+        target: np.ndarray
+    ):
+        self.client = client
+        self.product = product
+        self.revenue = revenue
+        self.quantity = quantity
+        self.target = target
+
+    @classmethod
+    def empty(cls) -> "MonthlyPartial":
+        ids, values = np.empty(0, dtype=np.int64), np.empty(0)
+        return cls(ids, ids, values, values, values)
+
+    def __len__(self) -> int:
+        return len(self.client)
+
+
+class PartialCache:
+    """
+    LRU cache of monthly partials bounded by the number of cells held,
+    with a TTL per entry and hit/miss/eviction counters
+    """
+
+    def __init__(self, max_cells: int, ttl: float):
+        self.max_cells = max_cells
+        self.ttl = ttl
+        self._entries: "OrderedDict[PartialKey, Tuple[float, MonthlyPartial]]" = OrderedDict()
+        self._cells = 0
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: PartialKey) -> Optional[MonthlyPartial]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: PartialKey, partial: MonthlyPartial) -> None:
+        # An empty month still costs an entry
+        cells = max(len(partial), 1)
+        if cells > self.max_cells:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, partial)
+            self._cells += cells
+            while self._cells > self.max_cells:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: PartialKey) -> None:
+        _, partial = self._entries.pop(key)
+        self._cells -= max(len(partial), 1)
+
+    def invalidate(self, events: Sequence[Dict[str, Any]]) -> int:
+        """
+        Drop the months touched by sales change events (node cache events);
+        an event without a rep or period matches every rep or month, and
+        all-rep partials are dropped for any rep
+        """
+        removed = 0
+        with self._lock:
+            for event in events:
+                if event.get("source") != "sales":
+                    continue
+                rep, period = event.get("rep"), event.get("period")
+                for key in [
+                    key for key in self._entries
+                    if (rep is None or key[0] is None or key[0] == rep) and (period is None or key[1] == str(period))
+                ]:
+                    self._remove(key)
+                    removed += 1
+            self.invalidations += removed
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._cells = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "cells": self._cells,
+            "max_cells": self.max_cells,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# Process-wide partial cache
+_partial_cache = PartialCache(settings.ANALYTICS_PARTIAL_CACHE_CELLS, settings.ANALYTICS_PARTIAL_CACHE_TTL)
+
+
+def get_partial_cache() -> PartialCache:
+    """Get the process-wide monthly partial cache"""
+    return _partial_cache
+
+
+async def load_partials(
+    session: AsyncSession,
+    rep_user_id: Optional[int],
+    months: Sequence[str],
+    cache: Optional[PartialCache] = None
+) -> Dict[str, MonthlyPartial]:
+    """
+    Partials for the given months of a rep (all reps for None): cached
+    months from the cache, the others read from the monthly rollup in one
+    query (a covering idx_rollup_rep_period scan per month for a rep) and
+    cached
+    """
+    cache = cache if cache is not None else _partial_cache
+    partials: Dict[str, MonthlyPartial] = {}
+    missing: List[str] = []
+    for month in dict.fromkeys(months):
+        partial = cache.get((rep_user_id, month))
+        if partial is None:
+            missing.append(month)
+        else:
+            partials[month] = partial
+
+    if not missing:
+        return partials
+
+    rollup = SalesMonthlyRollup
+    periods = [period_key(month) for month in missing]
+    if rep_user_id is not None:
+        # A rep's rollup rows are already one per client x product x month
+        query = (
+            select(
+                rollup.period,
+                rollup.client_id,
+                rollup.product_id,
+                type_coerce(rollup.revenue, Float),
+                type_coerce(rollup.quantity, Float),
+                type_coerce(rollup.target, Float)
+            )
+            .where(rollup.rep_user_id == rep_user_id, rollup.period.in_(periods))
+        )
+    else:
+        query = (
+            select(
+                rollup.period,
+                rollup.client_id,
+                rollup.product_id,
+                type_coerce(func.sum(rollup.revenue), Float),
+                type_coerce(func.sum(rollup.quantity), Float),
+                type_coerce(func.sum(rollup.target), Float)
+            )
+            .where(rollup.period.in_(periods))
+            .group_by(rollup.period, rollup.product_id, rollup.client_id)
+        )
+
+    batches = []
+    result = await session.stream(query)
+    async for partition in result.partitions(_FETCH_BATCH):
+        periods, clients, products, revenue, quantity, target = zip(*partition)
+        count = len(periods)
+        batches.append((
+            np.fromiter(periods, dtype=np.int64, count=count),
+            np.fromiter(clients, dtype=np.int64, count=count),
+            np.fromiter(products, dtype=np.int64, count=count),
+            np.fromiter((v or 0 for v in revenue), dtype=np.float64, count=count),
+            np.fromiter((v or 0 for v in quantity), dtype=np.float64, count=count),
+            np.fromiter((v or 0 for v in target), dtype=np.float64, count=count)
+        ))
+
+    if batches:
+        periods, *columns = (np.concatenate(column) for column in zip(*batches))
+        order = np.argsort(periods, kind="stable")
+        periods = periods[order]
+        columns = [column[order] for column in columns]
+        bounds = np.searchsorted(periods, [period_key(month) for month in missing] + [np.iinfo(np.int64).max])
+    else:
+        columns = None
+
+    for i, month in enumerate(missing):
+        if columns is None:
+            partial = MonthlyPartial.empty()
+        else:
+            # Own copies, so a cached month does not pin the whole fetch
+            partial = MonthlyPartial(*(column[bounds[i]:bounds[i + 1]].copy() for column in columns))
+        cache.set((rep_user_id, month), partial)
+        partials[month] = partial
+
+    logger.debug("Loaded monthly partials", rep_user_id=rep_user_id, cached=len(partials) - len(missing), fetched=len(missing))
+    return partials
+
+
+class PartialFilter:
+    """Client / product restriction applied when partials are assembled"""
+
+    def __init__(self, client_ids: Optional[Sequence[int]] = None, product_ids: Optional[Sequence[int]] = None):
+        self.client_ids = np.asarray(sorted(set(client_ids)), dtype=np.int64) if client_ids else None
+        self.product_ids = np.asarray(sorted(set(product_ids)), dtype=np.int64) if product_ids is not None else None
+
+    @classmethod
+    async def build(
+        cls,
+        session: AsyncSession,
+        product_codes: Optional[Sequence[str]] = None,
+        client_ids: Optional[Sequence[int]] = None
+    ) -> "PartialFilter":
+        product_ids = None
+        if product_codes:
+            result = await session.execute(select(Product.id).where(Product.code.in_(list(product_codes))))
+            product_ids = list(result.scalars())
+        return cls(client_ids, product_ids)
+
+    def mask(self, partial: MonthlyPartial) -> Optional[np.ndarray]:
+        mask = None
+        if self.client_ids is not None:
+            mask = np.isin(partial.client, self.client_ids)
+        if self.product_ids is not None:
+            in_products = np.isin(partial.product, self.product_ids)
+            mask = in_products if mask is None else mask & in_products
+        return mask
+
+
+def stack_partials(
+    partials: Dict[str, MonthlyPartial],
+    months: Sequence[str],
+    cell_filter: Optional[PartialFilter] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Cells of the given months as one set of columns, plus "month": the
+    position of each cell's month in months
+    """
+    parts = []
+    for i, month in enumerate(months):
+        partial = partials.get(month)
+        if partial is None or not len(partial):
+            continue
+        mask = cell_filter.mask(partial) if cell_filter is not None else None
+        columns = {name: getattr(partial, name) for name in MonthlyPartial.__slots__}
+        if mask is not None:
+            columns = {name: values[mask] for name, values in columns.items()}
+        columns["month"] = np.full(len(columns["client"]), i, dtype=np.int64)
+        parts.append(columns)
+
+    if not parts:
+        empty = MonthlyPartial.empty()
+        return {**{name: getattr(empty, name) for name in MonthlyPartial.__slots__}, "month": np.empty(0, dtype=np.int64)}
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def _growth(current: float, previous: float) -> Optional[float]:
+    if not previous:
+        return None
+    return round((current - previous) / previous, 4)
+
+
+async def lookup_by_id(session: AsyncSession, key_column: Any, value_columns: Sequence[Any], ids: Sequence[int]) -> Dict[int, Tuple[Any, ...]]:
+    """Values of some columns per id, in chunked IN queries"""
+    values: Dict[int, Tuple[Any, ...]] = {}
+    ids = sorted(set(np.asarray(ids).tolist()))
+    for start in range(0, len(ids), _LOOKUP_CHUNK):
+        result = await session.execute(
+            select(key_column, *value_columns).where(key_column.in_(ids[start:start + _LOOKUP_CHUNK]))
+        )
+        for key, *rest in result:
+            values[key] = tuple(rest)
+    return values
+
+
+def analysis_months(period: Dict[str, str], trend_months: int) -> List[str]:
+    """Months sales analysis reads: the period, the same window a year earlier and the trailing trend window"""
+    start, end = period["start"], period["end"]
+    months = month_range(previous_year(start), previous_year(end)) + month_range(start, end)
+    if trend_months:
+        months += trailing_months(end, trend_months)
+    return sorted(set(months))
+
+
+def kpi_months(period: Dict[str, str]) -> List[str]:
+    """Months the KPIs read: from the previous-year window or January, whichever is earlier, to the end"""
+    start, end = period["start"], period["end"]
+    return month_range(min(previous_year(start), f"{end[:4]}01"), end)
+
+
+async def aggregate_partials(
+    session: AsyncSession,
+    partials: Dict[str, MonthlyPartial],
+    period: Dict[str, str],
+    cell_filter: Optional[PartialFilter] = None,
+    limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Totals, per-client and per-product sales with growth vs. the previous
+    year, assembled from partials; same result as db.analytics.aggregate_sales
+    """
+    start, end = period["start"], period["end"]
+    current = stack_partials(partials, month_range(start, end), cell_filter)
+    previous = stack_partials(partials, month_range(previous_year(start), previous_year(end)), cell_filter)
+
+    # Client x product cells of the current window; a client is active with any positive cell
+    cells, cell_of_row = np.unique(np.stack([current["client"], current["product"]]), axis=1, return_inverse=True)
+    cell_revenue = np.bincount(cell_of_row.ravel(), weights=current["revenue"], minlength=cells.shape[1])
+    num_clients = len(np.unique(cells[0][cell_revenue > 0]))
+
+    total_revenue = money(current["revenue"].sum())
+    previous_revenue = money(previous["revenue"].sum())
+    summary = {
+        "total_revenue": total_revenue,
+        "total_quantity": int(current["quantity"].sum()),
+        "total_target": money(current["target"].sum()),
+        "num_clients": num_clients,
+        "avg_deal_size": total_revenue / num_clients if num_clients else 0,
+        "previous_revenue": previous_revenue,
+        "yoy_growth": _growth(total_revenue, previous_revenue)
+    }
+
+    def breakdown(dimension: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Ids present in either window with current revenue, quantity and previous revenue"""
+        ids, index = np.unique(np.concatenate([current[dimension], previous[dimension]]), return_inverse=True)
+        in_current, in_previous = index[:len(current[dimension])], index[len(current[dimension]):]
+        return (
+            ids,
+            np.round(np.bincount(in_current, weights=current["revenue"], minlength=len(ids)), 2),
+            np.bincount(in_current, weights=current["quantity"], minlength=len(ids)),
+            np.round(np.bincount(in_previous, weights=previous["revenue"], minlength=len(ids)), 2)
+        )
+
+    client_ids, client_revenue, client_quantity, client_previous = breakdown("client")
+    top_clients = top_k_indices(client_revenue, len(client_ids) if limit is None else limit, tie_break=client_ids)
+    client_names = await lookup_by_id(session, Client.id, (Client.name,), client_ids[top_clients])
+    sales_by_client = [
+        {
+            "client_id": int(client_ids[i]),
+            "client_name": client_names.get(int(client_ids[i]), (None,))[0],
+            "revenue": float(client_revenue[i]),
+            "quantity": int(client_quantity[i]),
+            "growth_rate": _growth(float(client_revenue[i]), float(client_previous[i]))
+        }
+        for i in top_clients
+        if int(client_ids[i]) in client_names
+    ]
+
+    product_ids, product_revenue, product_quantity, product_previous = breakdown("product")
+    products = await lookup_by_id(session, Product.id, (Product.code, Product.name), product_ids)
+    codes = np.array([products.get(int(i), ("",))[0] for i in product_ids], dtype=str)
+    top_products = top_k_indices(product_revenue, len(product_ids) if limit is None else limit, tie_break=codes)
+    sales_by_product = [
+        {
+            "product_code": products[int(product_ids[i])][0],
+            "product_name": products[int(product_ids[i])][1],
+            "revenue": float(product_revenue[i]),
+            "quantity": int(product_quantity[i]),
+            "growth_rate": _growth(float(product_revenue[i]), float(product_previous[i])),
+            # Share of the rep's revenue in scope
+            "market_share": round(float(product_revenue[i]) / total_revenue, 4) if total_revenue else 0.0
+        }
+        for i in top_products
+        if int(product_ids[i]) in products
+    ]
+
+    return {"kpi_summary": summary, "sales_by_client": sales_by_client, "sales_by_product": sales_by_product}
+
+
+def monthly_totals(
+    partials: Dict[str, MonthlyPartial],
+    months: Sequence[str],
+    cell_filter: Optional[PartialFilter] = None
+) -> Dict[str, Dict[str, float]]:
+    """Revenue, quantity and target per month with sales, the input of db.analytics.compute_kpis"""
+    cells = stack_partials(partials, months, cell_filter)
+    present = np.unique(cells["month"])
+    sums = {
+        name: np.bincount(cells["month"], weights=cells[name], minlength=len(months))
+        for name in ("revenue", "quantity", "target")
+    }
+    return {
+        months[i]: {
+            "revenue": money(sums["revenue"][i]),
+            "quantity": int(sums["quantity"][i]),
+            "target": money(sums["target"][i])
+        }
+        for i in present
+    }
+
+
+def kpis_from_partials(
+    partials: Dict[str, MonthlyPartial],
+    period: Dict[str, str],
+    cell_filter: Optional[PartialFilter] = None
+) -> Dict[str, Any]:
+    """YoY, YTD and target achievement from partials"""
+    return compute_kpis(monthly_totals(partials, kpi_months(period), cell_filter), period)
+
+
+async def client_product_matrix(
+    session: AsyncSession,
+    partials: Dict[str, MonthlyPartial],
+    months: Sequence[str],
+    cell_filter: Optional[PartialFilter] = None
+) -> Tuple[List[Hashable], np.ndarray, np.ndarray]:
+    """
+    Revenue and target matrices with one row per client x product series,
+    keyed by (client id, product code, client type); same output as
+    pivot_monthly over db.analytics.client_product_monthly_sales
+    """
+    cells = stack_partials(partials, months, cell_filter)
+    series, series_of_cell = np.unique(np.stack([cells["client"], cells["product"]]), axis=1, return_inverse=True)
+    series_of_cell = series_of_cell.ravel()
+    flat = series_of_cell * len(months) + cells["month"]
+    shape = (series.shape[1], len(months))
+    revenue = np.bincount(flat, weights=cells["revenue"], minlength=shape[0] * shape[1]).reshape(shape)
+    target = np.bincount(flat, weights=cells["target"], minlength=shape[0] * shape[1]).reshape(shape)
+
+    async def labels(key_column: Any, value_column: Any, ids: np.ndarray) -> List[Any]:
+        """value_column for each id, looked up once per distinct id"""
+        distinct, index = np.unique(ids, return_inverse=True)
+        values = await lookup_by_id(session, key_column, (value_column,), distinct)
+        labelled = np.empty(len(distinct), dtype=object)
+        labelled[:] = [values.get(i, (None,))[0] for i in distinct.tolist()]
+        return labelled[index.ravel()].tolist()
+
+    client_types = await labels(Client.id, Client.type, series[0])
+    product_codes = await labels(Product.id, Product.code, series[1])
+    return list(zip(series[0].tolist(), product_codes, client_types)), revenue, target
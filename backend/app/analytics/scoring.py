@@ -0,0 +1,276 @@
+"""
+Vectorized client scoring for targeting
+
+Every client of a rep (owned, or bought from the rep in the window) gets a
+row of RFM-style features: recency of the last visit, frequency (share of
+the period's months with sales), monetary value (period revenue), tier and
+year-over-year growth. Each feature is scaled to [0, 1], scores are one
+matrix-vector product with the feature weights, priority buckets come from
+the score quantiles of the rep's portfolio and the top N are picked by
+partial selection, so the whole portfolio is scored in one NumPy pass.
+
+Sales features are aggregated from the per-(rep, month) partials shared
+with analyze_sales_node (see analytics.partials), so a workflow reads each
+month of sales once; clients and the last visit per client within the
+recency horizon (a range on the covering idx_visits_user_date) take one
+query each.
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Float, func, or_, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.analytics.kpi_batch import month_range
+from backend.app.analytics.partials import load_partials, lookup_by_id, stack_partials
+from backend.app.analytics.topk import top_k_indices
+from backend.app.core.config import settings
+from backend.app.db.analytics import previous_year
+from backend.app.db.models import Client, Sales, Visit
+
+FEATURES = ("recency", "frequency", "monetary", "tier", "growth")
+TIER_VALUES = {"platinum": 1.0, "gold": 2 / 3, "silver": 1 / 3}
+PRIORITIES = ("low", "medium", "high")
+# Score quantiles of the portfolio where medium and high priority start
+PRIORITY_QUANTILES = (0.5, 0.8)
+# Growth beyond +-50% scores like +-50%
+_GROWTH_CAP = 0.5
+
+
+def as_of_date(period: Optional[Dict[str, str]]) -> date:
+    """Reference day for recency: the first day after the period, or today"""
+    end = (period or {}).get("end")
+    if not end:
+        return date.today()
+    year, month = int(end[:4]), int(end[4:6])
+    return date(year + month // 12, month % 12 + 1, 1)
+
+
+async def _sales_by_client(
+    session: AsyncSession,
+    rep_user_id: Optional[int],
+    period: Optional[Dict[str, str]]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Client ids with sales and their revenue, previous-year revenue and
+    months with sales; from the cached monthly partials when there is a
+    period, else one grouped query over all sales
+    """
+    start, end = (period or {}).get("start"), (period or {}).get("end")
+    if start and end:
+        current_months = month_range(start, end)
+        previous_months = month_range(previous_year(start), previous_year(end))
+        partials = await load_partials(session, rep_user_id, previous_months + current_months)
+        current = stack_partials(partials, current_months)
+        previous = stack_partials(partials, previous_months)
+
+        ids, index = np.unique(np.concatenate([current["client"], previous["client"]]), return_inverse=True)
+        in_current, in_previous = index[:len(current["client"])], index[len(current["client"]):]
+        # Distinct (client, month) pairs of the current window
+        active = np.unique(in_current * len(current_months) + current["month"]) // len(current_months)
+        return (
+            ids,
+            np.bincount(in_current, weights=current["revenue"], minlength=len(ids)),
+            np.bincount(in_previous, weights=previous["revenue"], minlength=len(ids)),
+            np.bincount(active, minlength=len(ids)).astype(np.float64)
+        )
+
+    query = select(
+        Sales.client_id,
+        type_coerce(func.sum(Sales.revenue), Float),
+        func.count(func.distinct(Sales.period))
+    ).group_by(Sales.client_id)
+    if rep_user_id is not None:
+        query = query.where(Sales.rep_user_id == rep_user_id)
+    rows = (await session.execute(query)).all()
+    ids, revenue, months = zip(*rows) if rows else ((), (), ())
+    return (
+        np.asarray(ids, dtype=np.int64),
+        np.asarray(revenue, dtype=np.float64),
+        np.zeros(len(ids)),
+        np.asarray(months, dtype=np.float64)
+    )
+
+
+async def load_client_features(
+    session: AsyncSession,
+    rep_user_id: Optional[int],
+    period: Optional[Dict[str, str]] = None,
+    as_of: Optional[date] = None,
+    recency_days: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Raw features per client, as columns aligned on client_id (ascending):
+    revenue and previous_revenue (same window a year earlier), active_months,
+    days_since_visit (NaN if not visited within recency_days), tier and name
+    """
+    start, end = (period or {}).get("start"), (period or {}).get("end")
+    as_of = as_of or as_of_date(period)
+    recency_days = recency_days or settings.TARGETING_RECENCY_DAYS
+
+    sales_ids, sales_revenue, sales_previous, sales_months = await _sales_by_client(session, rep_user_id, period)
+
+    # Owned clients, plus clients bought from the rep that belong to someone else
+    clients_query = select(Client.id, Client.name, Client.tier)
+    if rep_user_id is not None:
+        clients_query = clients_query.where(Client.owner_user_id == rep_user_id)
+    clients = {row[0]: (row[1], row[2]) for row in await session.execute(clients_query)}
+    others = [client_id for client_id in sales_ids.tolist() if client_id not in clients]
+    if others:
+        clients.update(await lookup_by_id(session, Client.id, (Client.name, Client.tier), others))
+
+    visits_query = (
+        select(Visit.client_id, func.max(Visit.visit_date))
+        .where(Visit.visit_date.between(as_of - timedelta(days=recency_days), as_of - timedelta(days=1)))
+        .where(or_(Visit.status.is_(None), Visit.status != "cancelled"))
+        .group_by(Visit.client_id)
+    )
+    if rep_user_id is not None:
+        visits_query = visits_query.where(Visit.user_id == rep_user_id)
+    visits = (await session.execute(visits_query)).all()
+
+    client_ids = np.fromiter(clients, dtype=np.int64, count=len(clients))
+    client_ids.sort()
+    count = len(client_ids)
+    names, tiers = zip(*(clients[client_id] for client_id in client_ids.tolist())) if count else ((), ())
+
+    def align(ids: Sequence[int]) -> np.ndarray:
+        """Positions of ids in client_ids, -1 for clients outside the portfolio"""
+        ids = np.asarray(ids, dtype=np.int64)
+        positions = np.searchsorted(client_ids, ids).clip(max=count - 1)
+        return np.where(client_ids[positions] == ids, positions, -1)
+
+    revenue, previous_revenue, active_months = np.zeros(count), np.zeros(count), np.zeros(count)
+    if len(sales_ids) and count:
+        at = align(sales_ids)
+        found = at >= 0
+        revenue[at[found]] = sales_revenue[found]
+        previous_revenue[at[found]] = sales_previous[found]
+        active_months[at[found]] = sales_months[found]
+
+    days_since_visit = np.full(count, np.nan)
+    if visits and count:
+        ids, last_visit = zip(*visits)
+        at = align(ids)
+        found = at >= 0
+        days = as_of.toordinal() - np.fromiter((day.toordinal() for day in last_visit), dtype=np.float64, count=len(last_visit))
+        days_since_visit[at[found]] = days[found]
+
+    return {
+        "client_id": client_ids,
+        "name": list(names),
+        "tier": np.array([TIER_VALUES.get(tier, 0.0) for tier in tiers]),
+        "tier_name": list(tiers),
+        "revenue": revenue,
+        "previous_revenue": previous_revenue,
+        "active_months": active_months,
+        "window_months": len(month_range(start, end)) if start and end else None,
+        "days_since_visit": days_since_visit
+    }
+
+
+def feature_matrix(features: Dict[str, Any], recency_days: Optional[int] = None) -> np.ndarray:
+    """Clients x FEATURES matrix, every column scaled to [0, 1]"""
+    recency_days = recency_days or settings.TARGETING_RECENCY_DAYS
+    revenue, previous = features["revenue"], features["previous_revenue"]
+
+    # Visited today scores 1, fading linearly to 0 at the horizon; no visit within it is 0
+    recency = np.clip(1 - np.nan_to_num(features["days_since_visit"], nan=recency_days) / recency_days, 0, 1)
+
+    window = features["window_months"] or max(float(features["active_months"].max(initial=0)), 1.0)
+    frequency = np.clip(features["active_months"] / window, 0, 1)
+
+    monetary = np.log1p(revenue)
+    top = monetary.max(initial=0)
+    monetary = monetary / top if top > 0 else monetary
+
+    # New business counts as maximal growth, no sales in either window (or no period to compare) as none
+    if features["window_months"]:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            growth = np.where(previous > 0, (revenue - previous) / previous, np.where(revenue > 0, _GROWTH_CAP, 0.0))
+    else:
+        growth = np.zeros(len(revenue))
+    growth = (np.clip(growth, -_GROWTH_CAP, _GROWTH_CAP) + _GROWTH_CAP) / (2 * _GROWTH_CAP)
+
+    return np.column_stack([recency, frequency, monetary, features["tier"], growth])
+
+
+def score_clients(
+    matrix: np.ndarray,
+    weights: Optional[Dict[str, float]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Weighted scores (0-100) and priority bucket indexes into PRIORITIES; a
+    score moves up a bucket only above the bucket's quantile, so tied
+    scores (a new rep's clients, all without sales) stay in the lowest
+    bucket they share
+    """
+    weights = weights or settings.TARGETING_SCORE_WEIGHTS
+    vector = np.array([weights.get(feature, 0.0) for feature in FEATURES], dtype=np.float64)
+    total = vector.sum()
+    if total <= 0:
+        raise ValueError("Targeting score weights must add up to a positive value")
+
+    scores = matrix @ (vector * (100 / total))
+    if len(scores):
+        thresholds = np.quantile(scores, PRIORITY_QUANTILES)
+        priority = np.digitize(scores, thresholds, right=True)
+    else:
+        priority = np.empty(0, dtype=np.int64)
+    return {"score": scores, "priority": priority}
+
+
+def _reason(revenue: float, growth: Optional[float], compared: bool, days_since_visit: float, recency_days: int) -> str:
+    if revenue <= 0:
+        reason = "No purchases this period"
+    elif not compared:
+        reason = "Revenue to date"
+    elif growth is None:
+        reason = "New business this period"
+    elif growth >= 0.1:
+        reason = f"Revenue up {growth:.0%} year over year"
+    elif growth >= 0:
+        reason = "Steady purchase history"
+    else:
+        reason = f"Revenue down {-growth:.0%} year over year"
+    if np.isnan(days_since_visit) or days_since_visit >= recency_days:
+        reason += "; no recent visit"
+    return reason
+
+
+def top_targets(
+    features: Dict[str, Any],
+    k: int,
+    weights: Optional[Dict[str, float]] = None,
+    recency_days: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """The k best-scoring clients (ties by client id), best first, as targeting entries"""
+    recency_days = recency_days or settings.TARGETING_RECENCY_DAYS
+    matrix = feature_matrix(features, recency_days)
+    scored = score_clients(matrix, weights)
+    best = top_k_indices(scored["score"], k, tie_break=features["client_id"])
+
+    targets = []
+    for i in best.tolist():
+        revenue, previous = float(features["revenue"][i]), float(features["previous_revenue"][i])
+        growth = round((revenue - previous) / previous, 4) if previous else None
+        days = float(features["days_since_visit"][i])
+        targets.append({
+            "id": int(features["client_id"][i]),
+            "name": features["name"][i],
+            "score": round(float(scored["score"][i]), 1),
+            "priority": PRIORITIES[scored["priority"][i]],
+            # This period's revenue extended by its growth
+            "potential_revenue": round(revenue * (1 + max(growth or 0, 0)), 2),
+            "reason": _reason(revenue, growth, bool(features["window_months"]), days, recency_days),
+            "features": {
+                "revenue": revenue,
+                "growth_rate": growth,
+                "active_months": int(features["active_months"][i]),
+                "days_since_visit": None if np.isnan(days) else int(days),
+                "tier": features["tier_name"][i],
+                **{feature: round(float(value), 4) for feature, value in zip(FEATURES, matrix[i])}
+            }
+        })
+    return targets
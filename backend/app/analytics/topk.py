@@ -0,0 +1,138 @@
+"""
+Streaming top-k selection
+
+TopK keeps the k best items seen so far in a bounded heap whose root is the
+worst kept item, so ranking n rows costs O(n log k) time and O(k) memory
+and most rows are rejected with a single key comparison. top_k_indices is
+the array counterpart (argpartition, then a sort of the k survivors only).
+
+Ties on the key are broken by tie_break (smaller values rank first), then
+by arrival order, so results are deterministic.
+"""
+import heapq
+import itertools
+from typing import Any, Callable, Generic, Iterable, List, Optional, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+
+class _Entry:
+    """Heap entry ordered so that the worst kept item is the heap root"""
+
+    __slots__ = ("key", "tie", "seq", "item", "largest")
+
+    def __init__(self, key: Any, tie: Any, seq: int, item: Any, largest: bool):
+        self.key = key
+        self.tie = tie
+        self.seq = seq
+        self.item = item
+        self.largest = largest
+
+    def worse_than(self, other: "_Entry") -> bool:
+        if self.key != other.key:
+            return self.key < other.key if self.largest else self.key > other.key
+        if self.tie != other.tie:
+            return self.tie > other.tie
+        return self.seq > other.seq
+
+    __lt__ = worse_than
+
+
+class TopK(Generic[T]):
+    """
+    Bounded accumulator of the k best items by key
+    largest=False keeps the k smallest keys instead
+    """
+
+    def __init__(
+        self,
+        k: int,
+        key: Callable[[T], Any],
+        tie_break: Optional[Callable[[T], Any]] = None,
+        largest: bool = True
+    ):
+        if k < 0:
+            raise ValueError("k must be non-negative")
+        self.k = k
+        self.key = key
+        self.tie_break = tie_break
+        self.largest = largest
+        self.seen = 0
+        self._heap: List[_Entry] = []
+        self._seq = itertools.count()
+
+    def push(self, item: T) -> None:
+        self.seen += 1
+        if not self.k:
+            return
+
+        key = self.key(item)
+        heap = self._heap
+        if len(heap) == self.k:
+            # Cheap rejection on the primary key before building an entry
+            root = heap[0].key
+            if (key < root) if self.largest else (key > root):
+                return
+
+        tie = self.tie_break(item) if self.tie_break else None
+        entry = _Entry(key, tie, next(self._seq), item, self.largest)
+        if len(heap) < self.k:
+            heapq.heappush(heap, entry)
+        elif heap[0].worse_than(entry):
+            heapq.heapreplace(heap, entry)
+
+    def extend(self, items: Iterable[T]) -> "TopK[T]":
+        for item in items:
+            self.push(item)
+        return self
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def result(self) -> List[T]:
+        """Kept items, best first"""
+        ordered = sorted(self._heap, reverse=True)
+        return [entry.item for entry in ordered]
+
+
+def top_k(
+    items: Iterable[T],
+    k: int,
+    key: Callable[[T], Any],
+    tie_break: Optional[Callable[[T], Any]] = None,
+    largest: bool = True
+) -> List[T]:
+    """The k best items of an iterable, best first"""
+    return TopK(k, key, tie_break, largest).extend(items).result()
+
+
+def top_k_indices(
+    values: np.ndarray,
+    k: int,
+    tie_break: Optional[np.ndarray] = None,
+    largest: bool = True
+) -> np.ndarray:
+    """
+    Indices of the k best values, best first
+    tie_break is an optional array ranking equal values (smaller first);
+    without it equal values keep index order
+    """
+    values = np.asarray(values)
+    n = values.shape[0]
+    k = min(max(k, 0), n)
+    if not k:
+        return np.empty(0, dtype=np.intp)
+
+    ranked = -values if largest else values
+    if k < n:
+        # Everything strictly better than the k-th value, plus all of its ties
+        threshold = np.partition(ranked, k - 1)[k - 1]
+        candidates = np.flatnonzero(ranked <= threshold)
+    else:
+        candidates = np.arange(n)
+
+    ties = tie_break[candidates] if tie_break is not None else candidates
+    order = np.lexsort((candidates, ties, ranked[candidates]))
+    return candidates[order[:k]]
@@ -0,0 +1,207 @@
+"""
+Vectorized trend, seasonality and anomaly analysis over series x month matrices
+
+Every row is one monthly series (e.g. client x product). The whole matrix
+is processed with matrix products and row reductions:
+
+- trend and seasonality: one least-squares fit of level, slope and
+  month-of-year effects (calendar months seen at least twice)
+- anomalies: z-scores of what is left after the fit, with outliers
+  (picked against a median-based fit) kept out of the fit and its scale
+"""
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+from backend.app.analytics.topk import top_k_indices
+
+# |slope| / mean below this (per month) counts as flat
+FLAT_THRESHOLD = 0.01
+# Robust z-score beyond which a month is flagged
+ANOMALY_THRESHOLD = 3.5
+# Scales the MAD to a standard deviation for normal data
+_MAD_SCALE = 1.4826
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    out = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def _robust_scale(residual: np.ndarray) -> np.ndarray:
+    """Per-row standard deviation estimated from the median absolute deviation"""
+    median = np.median(residual, axis=1, keepdims=True)
+    return np.median(np.abs(residual - median), axis=1, keepdims=True) * _MAD_SCALE
+
+
+def batch_trends(
+    values: np.ndarray,
+    months: Sequence[str],
+    flat_threshold: float = FLAT_THRESHOLD,
+    anomaly_threshold: float = ANOMALY_THRESHOLD
+) -> Dict[str, np.ndarray]:
+    """
+    Trend slope, seasonal indices and anomaly flags for every row at once
+
+    months labels the columns (consecutive yyyymm). Returns per-row slope
+    (units per month), relative_slope (slope / mean, NaN for all-zero rows),
+    direction (-1, 0, 1), seasonal_index (rows x 12, 1.0 = average month,
+    NaN for calendar months seen fewer than twice), zscore and anomalies
+    (rows x months).
+
+    Level, slope and month-of-year effects are one joint least-squares fit,
+    shared by all rows through a single months x months hat matrix. Outliers
+    are replaced by a robust fit first, so they neither bend the trend nor
+    leak into the same calendar month of other years.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim != 2 or values.shape[1] != len(months):
+        raise ValueError("values must be a series x month matrix matching months")
+
+    n, m = values.shape
+    if not m:
+        return {
+            "slope": np.zeros(n),
+            "relative_slope": np.full(n, np.nan),
+            "direction": np.zeros(n, dtype=np.int8),
+            "seasonal_index": np.full((n, 12), np.nan),
+            "zscore": np.zeros((n, 0)),
+            "anomalies": np.zeros((n, 0), dtype=bool)
+        }
+
+    month_of_year = np.array([int(month[4:6]) - 1 for month in months], dtype=np.intp)
+    counts = np.bincount(month_of_year, minlength=12)
+    one_hot = (month_of_year[:, None] == np.arange(12)).astype(float)
+    seasonal = counts >= 2
+
+    # Design: intercept, centred month number, dummies for repeated calendar months
+    x = np.arange(m) - (m - 1) / 2
+    design = np.column_stack([np.ones(m), x, one_hot[:, seasonal]])
+    projection = np.linalg.pinv(design)
+    hat = design @ projection
+
+    # Outliers are picked against the least-squares slope plus per-calendar-
+    # month medians (12 column slices): least squares alone cannot tell which
+    # of a month's few years is the outlier, the median can. The median
+    # residuals are partly zero by construction, so the scale comes from the
+    # least-squares fit.
+    detrended = values - (values @ projection[1])[:, None] * x
+    robust_fit = values - detrended + np.median(detrended, axis=1, keepdims=True)
+    for month in np.flatnonzero(seasonal):
+        columns = month_of_year == month
+        robust_fit[:, columns] += np.median(detrended[:, columns], axis=1, keepdims=True) \
+            - np.median(detrended, axis=1, keepdims=True)
+    # Least-squares residuals are shrunk by the fitted parameters; undo that for the noise scale
+    noise_scale = _robust_scale(values - values @ hat.T) * np.sqrt(m / max(m - np.trace(hat), 1))
+    outliers = np.abs(values - robust_fit) > anomaly_threshold * noise_scale
+    cleaned = np.where(outliers, robust_fit, values)
+
+    coefficients = cleaned @ projection.T
+    fitted = cleaned @ hat.T
+    slope = coefficients[:, 1]
+    mean = fitted.mean(axis=1)
+
+    seasonal_effect = _safe_divide((fitted - mean[:, None] - slope[:, None] * x) @ one_hot, counts)
+    seasonal_effect[:, ~seasonal] = np.nan
+
+    # Residual standard deviation of the cleaned fit; replaced months carry
+    # no information, so they come off the degrees of freedom
+    degrees_of_freedom = m - np.trace(hat) - outliers.sum(axis=1, keepdims=True)
+    variance = _safe_divide(((cleaned - fitted) ** 2).sum(axis=1, keepdims=True), np.maximum(degrees_of_freedom, 0))
+    irregular = values - fitted
+    zscore = np.nan_to_num(_safe_divide(irregular, np.sqrt(variance)))
+
+    relative_slope = _safe_divide(slope, mean)
+    direction = np.where(np.abs(np.nan_to_num(relative_slope)) >= flat_threshold, np.sign(slope), 0).astype(np.int8)
+
+    return {
+        "slope": slope,
+        "relative_slope": relative_slope,
+        "direction": direction,
+        "seasonal_index": 1 + _safe_divide(seasonal_effect, mean[:, None]),
+        "zscore": zscore,
+        "anomalies": np.abs(zscore) > anomaly_threshold
+    }
+
+
+def _number(value: float, digits: int = 4) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def summarize_trends(
+    labels: Sequence[Dict[str, Any]],
+    areas: Sequence[Hashable],
+    values: np.ndarray,
+    months: Sequence[str],
+    top: int = 5
+) -> Dict[str, Any]:
+    """
+    Trend report for a set of series
+
+    labels describe each row (merged into the per-series entries), areas
+    group rows (e.g. by client type) for growth_areas / declining_areas,
+    which are ordered by the summed slope of their series.
+    """
+    trends = batch_trends(values, months)
+    total = batch_trends(values.sum(axis=0, keepdims=True), months)
+
+    area_names = np.array(["unknown" if area is None else str(area) for area in areas], dtype=str)
+    area_values, area_of_row = np.unique(area_names, return_inverse=True)
+    area_slope = np.bincount(area_of_row, weights=trends["slope"], minlength=len(area_values))
+    growing_areas = top_k_indices(area_slope, len(area_values))
+    declining_areas = top_k_indices(area_slope, len(area_values), largest=False)
+
+    def series(indices: np.ndarray) -> List[Dict[str, Any]]:
+        return [
+            {
+                **labels[i],
+                "monthly_change": round(float(trends["slope"][i]), 2),
+                "relative_change": _number(trends["relative_slope"][i])
+            }
+            for i in indices
+        ]
+
+    slope = trends["slope"]
+    rising = top_k_indices(np.where(trends["direction"] > 0, slope, -np.inf), min(top, int((trends["direction"] > 0).sum())))
+    falling = top_k_indices(np.where(trends["direction"] < 0, slope, np.inf), min(top, int((trends["direction"] < 0).sum())), largest=False)
+
+    rows, columns = np.nonzero(trends["anomalies"])
+    strongest = top_k_indices(np.abs(trends["zscore"][rows, columns]), top)
+    anomalies = [
+        {
+            **labels[rows[i]],
+            "month": months[columns[i]],
+            "revenue": float(values[rows[i], columns[i]]),
+            "zscore": round(float(trends["zscore"][rows[i], columns[i]]), 2)
+        }
+        for i in strongest
+    ]
+
+    direction = int(total["direction"][0])
+    seasonal_index = total["seasonal_index"][0]
+    observed = ~np.isnan(seasonal_index)
+
+    return {
+        "trends": {
+            "revenue_trend": {1: "increasing", -1: "decreasing"}.get(direction, "flat"),
+            "monthly_change": round(float(total["slope"][0]), 2),
+            "growth_areas": [str(area_values[i]) for i in growing_areas if area_slope[i] > 0],
+            "declining_areas": [str(area_values[i]) for i in declining_areas if area_slope[i] < 0]
+        },
+        "trend_analysis": {
+            "series": len(labels),
+            "months": [months[0], months[-1]] if len(months) else [],
+            "increasing_series": int((trends["direction"] > 0).sum()),
+            "decreasing_series": int((trends["direction"] < 0).sum()),
+            "top_increasing": series(rising),
+            "top_decreasing": series(falling),
+            "anomaly_count": int(trends["anomalies"].sum()),
+            "anomalies": anomalies
+        },
+        "seasonality": {
+            "index": {f"{month + 1:02d}": _number(seasonal_index[month], 3) for month in range(12)},
+            "peak_month": f"{int(np.nanargmax(seasonal_index)) + 1:02d}" if observed.any() else None,
+            "low_month": f"{int(np.nanargmin(seasonal_index)) + 1:02d}" if observed.any() else None
+        }
+    }
@@ -0,0 +1,329 @@
+"""
+Whitespace detection over a sparse client x product purchase matrix
+
+The purchase matrix holds every client as a row in CSR form (indptr,
+product column indices, revenue per cell), with each client's segment
+(client type, tier). Segment penetration, the share of a segment's
+clients buying each product, is one bincount over the segment of every
+stored cell, so no dense client x product array is ever built.
+
+A product is whitespace for a client when at least
+WHITESPACE_MIN_PENETRATION of its segment peers buy it and the client
+does not. Its value is the segment's average revenue per buyer of the
+product. For a rep, gaps are counted per client from the client's
+stored cells (the covered part of its segment's core products) and
+summed per segment into opportunities.
+
+Matrices are built with one grouped sales query per window and kept per
+process. Sales and client change events (see graphs.cache_invalidation)
+drop them, and a TTL is a safety net.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Float, func, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.analytics.partials import lookup_by_id
+from backend.app.analytics.topk import top_k_indices
+from backend.app.core.config import settings
+from backend.app.core.logging import get_logger
+from backend.app.db.analytics import period_key
+from backend.app.db.models import Client, Product, Sales
+
+logger = get_logger(__name__)
+
+Window = Tuple[Optional[str], Optional[str]]  # (start, end) yyyymm, None for all sales
+
+_FETCH_BATCH = 100_000
+# Windows whose matrix is kept
+_MATRIX_CACHE_SIZE = 4
+# Peer products listed per opportunity
+_PEER_PRODUCTS = 3
+
+
+class PurchaseMatrix:
+    """Clients x products purchases in CSR form, one row per client (sorted by id)"""
+
+    __slots__ = ("client_ids", "owner", "segment", "segments", "product_ids", "product_codes", "indptr", "indices", "revenue")
+
+    def __init__(
+        self,
+        client_ids: np.ndarray,
+        owner: np.ndarray,
+        segment: np.ndarray,
+        segments: List[Tuple[Optional[str], Optional[str]]],
+        product_ids: np.ndarray,
+        product_codes: List[Optional[str]],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        revenue: np.ndarray
+    ):
+        self.client_ids = client_ids
+        self.owner = owner  # Owner user id per row, -1 for none
+        self.segment = segment  # Index into segments per row
+        self.segments = segments  # (client type, tier) per segment
+        self.product_ids = product_ids
+        self.product_codes = product_codes
+        self.indptr = indptr
+        self.indices = indices
+        self.revenue = revenue
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.client_ids), len(self.product_ids)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    def row_of_cell(self) -> np.ndarray:
+        """Row index of every stored cell"""
+        return np.repeat(np.arange(len(self.client_ids)), np.diff(self.indptr))
+
+    @classmethod
+    async def build(cls, session: AsyncSession, period: Optional[Dict[str, str]] = None) -> "PurchaseMatrix":
+        """All clients with their purchases per product in the period (all sales without one)"""
+        clients = (await session.execute(
+            select(Client.id, Client.owner_user_id, Client.type, Client.tier).order_by(Client.id)
+        )).all()
+        client_ids, owners, types, tiers = zip(*clients) if clients else ((), (), (), ())
+        client_ids = np.asarray(client_ids, dtype=np.int64)
+        owner = np.fromiter((-1 if o is None else o for o in owners), dtype=np.int64, count=len(client_ids))
+
+        codes: Dict[Tuple[Optional[str], Optional[str]], int] = {}
+        segment = np.fromiter(
+            (codes.setdefault(key, len(codes)) for key in zip(types, tiers)), dtype=np.int64, count=len(client_ids)
+        )
+
+        query = select(
+            Sales.client_id, Sales.product_id, type_coerce(func.sum(Sales.revenue), Float)
+        ).group_by(Sales.client_id, Sales.product_id)
+        start, end = (period or {}).get("start"), (period or {}).get("end")
+        if start and end:
+            query = query.where(Sales.period.between(period_key(start), period_key(end)))
+
+        batches = []
+        result = await session.stream(query)
+        async for partition in result.partitions(_FETCH_BATCH):
+            cell_clients, cell_products, cell_revenue = zip(*partition)
+            count = len(cell_clients)
+            batches.append((
+                np.fromiter(cell_clients, dtype=np.int64, count=count),
+                np.fromiter(cell_products, dtype=np.int64, count=count),
+                np.fromiter((v or 0 for v in cell_revenue), dtype=np.float64, count=count)
+            ))
+        if batches:
+            cell_clients, cell_products, cell_revenue = (np.concatenate(column) for column in zip(*batches))
+        else:
+            cell_clients = cell_products = np.empty(0, dtype=np.int64)
+            cell_revenue = np.empty(0)
+
+        # Rows for clients in the table; sales of unknown clients are dropped
+        rows = np.searchsorted(client_ids, cell_clients).clip(max=max(len(client_ids) - 1, 0))
+        known = client_ids[rows] == cell_clients if len(client_ids) else np.zeros(len(rows), dtype=bool)
+        rows, cell_products, cell_revenue = rows[known], cell_products[known], cell_revenue[known]
+
+        product_ids, columns = np.unique(cell_products, return_inverse=True)
+        columns = columns.ravel()
+        order = np.lexsort((columns, rows))
+        rows, columns, cell_revenue = rows[order], columns[order], cell_revenue[order]
+        indptr = np.zeros(len(client_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(client_ids)), out=indptr[1:])
+
+        products = await lookup_by_id(session, Product.id, (Product.code,), product_ids)
+        return cls(
+            client_ids, owner, segment, list(codes), product_ids,
+            [products.get(i, (None,))[0] for i in product_ids.tolist()],
+            indptr, columns.astype(np.int64), cell_revenue
+        )
+
+
+def segment_penetration(matrix: PurchaseMatrix) -> Dict[str, np.ndarray]:
+    """
+    Per segment: clients ("size"), and segments x products buyers,
+    revenue and penetration (buyers / size)
+    """
+    segments, products = len(matrix.segments), len(matrix.product_ids)
+    size = np.bincount(matrix.segment, minlength=segments)
+    flat = matrix.segment[matrix.row_of_cell()] * products + matrix.indices
+    buyers = np.bincount(flat, minlength=segments * products).reshape(segments, products)
+    revenue = np.bincount(flat, weights=matrix.revenue, minlength=segments * products).reshape(segments, products)
+    return {
+        "size": size,
+        "buyers": buyers,
+        "revenue": revenue,
+        "penetration": buyers / np.maximum(size, 1)[:, None]
+    }
+
+
+def _segment_label(segment: Tuple[Optional[str], Optional[str]]) -> str:
+    client_type, tier = segment
+    return f"{tier or 'untiered'} {client_type or 'other'}".title()
+
+
+def find_whitespace(
+    matrix: PurchaseMatrix,
+    rep_user_id: Optional[int] = None,
+    min_penetration: Optional[float] = None,
+    limit: Optional[int] = None
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Whitespace of a rep's clients (all clients for None) against their
+    segment peers: "opportunities" per segment, best estimated revenue
+    first, and "clients" with the largest gaps and their missing products
+    """
+    min_penetration = settings.WHITESPACE_MIN_PENETRATION if min_penetration is None else min_penetration
+    limit = settings.WHITESPACE_LIMIT if limit is None else limit
+    segments, products = len(matrix.segments), len(matrix.product_ids)
+    stats = segment_penetration(matrix)
+
+    # Core products of each segment and what a gap in one is worth
+    core = stats["penetration"] >= min_penetration
+    value = np.where(core, stats["revenue"] / np.maximum(stats["buyers"], 1), 0.0)
+
+    rows = np.flatnonzero(matrix.owner == rep_user_id) if rep_user_id is not None else np.arange(len(matrix.client_ids))
+    segment = matrix.segment[rows]
+
+    # Stored cells of the selected rows, as (local row, product) pairs
+    starts, counts = matrix.indptr[rows], np.diff(matrix.indptr)[rows]
+    local_row = np.repeat(np.arange(len(rows)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    columns = matrix.indices[np.repeat(starts, counts) + offsets]
+    cell_segment = segment[local_row]
+    covered = core[cell_segment, columns]
+
+    core_count = core.sum(axis=1)[segment]
+    gaps = core_count - np.bincount(local_row[covered], minlength=len(rows))
+    gap_value = value.sum(axis=1)[segment] - np.bincount(local_row, weights=value[cell_segment, columns], minlength=len(rows))
+
+    # Per segment: core cells the rep's clients fill, and per product how many of them miss it
+    clients = np.bincount(segment, minlength=segments)
+    core_cells = np.bincount(segment, weights=core_count, minlength=segments)
+    filled = np.bincount(cell_segment[covered], minlength=segments)
+    missing = clients[:, None] * core - np.bincount(
+        cell_segment[covered] * products + columns[covered], minlength=segments * products
+    ).reshape(segments, products)
+    potential = np.bincount(segment, weights=gaps > 0, minlength=segments)
+    estimated = np.bincount(segment, weights=gap_value, minlength=segments)
+
+    opportunities = []
+    candidates = np.flatnonzero(potential > 0)
+    for s in candidates[top_k_indices(estimated[candidates], limit)].tolist():
+        peer_products = top_k_indices(missing[s] * value[s], _PEER_PRODUCTS).tolist()
+        opportunities.append({
+            "segment": _segment_label(matrix.segments[s]),
+            "client_type": matrix.segments[s][0],
+            "tier": matrix.segments[s][1],
+            "clients": int(clients[s]),
+            "potential_clients": int(potential[s]),
+            "estimated_revenue": round(float(estimated[s]), 2),
+            # Share of the segment's core products the clients already buy
+            "penetration_rate": round(float(filled[s] / core_cells[s]), 4) if core_cells[s] else 1.0,
+            "peer_products": [
+                {
+                    "product_code": matrix.product_codes[p],
+                    "missing_clients": int(missing[s, p]),
+                    "peer_penetration": round(float(stats["penetration"][s, p]), 4)
+                }
+                for p in peer_products
+                if missing[s, p]
+            ]
+        })
+
+    gap_clients = []
+    candidates = np.flatnonzero(gaps > 0)
+    for i in candidates[top_k_indices(gap_value[candidates], limit, tie_break=matrix.client_ids[rows[candidates]])].tolist():
+        row, s = rows[i], segment[i]
+        bought = matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]
+        absent = np.setdiff1d(np.flatnonzero(core[s]), bought)
+        absent = absent[np.argsort(-value[s, absent], kind="stable")]
+        gap_clients.append({
+            "client_id": int(matrix.client_ids[row]),
+            "segment": _segment_label(matrix.segments[s]),
+            "missing_products": [matrix.product_codes[p] for p in absent.tolist()],
+            "estimated_revenue": round(float(gap_value[i]), 2)
+        })
+
+    return {"opportunities": opportunities, "clients": gap_clients}
+
+
+class PurchaseMatrixCache:
+    """Purchase matrices per window, least recently used dropped first, with a TTL"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Window, Tuple[float, PurchaseMatrix]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, window: Window) -> Optional[PurchaseMatrix]:
+        with self._lock:
+            entry = self._entries.get(window)
+            if entry is None or entry[0] <= time.monotonic():
+                self._entries.pop(window, None)
+                return None
+            self._entries.move_to_end(window)
+            return entry[1]
+
+    def set(self, window: Window, matrix: PurchaseMatrix) -> None:
+        with self._lock:
+            self._entries.pop(window, None)
+            self._entries[window] = (time.monotonic() + self.ttl, matrix)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, events: List[Dict[str, Any]]) -> int:
+        """
+        Drop matrices affected by sales or client change events (node cache
+        events); a sales event only affects windows holding its month
+        """
+        removed = 0
+        with self._lock:
+            for event in events:
+                source, period = event.get("source"), event.get("period")
+                if source not in ("sales", "clients"):
+                    continue
+                for window in [
+                    window for window in self._entries
+                    if source == "clients" or period is None or window[0] is None
+                    or window[0] <= str(period) <= window[1]
+                ]:
+                    del self._entries[window]
+                    removed += 1
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Process-wide purchase matrix cache
+_matrix_cache = PurchaseMatrixCache(_MATRIX_CACHE_SIZE, settings.WHITESPACE_CACHE_TTL)
+
+
+def get_matrix_cache() -> PurchaseMatrixCache:
+    """Get the process-wide purchase matrix cache"""
+    return _matrix_cache
+
+
+async def load_purchase_matrix(session: AsyncSession, period: Optional[Dict[str, str]] = None) -> PurchaseMatrix:
+    """Purchase matrix of the period (all sales without one), cached per window"""
+    start, end = (period or {}).get("start"), (period or {}).get("end")
+    window: Window = (start, end) if start and end else (None, None)
+    matrix = _matrix_cache.get(window)
+    if matrix is None:
+        started = time.perf_counter()
+        matrix = await PurchaseMatrix.build(session, period if window[0] else None)
+        _matrix_cache.set(window, matrix)
+        logger.debug(
+            "Built purchase matrix", window=window, shape=matrix.shape, nnz=matrix.nnz,
+            seconds=round(time.perf_counter() - started, 3)
+        )
+    return matrix
@@ -0,0 +1,107 @@
+"""
+Analytics API endpoints
+"""
+import re
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.analytics import (
+    batch_kpis,
+    current_sales_cube,
+    kpi_records,
+    kpi_window,
+    month_range,
+    pivot_monthly,
+    team_monthly_series
+)
+from backend.app.analytics.lookalike import find_lookalikes
+from backend.app.core.logging import get_logger
+from backend.app.core.security import require_manager, require_rep
+from backend.app.db.analytics import team_monthly_sales
+from backend.app.db.database import get_db
+from backend.app.db.models import Client, User
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+_YYYYMM = re.compile(r"^\d{4}(0[1-9]|1[0-2])$")
+# Roles that may look across every rep's clients
+_MANAGER_ROLES = ("admin", "manager")
+
+
+@router.get("/kpis/team")
+async def get_team_kpis(
+    start: str = Query(..., description="First month of the period (yyyymm)"),
+    end: str = Query(..., description="Last month of the period (yyyymm)"),
+    by_product: bool = Query(False, description="One row per rep and product"),
+    rep_user_ids: Optional[List[int]] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_manager)
+):
+    """
+    KPIs (YoY, YTD, target achievement, quarterly revenue, status) for every
+    rep, or every rep x product, computed in one vectorized pass over the
+    monthly series: from the in-memory sales cube when it is loaded, the
+    monthly rollup otherwise
+    """
+    if not (_YYYYMM.match(start) and _YYYYMM.match(end)) or start > end:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="start and end must be yyyymm months with start <= end"
+        )
+
+    period = {"start": start, "end": end}
+    window_start, window_end = kpi_window(period)
+    months = month_range(window_start, window_end)
+
+    cube = await current_sales_cube(db)
+    if cube is not None:
+        rows = team_monthly_series(cube, window_start, window_end, rep_user_ids, by_product)
+    else:
+        rows = await team_monthly_sales(db, window_start, window_end, rep_user_ids, by_product)
+    keys, revenue, target = pivot_monthly(rows, months)
+    records = kpi_records(keys, batch_kpis(revenue, target, months, period))
+
+    for record in records:
+        key = record.pop("key")
+        if by_product:
+            record["rep_user_id"], record["product_code"] = key
+        else:
+            record["rep_user_id"] = key
+
+    logger.info("Team KPIs computed", rows=len(records), months=len(months), by_product=by_product, source="cube" if cube is not None else "rollup")
+    return {"period": period, "results": records}
+
+
+@router.get("/clients/{client_id}/lookalikes")
+async def get_client_lookalikes(
+    client_id: int,
+    k: Optional[int] = Query(None, ge=1, le=100, description="Similar clients to return"),
+    owner_user_id: Optional[int] = Query(None, description="Only clients owned by this user (managers)"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(require_rep)
+):
+    """
+    Clients most similar to a client by product mix, type, tier and visit
+    cadence, from the in-process nearest-neighbour index
+    Managers may query any client and owner; reps only their own clients,
+    and only get their own clients back
+    """
+    if current_user.role not in _MANAGER_ROLES:
+        if owner_user_id not in (None, current_user.id):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+        owner_user_id = current_user.id
+        owner = await db.scalar(select(Client.owner_user_id).where(Client.id == client_id))
+        if owner != current_user.id:
+            # Same answer as a missing client, so other reps' client ids are not revealed
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
+
+    results = await find_lookalikes(db, [client_id], k, owner_user_id)
+    if client_id not in results:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
+
+    return {"client_id": client_id, "results": results[client_id]}
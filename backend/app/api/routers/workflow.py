@@ -0,0 +1,181 @@
+"""
+Workflow API endpoints
+"""
+import asyncio
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+from uuid import uuid4
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from backend.app.core.config import settings
+from backend.app.core.logging import get_logger
+from backend.app.core.security import require_rep
+from backend.app.db.models import User
+from backend.app.graphs.main_graph import get_workflow_graph
+from backend.app.graphs.state import make_message
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+# Sentinel put on the queue when the graph run ends
+_END = object()
+
+
+class WorkflowRequest(BaseModel):
+    """Workflow execution request"""
+    query: str
+    product_codes: List[str] = Field(default_factory=list)
+    client_ids: List[int] = Field(default_factory=list)
+    period: Optional[Dict[str, str]] = None  # {"start": "202501", "end": "202512"}
+    context: Dict[str, Any] = Field(default_factory=dict)
+    thread_id: Optional[str] = None  # Resume an existing thread
+
+
+def build_initial_state(request: WorkflowRequest, user: User, thread_id: str) -> Dict[str, Any]:
+    """Initial WorkflowState for a run"""
+    return {
+        "user_id": user.id,
+        "session_id": str(uuid4()),
+        "thread_id": thread_id,
+        "messages": [make_message("user", request.query)],
+        "query": request.query,
+        "context": request.context,
+        "product_codes": request.product_codes,
+        "client_ids": request.client_ids,
+        "period": request.period or {},
+        "errors": [],
+        "needs_human_review": False,
+        "max_retries": 3,
+        "current_retry": 0,
+        "started_at": datetime.utcnow()
+    }
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one server-sent event"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def _node_payload(node: str, update: Any) -> Dict[str, Any]:
+    """Client-facing view of a node update"""
+    if not isinstance(update, dict):
+        return {"node": node, "update": update}
+
+    return {
+        "node": node,
+        "update": {key: value for key, value in update.items() if key != "messages"},
+        "messages": [
+            {"role": message.get("role"), "content": message.get("content")}
+            for message in update.get("messages") or []
+            if isinstance(message, dict)
+        ]
+    }
+
+
+async def _run_graph(graph: Any, state: Dict[str, Any], config: Dict[str, Any], queue: asyncio.Queue) -> None:
+    """
+    Push node updates onto the queue as nodes complete
+    The queue is bounded: when the client reads slowly, put() blocks and the
+    graph stops pulling further steps until the client catches up
+    """
+    thread_id = config["configurable"]["thread_id"]
+    try:
+        async for chunk in graph.astream(state, config, stream_mode="updates"):
+            for node, update in chunk.items():
+                await queue.put(("update", _node_payload(node, update)))
+
+        snapshot = await graph.aget_state(config)
+        if snapshot.next:
+            await queue.put(("interrupt", {"thread_id": thread_id, "next": list(snapshot.next)}))
+        else:
+            await queue.put(("done", {"thread_id": thread_id}))
+    except asyncio.CancelledError:
+        # Cancelled by the consumer, which no longer reads the queue
+        raise
+    except Exception as e:
+        logger.error("Workflow stream failed", thread_id=thread_id, error=str(e), exc_info=True)
+        await queue.put(("error", {"detail": str(e) if settings.DEBUG else "Workflow execution failed"}))
+
+    await queue.put(_END)
+
+
+async def stream_workflow_events(
+    http_request: Request,
+    graph: Any,
+    state: Dict[str, Any],
+    config: Dict[str, Any]
+) -> AsyncIterator[str]:
+    """Server-sent events for one graph run; cancels the run if the client disconnects"""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WORKFLOW_STREAM_QUEUE_SIZE)
+    producer = asyncio.create_task(_run_graph(graph, state, config, queue))
+
+    try:
+        yield format_sse("start", {"thread_id": config["configurable"]["thread_id"]})
+
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=settings.WORKFLOW_STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                if await http_request.is_disconnected():
+                    logger.info("Workflow stream client disconnected", thread_id=config["configurable"]["thread_id"])
+                    break
+                # Comment line keeps proxies from closing an idle stream
+                yield ": heartbeat\n\n"
+                continue
+
+            if item is _END:
+                break
+
+            event, data = item
+            yield format_sse(event, data)
+    finally:
+        if not producer.done():
+            producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+
+@router.post("/stream")
+async def stream_workflow(
+    request: WorkflowRequest,
+    http_request: Request,
+    current_user: User = Depends(require_rep)
+):
+    """
+    Run the main workflow and stream per-node updates as server-sent events
+
+    Events: start, update (one per completed node), then done, interrupt
+    (paused before human review; resume with the same thread_id) or error
+    Only the user who started a thread may continue it
+    """
+    graph = await get_workflow_graph()
+    thread_id = request.thread_id or str(uuid4())
+    config = {
+        "configurable": {"thread_id": thread_id},
+        "recursion_limit": settings.LANGGRAPH_MAX_RECURSION
+    }
+
+    # A thread paused at an interrupt continues from its checkpoint
+    state = build_initial_state(request, current_user, thread_id)
+    if request.thread_id:
+        snapshot = await graph.aget_state(config)
+        # The thread's state keeps the user_id of the run that created it
+        if snapshot.values and snapshot.values.get("user_id") != current_user.id:
+            # Same answer as a missing thread, so other users' thread ids are not confirmed
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Thread not found")
+        if snapshot.next:
+            state = None
+
+    return StreamingResponse(
+        stream_workflow_events(http_request, graph, state, config),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable nginx response buffering
+        }
+    )
@@ -1,7 +1,7 @@
 """
 Application configuration
 """
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -55,8 +55,53 @@ class Settings(BaseSettings):
     
     # LangGraph
     LANGGRAPH_CHECKPOINT_DIR: str = Field(default="./data/checkpoints")
+    LANGGRAPH_CHECKPOINT_CACHE_SIZE: int = Field(default=128)  # Materialized checkpoints kept in memory
     LANGGRAPH_CACHE_TTL: int = Field(default=3600)  # 1 hour
     LANGGRAPH_MAX_RECURSION: int = Field(default=25)
+    LANGGRAPH_CACHE_MAX_ENTRIES: int = Field(default=1024)
+    LANGGRAPH_CACHE_L2_ENABLED: bool = Field(default=False)  # Share node cache via REDIS_URL
+    LANGGRAPH_CACHE_MAX_REFRESHES: int = Field(default=4)  # Concurrent stale-while-revalidate refreshes
+    LANGGRAPH_FINGERPRINT_MEMO_SIZE: int = Field(default=4096)  # Memoized state field digests for cache keys
+    WORKFLOW_STREAM_QUEUE_SIZE: int = Field(default=16)  # Node updates buffered ahead of a slow SSE client
+    WORKFLOW_STREAM_HEARTBEAT: int = Field(default=15)  # Seconds between SSE keep-alive comments
+    
+    # Analytics
+    ANALYTICS_BREAKDOWN_LIMIT: int = Field(default=20)  # Top clients/products returned per analysis
+    ANALYTICS_CUBE_ENABLED: bool = Field(default=False)  # Load the columnar sales cube at startup
+    ANALYTICS_CUBE_DIR: str = Field(default="./data/sales_cube")  # Memory-mapped cube snapshots
+    ANALYTICS_TREND_MONTHS: int = Field(default=24)  # Months of history behind trends and seasonality
+    ANALYTICS_PARTIAL_CACHE_CELLS: int = Field(default=2_000_000)  # Client x product cells held by the per-(rep, month) partial cache
+    ANALYTICS_PARTIAL_CACHE_TTL: int = Field(default=3600)  # Seconds a cached monthly partial is trusted
+    TARGETING_TOP_K: int = Field(default=10)  # Clients ranked by targeting_node
+    TARGETING_SCORE_WEIGHTS: Dict[str, float] = Field(
+        default={"recency": 0.15, "frequency": 0.2, "monetary": 0.35, "tier": 0.1, "growth": 0.2}
+    )  # Client score weight per feature (see analytics.scoring)
+    TARGETING_RECENCY_DAYS: int = Field(default=180)  # Days after which a visit no longer counts as recent
+    WHITESPACE_MIN_PENETRATION: float = Field(default=0.3)  # Share of segment peers buying a product for it to be whitespace
+    WHITESPACE_LIMIT: int = Field(default=5)  # Segments and clients listed per whitespace analysis
+    WHITESPACE_CACHE_TTL: int = Field(default=3600)  # Seconds a cached purchase matrix is trusted
+    LOOKALIKE_TOP_K: int = Field(default=5)  # Similar clients returned per client
+    LOOKALIKE_MONTHS: int = Field(default=12)  # Trailing months of sales and visits behind the client features
+    LOOKALIKE_WEIGHTS: Dict[str, float] = Field(
+        default={"products": 0.6, "type": 0.2, "tier": 0.1, "visits": 0.1}
+    )  # Feature block weight in client similarity (see analytics.lookalike)
+    LOOKALIKE_INDEX_TTL: int = Field(default=86400)  # Seconds before the lookalike index is rebuilt from scratch
+    LOOKALIKE_MAX_INCREMENTAL: float = Field(default=0.1)  # Share of changed clients refreshed in place rather than rebuilt
+    
+    # Scheduling
+    SCHEDULE_HORIZON_DAYS: int = Field(default=14)  # Days from tomorrow searched for visit slots without a date range
+    SCHEDULE_DURATION_MINUTES: int = Field(default=60)  # Visit length without duration_minutes
+    SCHEDULE_WORKDAY: str = Field(default="09:00-18:00")  # Visit window without preferred_times
+    SCHEDULE_BUFFER_MINUTES: int = Field(default=15)  # Travel time kept free around every meeting
+    SCHEDULE_MAX_VISITS_PER_DAY: int = Field(default=3)  # Proposed visits per day
+    SCHEDULE_MAX_PROPOSALS: int = Field(default=5)  # Target clients given a proposed slot
+    SCHEDULE_ROUTE_BUDGET_MS: int = Field(default=200)  # Route optimization time per plan (all of a rep's days)
+    SCHEDULE_ROUTE_MAX_TERRITORY: int = Field(default=2000)  # Largest territory (clients with coordinates) given a distance matrix
+    SCHEDULE_ROUTE_CACHE_CELLS: int = Field(default=16_000_000)  # Distance matrix cells held across cached territories
+    SCHEDULE_ROUTE_CACHE_TTL: int = Field(default=86400)  # Seconds a cached territory is trusted
+    
+    # Ingestion
+    INGEST_BATCH_SIZE: int = Field(default=20000)  # Sales rows per upsert batch, one transaction each
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,334 @@
+"""
+Sales aggregation queries pushed down to the database
+"""
+import sys
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, func, literal, null, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.analytics.topk import TopK
+from backend.app.db.models import Client, Product, Sales, SalesMonthlyRollup
+
+
+def previous_year(yyyymm: str) -> str:
+    """Same month one year earlier"""
+    return f"{int(yyyymm[:4]) - 1:04d}{yyyymm[4:6]}"
+
+
+def previous_month(yyyymm: str) -> str:
+    """The month before yyyymm"""
+    year, month = int(yyyymm[:4]), int(yyyymm[4:6])
+    return f"{year - 1:04d}12" if month == 1 else f"{year:04d}{month - 1:02d}"
+
+
+def period_key(yyyymm: str) -> int:
+    """Integer period key (the period columns) for a yyyymm string"""
+    return int(yyyymm)
+
+
+def money(value: Any) -> float:
+    """Amount rounded to cents, so sums in a different order (SQL, numpy) give the same figure"""
+    return round(float(value or 0), 2)
+
+
+def _yyyymm(period: int) -> str:
+    return f"{period:06d}"
+
+
+def _growth(current: float, previous: float) -> Optional[float]:
+    if not previous:
+        return None
+    return round((current - previous) / previous, 4)
+
+
+def build_sales_aggregate_query(
+    rep_user_id: Optional[int],
+    period: Optional[Dict[str, str]] = None,
+    product_codes: Optional[Sequence[str]] = None,
+    client_ids: Optional[Sequence[int]] = None
+):
+    """
+    One statement returning the total, per-client and per-product rows
+
+    Sales are grouped once into (client, product) cells for the requested
+    period and the same window one year earlier (CASE-split sums), read
+    from the covering idx_sales_rep_period (integer period range scan);
+    the three result levels are rolled up from the cells and combined with
+    UNION ALL. Rows come back unordered; ranking is left to the caller.
+    """
+    start = (period or {}).get("start")
+    end = (period or {}).get("end")
+
+    conditions = []
+    if rep_user_id is not None:
+        conditions.append(Sales.rep_user_id == rep_user_id)
+    if client_ids:
+        conditions.append(Sales.client_id.in_(list(client_ids)))
+    if product_codes:
+        conditions.append(Sales.product_id.in_(
+            select(Product.id).where(Product.code.in_(list(product_codes))).scalar_subquery()
+        ))
+
+    if start and end:
+        prev_start, prev_end = previous_year(start), previous_year(end)
+        in_current = Sales.period.between(period_key(start), period_key(end))
+        in_previous = Sales.period.between(period_key(prev_start), period_key(prev_end))
+        if period_key(prev_end) >= period_key(previous_month(start)):
+            # Windows touch or overlap (periods of a year or more): one range scan
+            conditions.append(Sales.period.between(period_key(prev_start), period_key(end)))
+        else:
+            conditions.append(or_(in_current, in_previous))
+    else:
+        # No period: everything is current, nothing to compare against
+        in_current = literal(True)
+        in_previous = literal(False)
+
+    def current(column):
+        return func.coalesce(func.sum(case((in_current, column), else_=0)), 0)
+
+    cells = (
+        select(
+            Sales.client_id.label("client_id"),
+            Sales.product_id.label("product_id"),
+            current(Sales.revenue).label("revenue"),
+            current(Sales.quantity).label("quantity"),
+            current(func.coalesce(Sales.target, 0)).label("target"),
+            func.coalesce(func.sum(case((in_previous, Sales.revenue), else_=0)), 0).label("previous_revenue")
+        )
+        .where(and_(*conditions))
+        .group_by(Sales.client_id, Sales.product_id)
+        .cte("cells")
+    )
+
+    def sums():
+        return (
+            func.sum(cells.c.revenue).label("revenue"),
+            func.sum(cells.c.quantity).label("quantity"),
+            func.sum(cells.c.target).label("target"),
+            func.sum(cells.c.previous_revenue).label("previous_revenue")
+        )
+
+    active_clients = func.count(func.distinct(case((cells.c.revenue > 0, cells.c.client_id))))
+
+    total = select(
+        literal("total").label("level"),
+        null().label("id"),
+        null().label("code"),
+        null().label("name"),
+        *sums(),
+        active_clients.label("num_clients")
+    )
+    by_client = (
+        select(
+            literal("client").label("level"),
+            cells.c.client_id.label("id"),
+            null().label("code"),
+            func.max(Client.name).label("name"),
+            *sums(),
+            literal(1).label("num_clients")
+        )
+        .select_from(cells.join(Client, Client.id == cells.c.client_id))
+        .group_by(cells.c.client_id)
+    )
+    by_product = (
+        select(
+            literal("product").label("level"),
+            cells.c.product_id.label("id"),
+            func.max(Product.code).label("code"),
+            func.max(Product.name).label("name"),
+            *sums(),
+            active_clients.label("num_clients")
+        )
+        .select_from(cells.join(Product, Product.id == cells.c.product_id))
+        .group_by(cells.c.product_id)
+    )
+
+    return union_all(total, by_client, by_product)
+
+
+async def aggregate_sales(
+    session: AsyncSession,
+    rep_user_id: Optional[int],
+    period: Optional[Dict[str, str]] = None,
+    product_codes: Optional[Sequence[str]] = None,
+    client_ids: Optional[Sequence[int]] = None,
+    limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Totals, per-client and per-product sales with growth vs. the previous
+    year, computed by the database in one round trip
+
+    Breakdown rows are streamed and ranked by revenue (ties by client id /
+    product code) in bounded heaps, so only the top `limit` of each level
+    is ever held and sorted.
+    """
+    query = build_sales_aggregate_query(rep_user_id, period, product_codes, client_ids)
+
+    summary: Dict[str, Any] = {}
+    k = limit if limit is not None else sys.maxsize
+    by_client: TopK[Dict[str, Any]] = TopK(k, key=itemgetter("revenue"), tie_break=itemgetter("client_id"))
+    by_product: TopK[Dict[str, Any]] = TopK(k, key=itemgetter("revenue"), tie_break=itemgetter("product_code"))
+
+    result = await session.stream(query)
+    async for row in result.mappings():
+        revenue = money(row["revenue"])
+        previous = money(row["previous_revenue"])
+
+        if row["level"] == "total":
+            num_clients = int(row["num_clients"] or 0)
+            summary = {
+                "total_revenue": revenue,
+                "total_quantity": int(row["quantity"] or 0),
+                "total_target": money(row["target"]),
+                "num_clients": num_clients,
+                "avg_deal_size": revenue / num_clients if num_clients else 0,
+                "previous_revenue": previous,
+                "yoy_growth": _growth(revenue, previous)
+            }
+        elif row["level"] == "client":
+            by_client.push({
+                "client_id": row["id"],
+                "client_name": row["name"],
+                "revenue": revenue,
+                "quantity": int(row["quantity"] or 0),
+                "growth_rate": _growth(revenue, previous)
+            })
+        else:
+            by_product.push({
+                "product_code": row["code"],
+                "product_name": row["name"],
+                "revenue": revenue,
+                "quantity": int(row["quantity"] or 0),
+                "growth_rate": _growth(revenue, previous)
+            })
+
+    total_revenue = summary.get("total_revenue", 0.0)
+    sales_by_client, sales_by_product = by_client.result(), by_product.result()
+    for product in sales_by_product:
+        # Share of the rep's revenue in scope
+        product["market_share"] = round(product["revenue"] / total_revenue, 4) if total_revenue else 0.0
+
+    if not summary:
+        summary = {
+            "total_revenue": 0.0,
+            "total_quantity": 0,
+            "total_target": 0.0,
+            "num_clients": 0,
+            "avg_deal_size": 0,
+            "previous_revenue": 0.0,
+            "yoy_growth": None
+        }
+
+    return {"kpi_summary": summary, "sales_by_client": sales_by_client, "sales_by_product": sales_by_product}
+
+
+def _window_sum(months: Dict[str, Dict[str, float]], start: str, end: str, field: str) -> float:
+    return money(sum(values[field] for month, values in months.items() if start <= month <= end))
+
+
+def compute_kpis(months: Dict[str, Dict[str, float]], period: Dict[str, str]) -> Dict[str, Any]:
+    """YoY, YTD and target achievement from monthly totals"""
+    start, end = period["start"], period["end"]
+    ytd_start = f"{end[:4]}01"
+
+    current = _window_sum(months, start, end, "revenue")
+    current_target = _window_sum(months, start, end, "target")
+    previous = _window_sum(months, previous_year(start), previous_year(end), "revenue")
+    ytd_revenue = _window_sum(months, ytd_start, end, "revenue")
+    ytd_target = _window_sum(months, ytd_start, end, "target")
+
+    num_months = (int(end[:4]) - int(start[:4])) * 12 + int(end[4:6]) - int(start[4:6]) + 1
+    year = end[:4]
+    quarterly = {
+        f"Q{quarter}": _window_sum(months, f"{year}{quarter * 3 - 2:02d}", f"{year}{quarter * 3:02d}", "revenue")
+        for quarter in range(1, 5)
+    }
+
+    return {
+        "yoy_growth": round((current - previous) / previous * 100, 2) if previous else 0.0,
+        "ytd_achievement": round(ytd_revenue / ytd_target * 100, 2) if ytd_target else 0.0,
+        "target_achievement_rate": round(current / current_target * 100, 2) if current_target else 0.0,
+        "metrics": {
+            "current_revenue": current,
+            "previous_year_revenue": previous,
+            "ytd_revenue": ytd_revenue,
+            "ytd_target": ytd_target,
+            "monthly_avg": current / num_months if num_months > 0 else 0.0,
+            "quarterly_performance": quarterly
+        }
+    }
+
+
+async def team_monthly_sales(
+    session: AsyncSession,
+    start: str,
+    end: str,
+    rep_user_ids: Optional[Sequence[int]] = None,
+    by_product: bool = False
+) -> List[Tuple[Any, str, float, float]]:
+    """
+    (key, yyyymm, revenue, target) rows from the monthly rollup, where key
+    is the rep id, or (rep id, product code) when by_product is set
+    """
+    columns = [SalesMonthlyRollup.rep_user_id]
+    if by_product:
+        columns.append(Product.code)
+
+    query = (
+        select(
+            *columns,
+            SalesMonthlyRollup.period,
+            func.sum(SalesMonthlyRollup.revenue),
+            func.sum(SalesMonthlyRollup.target)
+        )
+        .where(SalesMonthlyRollup.period.between(period_key(start), period_key(end)))
+        .group_by(*columns, SalesMonthlyRollup.period)
+    )
+    if by_product:
+        query = query.join(Product, Product.id == SalesMonthlyRollup.product_id)
+    if rep_user_ids:
+        query = query.where(SalesMonthlyRollup.rep_user_id.in_(list(rep_user_ids)))
+
+    rows = (await session.execute(query)).all()
+    if by_product:
+        return [((rep, code), _yyyymm(period), revenue, target) for rep, code, period, revenue, target in rows]
+    return [(rep, _yyyymm(period), revenue, target) for rep, period, revenue, target in rows]
+
+
+async def client_product_monthly_sales(
+    session: AsyncSession,
+    rep_user_id: Optional[int],
+    start: str,
+    end: str,
+    product_codes: Optional[Sequence[str]] = None,
+    client_ids: Optional[Sequence[int]] = None
+) -> List[Tuple[Any, str, float, float]]:
+    """
+    (key, yyyymm, revenue, target) rows from the monthly rollup, one series
+    per client x product, where key is (client id, product code, client type)
+    """
+    query = (
+        select(
+            SalesMonthlyRollup.client_id,
+            Product.code,
+            Client.type,
+            SalesMonthlyRollup.period,
+            func.sum(SalesMonthlyRollup.revenue),
+            func.sum(SalesMonthlyRollup.target)
+        )
+        .join(Product, Product.id == SalesMonthlyRollup.product_id)
+        .join(Client, Client.id == SalesMonthlyRollup.client_id)
+        .where(SalesMonthlyRollup.period.between(period_key(start), period_key(end)))
+        .group_by(SalesMonthlyRollup.client_id, Product.code, Client.type, SalesMonthlyRollup.period)
+    )
+    if rep_user_id is not None:
+        query = query.where(SalesMonthlyRollup.rep_user_id == rep_user_id)
+    if product_codes:
+        query = query.where(Product.code.in_(list(product_codes)))
+    if client_ids:
+        query = query.where(SalesMonthlyRollup.client_id.in_(list(client_ids)))
+
+    rows = (await session.execute(query)).all()
+    return [((client, code, client_type), _yyyymm(period), revenue, target) for client, code, client_type, period, revenue, target in rows]
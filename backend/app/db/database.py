@@ -73,10 +73,13 @@ async def init_db():
     Initialize database tables
     """
     from backend.app.db.models import Base
+    from backend.app.db.migrations import run_migrations
     
     async with engine.begin() as conn:
         # Create all tables
         await conn.run_sync(Base.metadata.create_all)
+        # Bring tables created by older versions up to date
+        await conn.run_sync(run_migrations)
     
     print("Database tables created successfully")
 
@@ -0,0 +1,407 @@
+"""
+Streaming bulk import of sales files (CSV or Excel)
+
+Rows are read lazily and processed in batches: codes are resolved to ids
+through lookups cached for the whole import (one query per batch for the
+codes not seen yet), and each batch is upserted into sales with a single
+executemany in its own transaction, so memory and lock time stay bounded
+whatever the file size. Rows are keyed by their rep x client x product x
+month cell; importing a cell again replaces its figures. The upserts need
+the unique idx_sales_cell, which databases created before it only get from
+the explicit merge-duplicate-sales migration step.
+
+Bulk statements bypass the ORM hooks, so once every batch is in, the
+monthly rollup is refreshed for the imported months, node cache entries
+depending on the imported reps and months are invalidated and a loaded
+sales cube catches up, each exactly once.
+
+Columns (header row, any order, case-insensitive):
+    client_code or client_id      required
+    product_code or product_id    required
+    yyyymm                        202501, 2025-01, 2025/01 or a date
+    quantity, revenue             required
+    target                        optional
+    rep_email or rep_user_id      optional, defaults to the client's owner
+
+Usage:
+    python backend/app/db/ingest.py sales_202501.csv [--batch-size 20000] [--sheet NAME]
+"""
+import argparse
+import asyncio
+import csv
+import math
+import sys
+import time
+from datetime import date, datetime
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent.parent))
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.analytics.cube import get_sales_cube, refresh_sales_cube
+from backend.app.core.config import settings
+from backend.app.core.logging import get_logger
+from backend.app.db.migrations import has_sales_cell_index
+from backend.app.db.models import Client, Product, Sales, User
+from backend.app.db.rollup import _insert_for, merge_sales_rollup
+from backend.app.graphs.cache_invalidation import notify_data_changed
+
+logger = get_logger(__name__)
+
+# Row errors kept in the report (the rest are only counted)
+MAX_REPORTED_ERRORS = 20
+# Codes per lookup query
+_LOOKUP_CHUNK = 500
+# Columns identifying the cell an imported row replaces
+_CELL = ("rep_user_id", "period", "product_id", "client_id")
+# Values written per row (cell first) and the timestamps added per batch
+_COLUMNS = _CELL + ("yyyymm", "quantity", "revenue", "target")
+_TIMESTAMPS = ("created_at", "updated_at")
+
+
+def read_csv(path: str, encoding: str = "utf-8-sig") -> Iterator[Dict[str, Any]]:
+    """Rows of a CSV file keyed by lower-cased header"""
+    with open(path, newline="", encoding=encoding) as handle:
+        reader = csv.reader(handle)
+        header = [name.strip().lower() for name in next(reader, [])]
+        for values in reader:
+            if any(values):
+                yield dict(zip(header, values))
+
+
+def read_excel(path: str, sheet: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Rows of an Excel worksheet (the active one by default) keyed by lower-cased header"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = (workbook[sheet] if sheet else workbook.active).iter_rows(values_only=True)
+        header = ["" if name is None else str(name).strip().lower() for name in next(rows, ())]
+        for values in rows:
+            if any(value not in (None, "") for value in values):
+                yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def read_rows(path: str, sheet: Optional[str] = None, encoding: str = "utf-8-sig") -> Iterator[Dict[str, Any]]:
+    """Rows of a sales file, by extension"""
+    suffix = Path(path).suffix.lower()
+    if suffix in (".csv", ".txt"):
+        return read_csv(path, encoding)
+    if suffix in (".xlsx", ".xlsm"):
+        return read_excel(path, sheet)
+    raise ValueError(f"Unsupported sales file type: {suffix or path}")
+
+
+def parse_period(value: Any) -> int:
+    """Integer yyyymm period from 202501, "2025-01", "2025/01" or a date"""
+    if isinstance(value, (date, datetime)):
+        return value.year * 100 + value.month
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    digits = str(value).strip().replace("-", "").replace("/", "").replace(".", "")
+    if len(digits) != 6 or not digits.isdigit() or not 1 <= int(digits[4:]) <= 12:
+        raise ValueError(f"invalid yyyymm {value!r}")
+    return int(digits)
+
+
+def _number(value: Any, name: str, required: bool = True) -> Optional[float]:
+    if value is None or value == "":
+        if required:
+            raise ValueError(f"missing {name}")
+        return None
+    if isinstance(value, str):
+        value = value.strip().replace(",", "")
+    try:
+        number = float(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"invalid {name} {value!r}") from None
+    if not math.isfinite(number):
+        raise ValueError(f"invalid {name} {value!r}")
+    return number
+
+
+def _key(value: Any, integer: bool) -> Any:
+    """Lookup key from a cell: ints for id columns, stripped strings for codes"""
+    if value is None or value == "":
+        return None
+    if integer:
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+    return str(value).strip()
+
+
+class CachedLookup:
+    """
+    Column value -> row values, cached for the whole import
+    Keys not seen yet are fetched in one IN query per chunk; misses are
+    cached too, so an unknown code costs one lookup per import.
+    """
+
+    def __init__(self, key_column: Any, *value_columns: Any, integer: bool = False):
+        self.key_column = key_column
+        self.value_columns = value_columns
+        self.integer = integer
+        self.cache: Dict[Any, Optional[Tuple[Any, ...]]] = {}
+        self.queries = 0
+
+    def missing(self, values: Iterable[Any]) -> List[Any]:
+        """Keys among values that are not cached yet"""
+        return sorted({
+            key for key in (_key(value, self.integer) for value in values)
+            if key is not None and key not in self.cache
+        })
+
+    async def fetch(self, session: AsyncSession, missing: Sequence[Any]) -> None:
+        for start in range(0, len(missing), _LOOKUP_CHUNK):
+            chunk = missing[start:start + _LOOKUP_CHUNK]
+            result = await session.execute(
+                select(self.key_column, *self.value_columns).where(self.key_column.in_(chunk))
+            )
+            self.queries += 1
+            for key, *values in result:
+                self.cache[key] = tuple(values)
+            for key in chunk:
+                self.cache.setdefault(key, None)
+
+    def get(self, value: Any) -> Optional[Tuple[Any, ...]]:
+        return self.cache.get(_key(value, self.integer))
+
+
+def _lookups() -> Dict[str, CachedLookup]:
+    """Lookups by the file column they resolve"""
+    return {
+        "client_code": CachedLookup(Client.code, Client.id, Client.owner_user_id),
+        "client_id": CachedLookup(Client.id, Client.id, Client.owner_user_id, integer=True),
+        "product_code": CachedLookup(Product.code, Product.id),
+        "product_id": CachedLookup(Product.id, Product.id, integer=True),
+        "rep_email": CachedLookup(User.email, User.id),
+        "rep_user_id": CachedLookup(User.id, User.id, integer=True),
+    }
+
+
+def _resolve(lookups: Dict[str, CachedLookup], row: Dict[str, Any], columns: Sequence[str], name: str) -> Optional[Tuple[Any, ...]]:
+    """Resolved values from the first of columns present in the row"""
+    for column in columns:
+        if row.get(column) not in (None, ""):
+            resolved = lookups[column].get(row[column])
+            if resolved is None:
+                raise ValueError(f"unknown {column} {row[column]!r}")
+            return resolved
+    if name:
+        raise ValueError(f"missing {name}")
+    return None
+
+
+def _sales_row(lookups: Dict[str, CachedLookup], row: Dict[str, Any]) -> Tuple[Any, ...]:
+    """
+    Sales values for one file row, in _COLUMNS order
+    Raises ValueError for rows that cannot be imported
+    """
+    client_id, owner_user_id = _resolve(lookups, row, ("client_code", "client_id"), "client")
+    (product_id,) = _resolve(lookups, row, ("product_code", "product_id"), "product")
+    rep = _resolve(lookups, row, ("rep_email", "rep_user_id"), "")
+    rep_user_id = rep[0] if rep else owner_user_id
+    if rep_user_id is None:
+        raise ValueError("no rep given and the client has no owner")
+
+    period = parse_period(row.get("yyyymm"))
+    target = _number(row.get("target"), "target", required=False)
+    return (
+        rep_user_id,
+        period,
+        product_id,
+        client_id,
+        str(period),
+        int(round(_number(row.get("quantity"), "quantity"))),
+        round(_number(row.get("revenue"), "revenue"), 2),
+        None if target is None else round(target, 2),
+    )
+
+
+class _CompiledUpsert:
+    """
+    INSERT ... ON CONFLICT on the sales cell, replacing the cell's figures
+
+    Compiled once per import and executed through the driver's executemany:
+    the values are already plain ints, floats and strings, so SQLAlchemy's
+    per-row parameter processing is skipped; the timestamps, the only
+    values needing conversion, go through their column type once per batch.
+    """
+
+    def __init__(self, bind: Any):
+        dialect = bind.dialect
+        table = Sales.__table__
+        stmt = _insert_for(bind)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(_CELL),
+            set_={column: stmt.excluded[column] for column in ("yyyymm", "quantity", "revenue", "target", "updated_at")}
+        )
+        compiled = stmt.compile(dialect=dialect, column_keys=list(_COLUMNS + _TIMESTAMPS))
+        self.sql = str(compiled)
+        # Positional drivers (sqlite, asyncpg) take tuples in placeholder order, the others dicts
+        self.order = itemgetter(*map((_COLUMNS + _TIMESTAMPS).index, compiled.positiontup)) if compiled.positional else None
+        self.timestamp = table.c.updated_at.type.bind_processor(dialect) or (lambda value: value)
+
+    def parameters(self, rows: List[Tuple[Any, ...]], now: datetime) -> List[Any]:
+        timestamps = (self.timestamp(now),) * len(_TIMESTAMPS)
+        if self.order is not None:
+            return [self.order(row + timestamps) for row in rows]
+        return [dict(zip(_COLUMNS + _TIMESTAMPS, row + timestamps)) for row in rows]
+
+
+def _parse_batch(lookups: Dict[str, CachedLookup], batch: List[Dict[str, Any]], first_row: int) -> Tuple[List[Tuple[Any, ...]], List[str]]:
+    """Values of the importable rows in cell order, and an error per rejected row"""
+    values = []
+    errors = []
+    for number, row in enumerate(batch, start=first_row):
+        try:
+            values.append(_sales_row(lookups, row))
+        except ValueError as e:
+            errors.append(f"row {number}: {e}")
+    # Index order keeps the B-tree writes local
+    values.sort(key=itemgetter(0, 1, 2, 3))
+    return values, errors
+
+
+async def _refresh_derived(session: AsyncSession, cells: Set[Tuple[int, int]], report: Dict[str, Any]) -> None:
+    """Merge the imported months into the rollup, invalidate caches on them and refresh a loaded cube"""
+    report["rollup_cells"] = 0
+    report["invalidated"] = 0
+    if not cells:
+        return
+
+    periods = sorted({period for _, period in cells})
+    report["periods"] = [str(periods[0]), str(periods[-1])]
+    report["rollup_cells"] = await merge_sales_rollup(session, (periods[0], periods[-1]))
+    await session.commit()
+
+    report["invalidated"] = await notify_data_changed([
+        {"source": "sales", "rep": rep_user_id, "period": str(period)}
+        for rep_user_id, period in sorted(cells)
+    ])
+    if get_sales_cube() is not None:
+        await refresh_sales_cube(session, settings.ANALYTICS_CUBE_DIR)
+
+
+async def import_sales(
+    session: AsyncSession,
+    rows: Iterable[Dict[str, Any]],
+    batch_size: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Upsert sales rows (dicts keyed by the columns in the module docstring)
+    Commits after every batch; rows that cannot be resolved or parsed are
+    skipped and reported. A later row for the same cell replaces an earlier
+    one. Returns counts, throughput and the first errors. If a batch fails,
+    the batches committed before it are still merged into the rollup and
+    invalidated before the error propagates.
+
+    Reading and parsing run in a worker thread, one batch at a time: while
+    a batch is written the worker stays idle, since a CPU-bound thread would
+    slow sqlite's executemany down through the GIL more than it saves.
+    """
+    connection = await session.connection()
+    if not await connection.run_sync(has_sales_cell_index):
+        raise RuntimeError(
+            "sales has no unique idx_sales_cell to upsert on; review and merge duplicate sales rows with "
+            "'python backend/app/db/migrations.py merge-duplicate-sales' first"
+        )
+
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    started = time.perf_counter()
+    lookups = _lookups()
+    upsert = _CompiledUpsert(session.get_bind())
+    rows = iter(rows)
+
+    report: Dict[str, Any] = {"rows": 0, "imported": 0, "rejected": 0, "batches": 0, "errors": []}
+    cells: Set[Tuple[int, int]] = set()  # (rep, period) pairs touched
+
+    try:
+        while True:
+            batch = await asyncio.to_thread(list, islice(rows, batch_size))
+            if not batch:
+                break
+
+            for column in lookups.keys() & set().union(*(row.keys() for row in batch)):
+                lookup = lookups[column]
+                await lookup.fetch(session, lookup.missing(row.get(column) for row in batch))
+
+            values, errors = await asyncio.to_thread(_parse_batch, lookups, batch, report["rows"] + 2)  # +1 header, +1 one-based
+            report["rows"] += len(batch)
+            report["rejected"] += len(errors)
+            report["errors"].extend(errors[:MAX_REPORTED_ERRORS - len(report["errors"])])
+            if not values:
+                continue
+
+            connection = await session.connection()
+            await connection.exec_driver_sql(upsert.sql, upsert.parameters(values, datetime.utcnow()))
+            await session.commit()
+            cells.update(row[:2] for row in values)
+            report["imported"] += len(values)
+            report["batches"] += 1
+    finally:
+        # Also when a batch fails: the batches committed before it are in sales
+        load_seconds = time.perf_counter() - started
+        await session.rollback()
+        await _refresh_derived(session, cells, report)
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    report["load_seconds"] = round(load_seconds, 3)
+    report["rows_per_second"] = round(report["rows"] / load_seconds) if load_seconds else 0
+    report["lookup_queries"] = sum(lookup.queries for lookup in lookups.values())
+
+    logger.info(
+        "Sales import finished",
+        **{key: value for key, value in report.items() if key != "errors"}
+    )
+    return report
+
+
+async def import_sales_file(
+    session: AsyncSession,
+    path: str,
+    batch_size: Optional[int] = None,
+    sheet: Optional[str] = None,
+    encoding: str = "utf-8-sig"
+) -> Dict[str, Any]:
+    """Stream a CSV or Excel sales file into the sales table (see import_sales)"""
+    return await import_sales(session, read_rows(path, sheet, encoding), batch_size)
+
+
+async def main():
+    """Import command"""
+    from backend.app.db.database import AsyncSessionLocal, engine, init_db
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV or Excel sales file")
+    parser.add_argument("--batch-size", type=int, default=None, help="Rows per upsert transaction")
+    parser.add_argument("--sheet", default=None, help="Excel worksheet (default: the active one)")
+    parser.add_argument("--encoding", default="utf-8-sig", help="CSV encoding (e.g. cp949)")
+    args = parser.parse_args()
+
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        report = await import_sales_file(session, args.path, args.batch_size, args.sheet, args.encoding)
+
+    await engine.dispose()
+    print(
+        f"Imported {report['imported']} of {report['rows']} rows in {report['seconds']:.1f}s "
+        f"({report['rows_per_second']} rows/s), {report['rejected']} rejected, "
+        f"{report['rollup_cells']} rollup cells refreshed"
+    )
+    for error in report["errors"]:
+        print(f"  {error}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,233 @@
+"""
+Idempotent schema migrations for existing databases
+
+init_db() creates missing tables from the models but never changes tables
+that already exist. Each step below inspects the live schema and applies
+only what is missing, so running the migrations repeatedly is safe; init_db()
+runs them after create_all.
+
+The unique sales cell index (one row per rep x client x product x month,
+which the bulk import upserts on) is the exception: an existing sales table
+may hold several rows per cell, and folding them rewrites sales data. It is
+created only by the explicit merge-duplicate-sales step, which reports what
+it would merge and changes nothing unless run with --apply; run it while
+the app is stopped, since it bypasses the ORM cache hooks. New databases get
+the index from create_all.
+
+Usage:
+    python backend/app/db/migrations.py
+    python backend/app/db/migrations.py merge-duplicate-sales [--apply]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent.parent))
+
+from sqlalchemy import Index, Table, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+
+from backend.app.core.logging import get_logger
+from backend.app.db.models import Client, Sales, SalesMonthlyRollup, Visit
+
+logger = get_logger(__name__)
+
+# Indexes superseded by composite ones, dropped when still present
+OBSOLETE_INDEXES: Dict[str, Tuple[str, ...]] = {
+    "sales": ("idx_sales_rep", "idx_sales_client"),
+    "visits": ("idx_visits_user",),
+}
+
+# Indexes only created by an explicit step (see merge_duplicate_sales)
+EXPLICIT_INDEXES: Dict[str, Tuple[str, ...]] = {
+    "sales": ("idx_sales_cell",),
+}
+
+# Columns of a sales cell
+_SALES_CELL = ("rep_user_id", "client_id", "product_id", "period")
+# Duplicated cells listed in a merge report
+_REPORTED_CELLS = 20
+
+
+def add_column(model: Any, name: str) -> Callable[[Connection], bool]:
+    """Step adding a model column missing from its table"""
+    def step(connection: Connection) -> bool:
+        table: Table = model.__table__
+        existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+        if name in existing:
+            return False
+        ddl = CreateColumn(table.c[name]).compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        return True
+
+    step.__name__ = f"add_column {model.__tablename__}.{name}"
+    return step
+
+
+def backfill(model: Any, column: str, expression: str) -> Callable[[Connection], bool]:
+    """Step filling a column that is still NULL from a SQL expression over the row"""
+    def step(connection: Connection) -> bool:
+        table_name = model.__tablename__
+        result = connection.execute(text(f"UPDATE {table_name} SET {column} = {expression} WHERE {column} IS NULL"))
+        return result.rowcount > 0
+
+    step.__name__ = f"backfill {model.__tablename__}.{column}"
+    return step
+
+
+def sync_indexes(model: Any) -> Callable[[Connection], bool]:
+    """
+    Step creating the model's indexes, recreating those whose columns
+    differ from the model and dropping obsolete ones
+    Missing indexes in EXPLICIT_INDEXES are left to their own step
+    """
+    def step(connection: Connection) -> bool:
+        table: Table = model.__table__
+        existing = {index["name"]: index["column_names"] for index in inspect(connection).get_indexes(table.name)}
+        changed = False
+
+        for name in OBSOLETE_INDEXES.get(table.name, ()):
+            if name in existing:
+                connection.execute(text(f"DROP INDEX {name}"))
+                changed = True
+
+        index: Index
+        for index in table.indexes:
+            columns = [column.name for column in index.columns]
+            if existing.get(index.name) == columns:
+                continue
+            if index.name not in existing and index.name in EXPLICIT_INDEXES.get(table.name, ()):
+                continue
+            if index.name in existing:
+                connection.execute(text(f"DROP INDEX {index.name}"))
+            index.create(connection)
+            changed = True
+        return changed
+
+    step.__name__ = f"sync_indexes {model.__tablename__}"
+    return step
+
+
+def has_sales_cell_index(connection: Connection) -> bool:
+    """Whether sales has the unique cell index (see merge_duplicate_sales)"""
+    return "idx_sales_cell" in {index["name"] for index in inspect(connection).get_indexes("sales")}
+
+
+def merge_duplicate_sales(connection: Connection, apply: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Explicit step folding sales rows that share a rep x client x product x
+    month cell into the cell's first row (quantity, revenue and target
+    summed, the other rows deleted), then creating the unique idx_sales_cell
+    Dry run unless apply: only reports the duplicated cells and the rows
+    that would be deleted. Rollup totals are unchanged either way.
+    Returns None when the index already exists.
+    """
+    if has_sales_cell_index(connection):
+        return None
+
+    cell = ", ".join(_SALES_CELL)
+    duplicated = f"SELECT {cell}, count(*) AS row_count FROM sales GROUP BY {cell} HAVING count(*) > 1"
+    cells, rows_to_delete = connection.execute(text(
+        f"SELECT count(*), coalesce(sum(row_count - 1), 0) FROM ({duplicated})"
+    )).one()
+    sample = connection.execute(text(f"{duplicated} ORDER BY row_count DESC LIMIT {_REPORTED_CELLS}")).all()
+    report: Dict[str, Any] = {
+        "duplicated_cells": cells,
+        "rows_to_delete": rows_to_delete,
+        "cells": [dict(zip(_SALES_CELL + ("rows",), row)) for row in sample],
+        "applied": False
+    }
+    if not apply:
+        return report
+
+    if cells:
+        same_cell = " AND ".join(f"other.{column} = sales.{column}" for column in _SALES_CELL)
+        connection.execute(text(
+            "UPDATE sales SET "
+            + ", ".join(
+                f"{column} = (SELECT sum(other.{column}) FROM sales AS other WHERE {same_cell})"
+                for column in ("quantity", "revenue", "target")
+            )
+            + f" WHERE id IN (SELECT min(id) FROM sales GROUP BY {cell} HAVING count(*) > 1)"
+        ))
+        connection.execute(text(f"DELETE FROM sales WHERE id NOT IN (SELECT min(id) FROM sales GROUP BY {cell})"))
+        connection.execute(text("UPDATE sales_monthly_rollup SET row_count = 1 WHERE row_count > 1"))
+
+    next(index for index in Sales.__table__.indexes if index.name == "idx_sales_cell").create(connection)
+    report["applied"] = True
+    logger.info("Duplicate sales merged", duplicated_cells=cells, deleted_rows=rows_to_delete)
+    return report
+
+
+def analyze(connection: Connection) -> bool:
+    """Refresh planner statistics so the new indexes get picked"""
+    connection.execute(text("ANALYZE"))
+    return True
+
+
+# Applied in order; each returns whether it changed anything
+MIGRATIONS: List[Callable[[Connection], bool]] = [
+    add_column(Sales, "period"),
+    backfill(Sales, "period", "CAST(yyyymm AS INTEGER)"),
+    add_column(SalesMonthlyRollup, "period"),
+    backfill(SalesMonthlyRollup, "period", "CAST(yyyymm AS INTEGER)"),
+    add_column(Client, "code"),
+    add_column(Client, "latitude"),
+    add_column(Client, "longitude"),
+    sync_indexes(Client),
+    sync_indexes(Sales),
+    sync_indexes(SalesMonthlyRollup),
+    sync_indexes(Visit),
+]
+
+
+def run_migrations(connection: Connection) -> List[str]:
+    """Apply pending steps on a sync connection; returns the names of those that changed the schema"""
+    applied = [step.__name__ for step in MIGRATIONS if step(connection)]
+    if applied:
+        analyze(connection)
+        logger.info("Database migrations applied", steps=applied)
+    return applied
+
+
+async def main():
+    """Migration command"""
+    from backend.app.db.database import engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("step", nargs="?", choices=["merge-duplicate-sales"], help="Explicit step to run instead of the migrations")
+    parser.add_argument("--apply", action="store_true", help="Make the changes the step reports (default: dry run)")
+    args = parser.parse_args()
+
+    if args.step is None:
+        async with engine.begin() as conn:
+            applied = await conn.run_sync(run_migrations)
+        await engine.dispose()
+        print(f"Applied {len(applied)} migration steps" + "".join(f"\n  {name}" for name in applied))
+        return
+
+    async with engine.begin() as conn:
+        report = await conn.run_sync(merge_duplicate_sales, args.apply)
+    await engine.dispose()
+
+    if report is None:
+        print("idx_sales_cell already exists; nothing to merge")
+        return
+    if args.apply:
+        print(f"Merged {report['duplicated_cells']} duplicated sales cells, deleted {report['rows_to_delete']} rows")
+    else:
+        print(f"Would merge {report['duplicated_cells']} duplicated sales cells, deleting {report['rows_to_delete']} rows")
+    for cell in report["cells"]:
+        print("  " + ", ".join(f"{name}={value}" for name, value in cell.items()))
+    if args.apply:
+        print("Created idx_sales_cell")
+    else:
+        print("Dry run: nothing changed; run with --apply to merge and create idx_sales_cell")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
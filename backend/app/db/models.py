@@ -8,7 +8,7 @@ from sqlalchemy import (
     ForeignKey, Index, JSON, DECIMAL
 )
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 
 Base = declarative_base()
 
@@ -38,6 +38,7 @@ class Client(Base):
     __tablename__ = "clients"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
+    code = Column(String(50))  # External client code used by sales imports
     name = Column(String(255), nullable=False)
     type = Column(String(50))  # hospital, clinic, pharmacy
     address = Column(Text)
@@ -45,6 +46,8 @@ class Client(Base):
     tier = Column(String(20))  # platinum, gold, silver
     phone = Column(String(50))
     email = Column(String(255))
+    latitude = Column(Float)  # WGS84 degrees, used for visit routes
+    longitude = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -58,6 +61,7 @@ class Client(Base):
     # Indexes
     __table_args__ = (
         Index("idx_clients_owner", "owner_user_id"),
+        Index("idx_clients_code", "code", unique=True),
         Index("idx_clients_tier", "tier"),
     )
 
@@ -79,6 +83,11 @@ class Product(Base):
     sales = relationship("Sales", back_populates="product")
 
 
+def _period_default(context) -> int:
+    """Integer period key of the row being inserted, from its yyyymm"""
+    return int(context.get_current_parameters()["yyyymm"])
+
+
 class Sales(Base):
     __tablename__ = "sales"
     
@@ -87,6 +96,7 @@ class Sales(Base):
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     rep_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     yyyymm = Column(String(6), nullable=False)  # 202501
+    period = Column(Integer, default=_period_default)  # yyyymm as an integer range key
     quantity = Column(Integer, nullable=False)
     revenue = Column(DECIMAL(12, 2), nullable=False)
     target = Column(DECIMAL(12, 2))
@@ -98,13 +108,43 @@ class Sales(Base):
     product = relationship("Product", back_populates="sales")
     rep = relationship("User", back_populates="sales")
     
-    # Indexes
+    # Indexes (the rep and client ones cover the analytics queries, so they
+    # are answered from the index without reading table rows; one row per
+    # rep x client x product x month, which imports upsert on)
     __table_args__ = (
-        Index("idx_sales_period", "yyyymm"),
-        Index("idx_sales_rep", "rep_user_id"),
-        Index("idx_sales_client", "client_id"),
+        Index("idx_sales_cell", "rep_user_id", "period", "product_id", "client_id", unique=True),
+        Index("idx_sales_rep_period", "rep_user_id", "period", "product_id", "client_id", "revenue", "quantity", "target"),
+        Index("idx_sales_client_period", "client_id", "period", "product_id", "revenue", "quantity"),
+        Index("idx_sales_period", "period"),
         Index("idx_sales_product", "product_id"),
     )
+    
+    @validates("yyyymm")
+    def _sync_period(self, key, value):
+        # Core UPDATEs changing yyyymm must set period themselves
+        self.period = int(value)
+        return value
+
+
+class SalesMonthlyRollup(Base):
+    """Sales summed per rep x client x product x month, maintained on Sales writes"""
+    __tablename__ = "sales_monthly_rollup"
+    
+    rep_user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    client_id = Column(Integer, ForeignKey("clients.id"), primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    yyyymm = Column(String(6), primary_key=True)
+    period = Column(Integer, default=_period_default)
+    revenue = Column(DECIMAL(14, 2), nullable=False, default=0)
+    quantity = Column(Integer, nullable=False, default=0)
+    target = Column(DECIMAL(14, 2), nullable=False, default=0)
+    row_count = Column(Integer, nullable=False, default=0)  # Sales rows in the cell
+    
+    # Indexes
+    __table_args__ = (
+        Index("idx_rollup_rep_period", "rep_user_id", "period", "product_id", "client_id", "revenue", "quantity", "target"),
+        Index("idx_rollup_period", "period", "rep_user_id", "product_id", "revenue", "target"),
+    )
 
 
 class Visit(Base):
@@ -125,10 +165,12 @@ class Visit(Base):
     client = relationship("Client", back_populates="visits")
     user = relationship("User", back_populates="visits")
     
-    # Indexes
+    # Indexes (the user one covers targeting's recent visits per client lookups,
+    # the client one the lookalike index's per-client refreshes)
     __table_args__ = (
         Index("idx_visits_date", "visit_date"),
-        Index("idx_visits_user", "user_id"),
+        Index("idx_visits_user_date", "user_id", "visit_date", "client_id", "status"),
+        Index("idx_visits_client_date", "client_id", "visit_date", "status"),
     )
 
 
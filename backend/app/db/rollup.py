@@ -0,0 +1,203 @@
+"""
+Monthly sales rollup maintenance
+
+sales_monthly_rollup holds one row per rep x client x product x month.
+ORM writes to Sales update the affected cells in the same transaction
+(mapper events, registered with register_rollup_maintenance()). Bulk
+statements bypass mapper events and must be followed by a rebuild of the
+affected scope.
+
+Usage (rebuild the whole table from sales):
+    python backend/app/db/rollup.py [--rep REP_USER_ID]
+"""
+import argparse
+import asyncio
+import sys
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent.parent))
+
+from sqlalchemy import String, cast, delete, event, func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.db.models import Sales, SalesMonthlyRollup
+
+CELL_COLUMNS = ("rep_user_id", "client_id", "product_id", "yyyymm")
+VALUE_COLUMNS = ("revenue", "quantity", "target")
+
+_registered = False
+
+
+def _insert_for(connection: Any):
+    """Dialect-specific INSERT supporting ON CONFLICT"""
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _old_value(target: Sales, attribute: str) -> Any:
+    """Value of an attribute as it is in the database before this flush"""
+    history = inspect(target).attrs[attribute].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(target, attribute)
+
+
+def _row(target: Sales, old: bool = False) -> Dict[str, Any]:
+    read = (lambda attribute: _old_value(target, attribute)) if old else (lambda attribute: getattr(target, attribute))
+    return {attribute: read(attribute) for attribute in CELL_COLUMNS + VALUE_COLUMNS}
+
+
+def _apply(connection: Any, row: Dict[str, Any], sign: int) -> None:
+    """Add (sign=1) or remove (sign=-1) one sales row to/from its rollup cell"""
+    table = SalesMonthlyRollup.__table__
+    values = {
+        **{column: row[column] for column in CELL_COLUMNS},
+        "revenue": sign * Decimal(str(row["revenue"] or 0)),
+        "quantity": sign * int(row["quantity"] or 0),
+        "target": sign * Decimal(str(row["target"] or 0)),
+        "row_count": sign
+    }
+
+    stmt = _insert_for(connection)(table).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(CELL_COLUMNS),
+        set_={
+            column: table.c[column] + stmt.excluded[column]
+            for column in ("revenue", "quantity", "target", "row_count")
+        }
+    )
+    connection.execute(stmt)
+
+    if sign < 0:
+        # Drop cells whose last sales row went away
+        connection.execute(
+            delete(table)
+            .where(*(table.c[column] == row[column] for column in CELL_COLUMNS))
+            .where(table.c.row_count <= 0)
+        )
+
+
+def _after_insert(mapper: Any, connection: Any, target: Sales) -> None:
+    _apply(connection, _row(target), 1)
+
+
+def _after_update(mapper: Any, connection: Any, target: Sales) -> None:
+    old, new = _row(target, old=True), _row(target)
+    if old == new:
+        return
+    _apply(connection, old, -1)
+    _apply(connection, new, 1)
+
+
+def _after_delete(mapper: Any, connection: Any, target: Sales) -> None:
+    _apply(connection, _row(target, old=True), -1)
+
+
+def register_rollup_maintenance() -> None:
+    """Keep sales_monthly_rollup in step with ORM writes to Sales (idempotent)"""
+    global _registered
+    if _registered:
+        return
+
+    event.listen(Sales, "after_insert", _after_insert)
+    event.listen(Sales, "after_update", _after_update)
+    event.listen(Sales, "after_delete", _after_delete)
+    _registered = True
+
+
+_ROLLUP_COLUMNS = [*CELL_COLUMNS, "period", "revenue", "quantity", "target", "row_count"]
+
+
+def _rollup_source(rep_user_id: Optional[int], periods: Optional[Tuple[int, int]]) -> Any:
+    """Rollup cells aggregated from sales, in _ROLLUP_COLUMNS order"""
+    # Grouped in idx_sales_rep_period order with yyyymm derived from period,
+    # so the scan can stay on the covering index
+    source = (
+        select(
+            Sales.rep_user_id,
+            Sales.client_id,
+            Sales.product_id,
+            cast(Sales.period, String),
+            Sales.period,
+            func.sum(Sales.revenue),
+            func.sum(Sales.quantity),
+            func.sum(func.coalesce(Sales.target, 0)),
+            func.count()
+        )
+        .group_by(Sales.rep_user_id, Sales.period, Sales.product_id, Sales.client_id)
+    )
+    if rep_user_id is not None:
+        source = source.where(Sales.rep_user_id == rep_user_id)
+    if periods is not None:
+        source = source.where(Sales.period.between(*periods))
+    return source
+
+
+async def rebuild_sales_rollup(
+    session: AsyncSession,
+    rep_user_id: Optional[int] = None,
+    periods: Optional[Tuple[int, int]] = None
+) -> int:
+    """
+    Recompute rollup cells from the sales table (all reps, or one rep;
+    every month, or an inclusive range of integer periods)
+    Runs in the caller's transaction; returns the number of cells written
+    """
+    clear = delete(SalesMonthlyRollup)
+    if rep_user_id is not None:
+        clear = clear.where(SalesMonthlyRollup.rep_user_id == rep_user_id)
+    if periods is not None:
+        clear = clear.where(SalesMonthlyRollup.period.between(*periods))
+
+    await session.execute(clear)
+
+    table = SalesMonthlyRollup.__table__
+    result = await session.execute(
+        table.insert().from_select(_ROLLUP_COLUMNS, _rollup_source(rep_user_id, periods))
+    )
+    return result.rowcount
+
+
+async def merge_sales_rollup(session: AsyncSession, periods: Tuple[int, int]) -> int:
+    """
+    Upsert the rollup cells of a period range from the sales table
+    Cheaper than a rebuild, which first deletes the range, but cells whose
+    sales rows were deleted stay behind: only for writers that insert or
+    replace sales rows (imports). Runs in the caller's transaction; returns
+    the number of cells written.
+    """
+    table = SalesMonthlyRollup.__table__
+    stmt = _insert_for(session.get_bind())(table).from_select(_ROLLUP_COLUMNS, _rollup_source(None, periods))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(CELL_COLUMNS),
+        set_={column: stmt.excluded[column] for column in ("period", *VALUE_COLUMNS, "row_count")}
+    )
+    result = await session.execute(stmt)
+    return result.rowcount
+
+
+async def main():
+    """Rebuild command"""
+    from backend.app.db.database import AsyncSessionLocal, engine, init_db
+
+    parser = argparse.ArgumentParser(description="Rebuild the monthly sales rollup from sales")
+    parser.add_argument("--rep", type=int, default=None, help="Only rebuild this rep's cells")
+    args = parser.parse_args()
+
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        cells = await rebuild_sales_rollup(session, args.rep)
+        await session.commit()
+
+    await engine.dispose()
+    print(f"Rebuilt sales_monthly_rollup: {cells} cells")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,430 @@
+"""
+Deterministic synthetic data for analytics at realistic scale
+
+Generates reps, clients, products and K months of sales, visits and
+calendar events from a seed: the same arguments always produce the same
+rows. Sales follow persistent client x product series (a base level per
+client type, yearly growth, seasonality and noise), so trends, YoY and
+targeting have something to find; every row is a distinct rep x client x
+product x month cell, the client's owner being the rep. Most of a rep's
+clients are in the rep's home city, scattered around its centre, so
+visit routes have real distances.
+
+Rows are bulk-inserted in batches through the driver's executemany,
+appended after the existing ids (codes and emails derive from the ids, so
+repeated runs add new entities), then the monthly rollup is rebuilt for
+the generated months and the node cache is told that sales changed.
+
+Usage:
+    python backend/app/db/synthetic.py --sales 1000000 [--months 36] [--end 202412] [--seed 42]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import date, datetime, timedelta
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent.parent))
+
+import numpy as np
+from sqlalchemy import Table, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.analytics.kpi_batch import trailing_months
+from backend.app.core.config import settings
+from backend.app.core.logging import get_logger
+from backend.app.db.models import Client, Event, Product, Sales, User, Visit
+from backend.app.db.rollup import rebuild_sales_rollup
+from backend.app.graphs.cache_invalidation import notify_data_changed
+
+logger = get_logger(__name__)
+
+CLIENT_TYPES = ("hospital", "clinic", "pharmacy")
+# Share of clients per type and their revenue level relative to a clinic
+_TYPE_WEIGHTS = (0.2, 0.5, 0.3)
+_TYPE_LEVELS = np.array([3.0, 1.0, 0.5])
+CLIENT_TIERS = ("platinum", "gold", "silver")
+_TIER_WEIGHTS = (0.1, 0.3, 0.6)
+CITIES = ("Seoul", "Busan", "Incheon", "Daegu", "Daejeon", "Gwangju", "Ulsan", "Suwon")
+# City centre (latitude, longitude) per city, and the spread of clients around it in degrees
+_CITY_CENTRES = np.array([
+    (37.5665, 126.9780), (35.1796, 129.0756), (37.4563, 126.7052), (35.8714, 128.6014),
+    (36.3504, 127.3845), (35.1595, 126.8526), (35.5384, 129.3114), (37.2636, 127.0286)
+])
+_CITY_SPREAD = 0.05
+# Share of a rep's clients in the rep's home city, the rest anywhere
+_HOME_CITY_SHARE = 0.8
+CATEGORIES = ("Cardiology", "Oncology", "Diabetes", "Respiratory", "Dermatology")
+VISIT_PURPOSES = ("Product detailing", "Follow-up", "Contract renewal", "New product launch", "Sample delivery")
+
+# Not a valid bcrypt hash, so synthetic users cannot log in
+_NO_PASSWORD = "!synthetic"
+# Share of a client's product series with a sale in a given month
+_ACTIVE_SHARE = 0.8
+
+
+def default_scale(sales: int) -> Dict[str, int]:
+    """Reps, clients and products for a number of sales rows"""
+    root = int(sales ** 0.5)
+    return {
+        "reps": max(2, root // 16),
+        "clients": max(50, sales // 200),
+        "products": min(max(10, root // 16), 200)
+    }
+
+
+class _BulkInsert:
+    """
+    INSERT of some columns of a table, compiled once and executed through
+    the driver's executemany; values must already be driver values except
+    for the columns in convert, which go through their column type
+    """
+
+    def __init__(self, bind: Any, table: Table, columns: Sequence[str], convert: Sequence[str] = ()):
+        dialect = bind.dialect
+        compiled = table.insert().compile(dialect=dialect, column_keys=list(columns))
+        self.sql = str(compiled)
+        # Positional drivers (sqlite, asyncpg) take tuples in placeholder order, the others dicts
+        self.order = itemgetter(*map(list(columns).index, compiled.positiontup)) if compiled.positional else None
+        self.columns = tuple(columns)
+        self.convert = [
+            (self.columns.index(column), table.c[column].type.bind_processor(dialect))
+            for column in convert
+            if table.c[column].type.bind_processor(dialect) is not None
+        ]
+
+    def parameters(self, rows: List[Tuple[Any, ...]]) -> List[Any]:
+        if self.convert:
+            converted = []
+            for row in rows:
+                row = list(row)
+                for index, process in self.convert:
+                    row[index] = process(row[index])
+                converted.append(tuple(row))
+            rows = converted
+        if self.order is not None:
+            return [self.order(row) for row in rows]
+        return [dict(zip(self.columns, row)) for row in rows]
+
+    async def run(self, session: AsyncSession, rows: Iterable[Tuple[Any, ...]], batch_size: int) -> int:
+        """Insert in batches, one transaction each; returns the rows written"""
+        written = 0
+        batch: List[Tuple[Any, ...]] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                written += await self._write(session, batch)
+                batch = []
+        if batch:
+            written += await self._write(session, batch)
+        return written
+
+    async def _write(self, session: AsyncSession, batch: List[Tuple[Any, ...]]) -> int:
+        connection = await session.connection()
+        await connection.exec_driver_sql(self.sql, self.parameters(batch))
+        await session.commit()
+        return len(batch)
+
+
+async def _next_id(session: AsyncSession, model: Any) -> int:
+    return (await session.scalar(select(func.coalesce(func.max(model.id), 0)))) + 1
+
+
+def _month_start(yyyymm: str) -> date:
+    return date(int(yyyymm[:4]), int(yyyymm[4:6]), 1)
+
+
+def _sales_rows(
+    rng: np.random.Generator,
+    sales: int,
+    months: List[str],
+    client_ids: np.ndarray,
+    client_owner: np.ndarray,
+    client_type: np.ndarray,
+    product_ids: np.ndarray,
+    product_price: np.ndarray,
+    now: Any
+) -> Iterable[Tuple[Any, ...]]:
+    """Sales rows month by month, each month's cells in index order"""
+    # Persistent client x product series, enough for each month to pick its rows from
+    per_month = [sales // len(months) + (i < sales % len(months)) for i in range(len(months))]
+    series_count = min(int(max(per_month) / _ACTIVE_SHARE) + 1, len(client_ids) * len(product_ids))
+    series = np.sort(rng.choice(len(client_ids) * len(product_ids), size=series_count, replace=False))
+    client_of, product_of = np.divmod(series, len(product_ids))
+
+    # Monthly level, yearly growth, seasonal amplitude and phase per series
+    level = rng.lognormal(np.log(2e6), 0.8, series_count) * _TYPE_LEVELS[client_type[client_of]]
+    growth = rng.normal(0.05, 0.15, series_count)
+    amplitude = rng.uniform(0.0, 0.3, series_count)
+    phase = rng.uniform(0, 2 * np.pi, len(product_ids))[product_of]
+
+    reps = client_owner[client_of]
+    clients = client_ids[client_of]
+    products = product_ids[product_of]
+    prices = product_price[product_of]
+
+    for t, (month, count) in enumerate(zip(months, per_month)):
+        if not count:
+            continue
+        picked = rng.choice(series_count, size=count, replace=False)
+        expected = level[picked] * (1 + growth[picked]) ** (t / 12)
+        seasonal = 1 + amplitude[picked] * np.sin(2 * np.pi * int(month[4:6]) / 12 + phase[picked])
+        revenue = np.round(expected * seasonal * rng.lognormal(0, 0.15, count), 2)
+        quantity = np.maximum(1, np.round(revenue / prices[picked])).astype(np.int64)
+        target = np.round(expected * 1.05, -3)
+
+        # Index order (rep, period, product, client) keeps the B-tree writes local
+        order = np.lexsort((clients[picked], products[picked], reps[picked]))
+        period = int(month)
+        yield from zip(
+            reps[picked][order].tolist(),
+            clients[picked][order].tolist(),
+            products[picked][order].tolist(),
+            [month] * count,
+            [period] * count,
+            quantity[order].tolist(),
+            revenue[order].tolist(),
+            target[order].tolist(),
+            [now] * count,
+            [now] * count
+        )
+
+
+def _visit_rows(
+    rng: np.random.Generator,
+    visits: int,
+    months: List[str],
+    client_ids: np.ndarray,
+    client_owner: np.ndarray,
+    today: date,
+    now: Any
+) -> Iterable[Tuple[Any, ...]]:
+    client_ids, client_owner = client_ids.tolist(), client_owner.tolist()
+    picked = rng.integers(0, len(client_ids), visits)
+    month_of = rng.integers(0, len(months), visits)
+    day_of = rng.integers(0, 28, visits)
+    purpose_of = rng.integers(0, len(VISIT_PURPOSES), visits)
+    starts = [_month_start(month) for month in months]
+    for client, month, day, purpose in zip(picked.tolist(), month_of.tolist(), day_of.tolist(), purpose_of.tolist()):
+        visit_date = starts[month] + timedelta(days=day)
+        yield (
+            client_ids[client],
+            client_owner[client],
+            visit_date,
+            VISIT_PURPOSES[purpose],
+            "completed" if visit_date < today else "scheduled",
+            now,
+            now
+        )
+
+
+def _event_rows(
+    rng: np.random.Generator,
+    events: int,
+    first_day: date,
+    days: int,
+    client_ids: np.ndarray,
+    client_owner: np.ndarray,
+    now: Any
+) -> Iterable[Tuple[Any, ...]]:
+    """Meetings with clients during business hours (09:00-18:00, half-hour slots), weekdays only"""
+    client_ids, client_owner = client_ids.tolist(), client_owner.tolist()
+    picked = rng.integers(0, len(client_ids), events)
+    day_of = rng.integers(0, days, events)
+    slot_of = rng.integers(0, 16, events)
+    duration_of = rng.choice([30, 60, 90], events, p=[0.3, 0.5, 0.2])
+    for client, day, slot, duration in zip(picked.tolist(), day_of.tolist(), slot_of.tolist(), duration_of.tolist()):
+        start_day = first_day + timedelta(days=day)
+        if start_day.weekday() >= 5:
+            # Weekends move to the following Monday
+            start_day += timedelta(days=7 - start_day.weekday())
+        starts_at = datetime(start_day.year, start_day.month, start_day.day, 9) + timedelta(minutes=30 * slot)
+        yield (
+            client_owner[client],
+            client_ids[client],
+            f"Meeting with client {client_ids[client]}",
+            starts_at,
+            starts_at + timedelta(minutes=duration),
+            "internal",
+            "confirmed",
+            now,
+            now
+        )
+
+
+async def generate_synthetic_data(
+    session: AsyncSession,
+    sales: int,
+    months: int = 36,
+    end: str = "202412",
+    seed: int = 42,
+    reps: Optional[int] = None,
+    clients: Optional[int] = None,
+    products: Optional[int] = None,
+    visits: Optional[int] = None,
+    events: Optional[int] = None,
+    batch_size: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Insert a deterministic synthetic data set and rebuild the rollup for its months
+    Entity counts default to default_scale(sales); visits to a quarter and
+    calendar events to a tenth of the sales rows. Commits per batch;
+    returns the counts and timings.
+    """
+    started = time.perf_counter()
+    scale = default_scale(sales)
+    reps = reps or scale["reps"]
+    clients = clients or scale["clients"]
+    products = products or scale["products"]
+    visits = sales // 4 if visits is None else visits
+    events = sales // 10 if events is None else events
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    month_list = trailing_months(end, months)
+
+    rng = np.random.default_rng(seed)
+    bind = session.get_bind()
+    now = datetime.utcnow()
+    now_value = User.__table__.c.created_at.type.bind_processor(bind.dialect)
+    now_value = now_value(now) if now_value else now
+
+    first_rep, first_client, first_product = (
+        await _next_id(session, User), await _next_id(session, Client), await _next_id(session, Product)
+    )
+    rep_ids = np.arange(first_rep, first_rep + reps)
+    client_ids = np.arange(first_client, first_client + clients)
+    product_ids = np.arange(first_product, first_product + products)
+
+    await _BulkInsert(bind, User.__table__, ("id", "email", "hashed_password", "role", "department", "is_active", "created_at", "updated_at")).run(
+        session,
+        ((rep_id, f"rep{rep_id}@synthetic.example", _NO_PASSWORD, "rep", "Sales", True, now_value, now_value) for rep_id in rep_ids.tolist()),
+        batch_size
+    )
+
+    owner_index = rng.integers(0, reps, clients)
+    client_owner = rep_ids[owner_index]
+    client_type = rng.choice(len(CLIENT_TYPES), clients, p=_TYPE_WEIGHTS)
+    client_tier = rng.choice(len(CLIENT_TIERS), clients, p=_TIER_WEIGHTS)
+    rep_city = rng.integers(0, len(CITIES), reps)
+    client_city = np.where(
+        rng.random(clients) < _HOME_CITY_SHARE, rep_city[owner_index], rng.integers(0, len(CITIES), clients)
+    )
+    client_location = np.round(_CITY_CENTRES[client_city] + rng.normal(0, _CITY_SPREAD, (clients, 2)), 6)
+    await _BulkInsert(bind, Client.__table__, ("id", "code", "name", "type", "address", "owner_user_id", "tier", "latitude", "longitude", "created_at", "updated_at")).run(
+        session,
+        (
+            (client_id, f"SC{client_id:08d}", f"{CITIES[city]} {CLIENT_TYPES[kind].title()} {client_id}", CLIENT_TYPES[kind],
+             CITIES[city], owner, CLIENT_TIERS[tier], latitude, longitude, now_value, now_value)
+            for client_id, owner, kind, tier, city, (latitude, longitude) in zip(
+                client_ids.tolist(), client_owner.tolist(), client_type.tolist(), client_tier.tolist(), client_city.tolist(),
+                client_location.tolist()
+            )
+        ),
+        batch_size
+    )
+
+    product_price = np.round(rng.uniform(500, 20000, products), -1)
+    product_category = rng.integers(0, len(CATEGORIES), products)
+    await _BulkInsert(bind, Product.__table__, ("id", "code", "name", "category", "unit_price", "is_active", "created_at", "updated_at")).run(
+        session,
+        (
+            (product_id, f"SP{product_id:05d}", f"Product {product_id}", CATEGORIES[category], price, True, now_value, now_value)
+            for product_id, category, price in zip(product_ids.tolist(), product_category.tolist(), product_price.tolist())
+        ),
+        batch_size
+    )
+
+    sales_columns = ("rep_user_id", "client_id", "product_id", "yyyymm", "period", "quantity", "revenue", "target", "created_at", "updated_at")
+    written = await _BulkInsert(bind, Sales.__table__, sales_columns).run(
+        session,
+        _sales_rows(rng, sales, month_list, client_ids, client_owner, client_type, product_ids, product_price, now_value),
+        batch_size
+    )
+    load_seconds = time.perf_counter() - started
+
+    await _BulkInsert(bind, Visit.__table__, ("client_id", "user_id", "visit_date", "purpose", "status", "created_at", "updated_at"), convert=("visit_date",)).run(
+        session,
+        _visit_rows(rng, visits, month_list, client_ids, client_owner, now.date(), now_value),
+        batch_size
+    )
+
+    # Calendar events from the last generated month to three months later
+    first_day = _month_start(month_list[-1])
+    await _BulkInsert(
+        bind,
+        Event.__table__,
+        ("user_id", "client_id", "title", "starts_at", "ends_at", "source", "status", "created_at", "updated_at"),
+        convert=("starts_at", "ends_at")
+    ).run(session, _event_rows(rng, events, first_day, 120, client_ids, client_owner, now_value), batch_size)
+
+    rollup_started = time.perf_counter()
+    rollup_cells = await rebuild_sales_rollup(session, periods=(int(month_list[0]), int(month_list[-1])))
+    await session.commit()
+    rollup_seconds = time.perf_counter() - rollup_started
+    await notify_data_changed([{"source": "sales"}])
+
+    report = {
+        "seed": seed,
+        "months": [month_list[0], month_list[-1]],
+        "reps": reps,
+        "first_rep_id": int(rep_ids[0]),
+        "clients": clients,
+        "products": products,
+        "sales": written,
+        "visits": visits,
+        "events": events,
+        "rollup_cells": rollup_cells,
+        "sales_seconds": round(load_seconds, 3),
+        "rollup_seconds": round(rollup_seconds, 3),
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+    logger.info("Synthetic data generated", **report)
+    return report
+
+
+async def main():
+    """Generate command"""
+    from backend.app.db.database import AsyncSessionLocal, engine, init_db
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sales", type=int, required=True, help="Sales rows")
+    parser.add_argument("--months", type=int, default=36, help="Months of history")
+    parser.add_argument("--end", default="202412", help="Last month (yyyymm)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reps", type=int, default=None)
+    parser.add_argument("--clients", type=int, default=None)
+    parser.add_argument("--products", type=int, default=None)
+    parser.add_argument("--visits", type=int, default=None)
+    parser.add_argument("--events", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=None, help="Rows per insert transaction")
+    args = parser.parse_args()
+
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        report = await generate_synthetic_data(
+            session,
+            args.sales,
+            months=args.months,
+            end=args.end,
+            seed=args.seed,
+            reps=args.reps,
+            clients=args.clients,
+            products=args.products,
+            visits=args.visits,
+            events=args.events,
+            batch_size=args.batch_size
+        )
+
+    await engine.dispose()
+    print(
+        f"Generated {report['sales']} sales rows ({report['months'][0]}-{report['months'][1]}), "
+        f"{report['reps']} reps, {report['clients']} clients, {report['products']} products, "
+        f"{report['visits']} visits, {report['events']} events in {report['seconds']:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,220 @@
+"""
+Shared (L2) cache backends and serialization for node cache entries
+"""
+import asyncio
+import json
+import struct
+import time
+import zlib
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from backend.app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class CacheFrame(NamedTuple):
+    """A decoded node cache entry with its expiry times and dependency tags"""
+    entry: Any
+    expires_at: float
+    stale_until: float
+    tags: List[str]
+
+
+class NodeCacheCodec:
+    """
+    Compact binary encoding for node cache entries
+
+    Frame layout: version (1 byte) | flags (1 byte) | expires_at (8 byte
+    epoch seconds) | stale_until (8 byte epoch seconds) | serializer type |
+    NUL | msgpack payload of {"entry", "tags"}, zlib-compressed when larger
+    than compress_threshold bytes
+    """
+
+    VERSION = 3
+    FLAG_ZLIB = 0x01
+    _HEADER = struct.Struct("!BBdd")
+
+    def __init__(self, compress_threshold: int = 1024, compress_level: int = 6):
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.serde = JsonPlusSerializer()
+
+    def encode(
+        self,
+        entry: Any,
+        expires_at: float,
+        stale_until: Optional[float] = None,
+        tags: Optional[List[str]] = None
+    ) -> bytes:
+        """Serialize an entry together with its absolute expiry times and tags"""
+        type_, payload = self.serde.dumps_typed({"entry": entry, "tags": list(tags or [])})
+
+        flags = 0
+        if len(payload) > self.compress_threshold:
+            payload = zlib.compress(payload, self.compress_level)
+            flags |= self.FLAG_ZLIB
+
+        header = self._HEADER.pack(self.VERSION, flags, expires_at, stale_until or expires_at)
+        return header + type_.encode() + b"\x00" + payload
+
+    def decode(self, data: bytes) -> CacheFrame:
+        """Deserialize a frame"""
+        version, flags, expires_at, stale_until = self._HEADER.unpack_from(data)
+        if version != self.VERSION:
+            raise ValueError(f"Unsupported node cache frame version: {version}")
+
+        type_, payload = data[self._HEADER.size:].split(b"\x00", 1)
+        if flags & self.FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+
+        body = self.serde.loads_typed((type_.decode(), payload))
+        return CacheFrame(body["entry"], expires_at, stale_until, body["tags"])
+
+
+class CacheBackend:
+    """Interface for shared node cache stores (values are opaque bytes)"""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: int, tags: Sequence[str] = ()) -> None:
+        raise NotImplementedError
+
+    async def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    async def match_tags(self, groups: List[Tuple[str, str]]) -> Set[str]:
+        """Keys carrying at least one tag of every group"""
+        return set()
+
+    async def publish_invalidation(self, events: List[Dict[str, Any]]) -> None:
+        """Tell other workers to drop matching entries from their L1"""
+
+    async def listen_invalidations(self, handler: Callable[[List[Dict[str, Any]]], Any]) -> None:
+        """Call handler with invalidation events published by any worker"""
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    L2 backend speaking the Redis protocol
+    Accepts any redis.asyncio-compatible client (e.g. fakeredis for local runs)
+    Errors are logged and treated as misses so Redis outages never fail a node
+    """
+
+    TAG_PREFIX = "langgraph:cache:tag:"
+    INVALIDATION_CHANNEL = "langgraph:cache:invalidate"
+
+    def __init__(self, client: Any):
+        self.client = client
+
+        # Counters
+        self.errors = 0
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisCacheBackend":
+        """Create a backend from a redis:// URL"""
+        import redis.asyncio as aioredis
+
+        return cls(aioredis.from_url(url))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            return await self.client.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Redis cache get failed", key=key, error=str(e))
+            return None
+
+    async def set(self, key: str, value: bytes, ttl: int, tags: Sequence[str] = ()) -> None:
+        ttl = max(int(ttl), 1)
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.set(key, value, ex=ttl)
+                for t in tags:
+                    # Tag sets live as long as their longest-lived member
+                    pipe.sadd(self.TAG_PREFIX + t, key)
+                    pipe.expire(self.TAG_PREFIX + t, ttl, nx=True)
+                    pipe.expire(self.TAG_PREFIX + t, ttl, gt=True)
+                await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Redis cache set failed", key=key, error=str(e))
+
+    async def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        try:
+            await self.client.delete(*keys)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Redis cache delete failed", keys=len(keys), error=str(e))
+
+    async def match_tags(self, groups: List[Tuple[str, str]]) -> Set[str]:
+        if not groups:
+            return set()
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for value_tag, wildcard_tag in groups:
+                    pipe.sunion(self.TAG_PREFIX + value_tag, self.TAG_PREFIX + wildcard_tag)
+                members = await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Redis cache tag lookup failed", error=str(e))
+            return set()
+
+        candidates = sorted(({m.decode() if isinstance(m, bytes) else m for m in keys} for keys in members), key=len)
+        return set.intersection(*candidates)
+
+    async def publish_invalidation(self, events: List[Dict[str, Any]]) -> None:
+        try:
+            await self.client.publish(self.INVALIDATION_CHANNEL, json.dumps(events, default=str))
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Redis cache invalidation publish failed", error=str(e))
+
+    async def listen_invalidations(self, handler: Callable[[List[Dict[str, Any]]], Any]) -> None:
+        """Runs until cancelled; reconnects after connection errors"""
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(self.INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        handler(json.loads(message["data"]))
+                    except Exception as e:
+                        logger.warning("Invalid cache invalidation message", error=str(e))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Redis invalidation listener failed, reconnecting", error=str(e))
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except AttributeError:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+    async def close(self) -> None:
+        try:
+            await self.client.aclose()
+        except AttributeError:
+            await self.client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "errors": self.errors}
+
+
+def remaining_ttl(expires_at: float) -> float:
+    """Seconds until an absolute expiry time"""
+    return expires_at - time.time()
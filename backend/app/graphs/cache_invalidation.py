@@ -0,0 +1,203 @@
+"""
+Node cache invalidation driven by data changes
+
+SQLAlchemy mapper events on Sales, Product, Client, Visit and Event record
+which data a flush touched; once the transaction commits, the node cache
+entries that depend on it are dropped (see cache_tags for the matching
+rules), along with the cached monthly sales partials of the touched months,
+the whitespace purchase matrices and the touched reps' territory distance
+matrices; the touched clients' lookalike vectors and a loaded sales cube
+are marked for refresh. Policy ingestion reports new policy versions through
+notify_policies_ingested().
+
+Bulk statements (session.execute(update(...))) bypass mapper events; code
+that uses them calls notify_data_changed() itself.
+"""
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from backend.app.analytics.cube import mark_sales_cube_stale
+from backend.app.analytics.lookalike import get_lookalike_cache
+from backend.app.analytics.partials import get_partial_cache
+from backend.app.analytics.whitespace import get_matrix_cache
+from backend.app.core.logging import get_logger
+from backend.app.db.models import Client, Event, Product, Sales, Visit
+from backend.app.graphs.cache_tags import DataEvent
+from backend.app.graphs.node_cache import get_node_cache
+from backend.app.scheduling.routes import get_territory_cache
+
+logger = get_logger(__name__)
+
+_EVENTS_KEY = "cache_invalidation_events"
+_PRODUCT_CODES_KEY = "cache_invalidation_product_codes"
+
+_registered = False
+_background: Set["asyncio.Task[Any]"] = set()
+
+
+def _values(target: Any, attribute: str) -> List[Any]:
+    """Current value of an attribute plus its previous value if it changed"""
+    history = inspect(target).attrs[attribute].history
+    values = [getattr(target, attribute)]
+    values.extend(value for value in history.deleted if value not in values)
+    return values
+
+
+def _record(target: Any, events: Iterable[DataEvent]) -> None:
+    session = Session.object_session(target)
+    if session is None:
+        return
+    session.info.setdefault(_EVENTS_KEY, []).extend(events)
+
+
+def _product_code(session: Session, connection: Any, product_id: Optional[int]) -> Optional[str]:
+    """Product code for a Sales row, memoized for the transaction"""
+    if product_id is None:
+        return None
+
+    codes: Dict[int, Optional[str]] = session.info.setdefault(_PRODUCT_CODES_KEY, {})
+    if product_id not in codes:
+        codes[product_id] = connection.execute(
+            select(Product.code).where(Product.id == product_id)
+        ).scalar_one_or_none()
+    return codes[product_id]
+
+
+def _on_sales_change(mapper: Any, connection: Any, target: Sales) -> None:
+    session = Session.object_session(target)
+    if session is None:
+        return
+
+    # An update that moves a row touches both its old and new cells
+    events = [
+        {
+            "source": "sales",
+            "rep": rep,
+            "client": client,
+            "product": _product_code(session, connection, product_id),
+            "period": yyyymm
+        }
+        for rep in _values(target, "rep_user_id")
+        for client in _values(target, "client_id")
+        for product_id in _values(target, "product_id")
+        for yyyymm in _values(target, "yyyymm")
+    ]
+    _record(target, events)
+
+
+def _on_product_change(mapper: Any, connection: Any, target: Product) -> None:
+    _record(target, [{"source": "products", "product": code} for code in _values(target, "code")])
+
+
+def _on_client_change(mapper: Any, connection: Any, target: Client) -> None:
+    _record(target, [
+        {"source": "clients", "client": target.id, "rep": owner}
+        for owner in _values(target, "owner_user_id")
+    ])
+
+
+def _on_visit_change(mapper: Any, connection: Any, target: Visit) -> None:
+    _record(target, [
+        {"source": "visits", "client": client, "rep": user}
+        for client in _values(target, "client_id")
+        for user in _values(target, "user_id")
+    ])
+
+
+def _on_event_change(mapper: Any, connection: Any, target: Event) -> None:
+    _record(target, [{"source": "events", "rep": user} for user in _values(target, "user_id")])
+
+
+def _unique(events: List[DataEvent]) -> List[DataEvent]:
+    seen = set()
+    unique = []
+    for data_event in events:
+        marker = tuple(sorted((k, str(v)) for k, v in data_event.items() if v is not None))
+        if marker not in seen:
+            seen.add(marker)
+            unique.append(data_event)
+    return unique
+
+
+def _after_commit(session: Session) -> None:
+    events = session.info.pop(_EVENTS_KEY, None)
+    session.info.pop(_PRODUCT_CODES_KEY, None)
+    if events:
+        _dispatch(_unique(events))
+
+
+def _after_soft_rollback(session: Session, previous_transaction: Any) -> None:
+    # Keep the changes of an outer transaction when only a savepoint rolls back
+    if previous_transaction.parent is None:
+        session.info.pop(_EVENTS_KEY, None)
+    session.info.pop(_PRODUCT_CODES_KEY, None)
+
+
+def _dispatch(events: List[DataEvent]) -> None:
+    """Invalidate this worker's L1 now and the shared tier in the background"""
+    cache = get_node_cache()
+    removed = cache.invalidate_local(events)
+    logger.debug("Data change invalidated node cache entries", events=len(events), removed=removed)
+
+    if cache.l2 is None:
+        return
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Synchronous scripts without an event loop only have an L1
+        return
+
+    task = loop.create_task(cache.invalidate(events))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+def register_cache_invalidation() -> None:
+    """Install the SQLAlchemy hooks (idempotent)"""
+    global _registered
+    if _registered:
+        return
+
+    for model, handler in (
+        (Sales, _on_sales_change),
+        (Product, _on_product_change),
+        (Client, _on_client_change),
+        (Visit, _on_visit_change),
+        (Event, _on_event_change)
+    ):
+        for mapper_event in ("after_insert", "after_update", "after_delete"):
+            event.listen(model, mapper_event, handler)
+
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_soft_rollback", _after_soft_rollback)
+    get_node_cache().add_invalidation_observer(get_partial_cache().invalidate)
+    get_node_cache().add_invalidation_observer(get_matrix_cache().invalidate)
+    get_node_cache().add_invalidation_observer(get_lookalike_cache().invalidate)
+    get_node_cache().add_invalidation_observer(get_territory_cache().invalidate)
+    get_node_cache().add_invalidation_observer(mark_sales_cube_stale)
+    _registered = True
+    logger.info("Node cache invalidation hooks registered")
+
+
+async def notify_data_changed(events: List[DataEvent]) -> int:
+    """Invalidate node cache entries for changes made outside the ORM unit of work"""
+    return await get_node_cache().invalidate(_unique(events))
+
+
+async def notify_policies_ingested(version: str, product_codes: Optional[Iterable[str]] = None) -> int:
+    """
+    Invalidate policy-dependent entries after ingesting a policy version
+    Entries cached against "latest" are dropped as well
+    """
+    codes = list(product_codes or [])
+    events: List[DataEvent] = []
+    for policy_version in {version, "latest"}:
+        if codes:
+            events.extend({"source": "policies", "policy": policy_version, "product": code} for code in codes)
+        else:
+            events.append({"source": "policies", "policy": policy_version})
+    return await notify_data_changed(events)
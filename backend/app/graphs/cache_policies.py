@@ -1,41 +1,80 @@
 """
 LangGraph Node Caching Policies
 """
-import hashlib
-import json
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import timedelta
+from backend.app.analytics.kpi_batch import trailing_months
 from backend.app.core.config import settings
+from backend.app.graphs.cache_tags import build_tags
+from backend.app.graphs.fingerprint import KeyField, fingerprint_state, key_field
+
+
+def _previous_year(yyyymm: str) -> str:
+    return f"{int(yyyymm[:4]) - 1:04d}{yyyymm[4:]}"
 
 
 class CachePolicy:
     """Base cache policy for LangGraph nodes"""
+
+    # State fields that make up the cache key
+    key_prefix = ""
+    key_fields: Tuple[KeyField, ...] = (
+        key_field("user_id"),
+        key_field("product_codes", default=[], unordered=True),
+        key_field("client_ids", default=[], unordered=True),
+        key_field("period"),
+        key_field("query")
+    )
     
     def __init__(
         self,
         ttl: Optional[int] = None,
         key_func: Optional[callable] = None,
-        enabled: bool = True
+        enabled: bool = True,
+        stale_ttl: int = 0,
+        sources: Tuple[str, ...] = (),
+        depends_on: Tuple[str, ...] = ()
     ):
         self.ttl = ttl or settings.LANGGRAPH_CACHE_TTL
         self.key_func = key_func or self.default_key_func
         self.enabled = enabled
+        # Stale-while-revalidate grace window after ttl (0 = hard expiry)
+        self.stale_ttl = stale_ttl
+        # Data the cached result is derived from (see cache_tags): source
+        # tables and the state dimensions that scope the result
+        self.sources = sources
+        self.depends_on = depends_on
     
-    @staticmethod
-    def default_key_func(state: Dict[str, Any]) -> str:
-        """Default cache key generation"""
-        # Create a stable hash from relevant state fields
-        cache_data = {
-            "user_id": state.get("user_id"),
-            "product_codes": sorted(state.get("product_codes", [])),
-            "client_ids": sorted(state.get("client_ids", [])),
-            "period": state.get("period"),
-            "query": state.get("query")
+    def default_key_func(self, state: Dict[str, Any]) -> str:
+        """Default cache key generation from the policy's key fields"""
+        return self.key_prefix + fingerprint_state(state, self.key_fields)
+
+    def dependencies(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Data the cached result depends on: its sources and, per dimension in
+        depends_on, the values taken from the state
+        Missing state values leave the dimension as a wildcard
+        """
+        context = state.get("context") or {}
+        period = state.get("period") or {}
+        user_id = state.get("user_id")
+
+        available = {
+            "rep": [user_id] if user_id is not None else None,
+            "client": state.get("client_ids") or None,
+            "product": state.get("product_codes") or None,
+            "period": [(period["start"], period["end"])] if period.get("start") and period.get("end") else None,
+            "policy": [context.get("policy_version", "latest")]
         }
-        
-        # Convert to JSON and hash
-        cache_str = json.dumps(cache_data, sort_keys=True)
-        return hashlib.md5(cache_str.encode()).hexdigest()
+        dependencies = {dimension: available[dimension] for dimension in self.depends_on}
+        dependencies["source"] = list(self.sources)
+        return dependencies
+
+    def dependency_tags(self, state: Dict[str, Any]) -> List[str]:
+        """Invalidation tags for a cached result (none for TTL-only policies)"""
+        if not self.sources:
+            return []
+        return build_tags(self.dependencies(state))
     
     def should_cache(self, state: Dict[str, Any]) -> bool:
         """Determine if this state should be cached"""
@@ -55,63 +94,95 @@ class CachePolicy:
 
 class AnalyticsCachePolicy(CachePolicy):
     """Cache policy for analytics nodes"""
+
+    key_prefix = "analytics_"
+    key_fields = (
+        key_field("user_id"),
+        key_field("product_codes", default=[], unordered=True),
+        key_field("client_ids", default=[], unordered=True),
+        key_field("period"),
+        key_field("context.aggregation", default="monthly")
+    )
     
     def __init__(self):
         super().__init__(
             ttl=3600,  # 1 hour
-            enabled=True
+            enabled=True,
+            sources=("sales", "products", "clients"),  # Client types group the trends
+            depends_on=("rep", "client", "product", "period")
         )
-    
-    def default_key_func(self, state: Dict[str, Any]) -> str:
-        """Analytics-specific cache key"""
-        cache_data = {
-            "user_id": state.get("user_id"),
-            "product_codes": sorted(state.get("product_codes", [])),
-            "period": state.get("period"),
-            "aggregation": state.get("context", {}).get("aggregation", "monthly")
-        }
-        cache_str = json.dumps(cache_data, sort_keys=True)
-        return f"analytics_{hashlib.md5(cache_str.encode()).hexdigest()}"
+
+    def dependencies(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Sales analysis also reads the previous year's window and the trailing trend window"""
+        dependencies = super().dependencies(state)
+        if dependencies["period"]:
+            start, end = dependencies["period"][0]
+            dependencies["period"].append((_previous_year(start), _previous_year(end)))
+            trend_months = trailing_months(end, settings.ANALYTICS_TREND_MONTHS)
+            if trend_months:
+                dependencies["period"].append((trend_months[0], trend_months[-1]))
+        return dependencies
 
 
 class PolicyRAGCachePolicy(CachePolicy):
     """Cache policy for policy RAG nodes"""
+
+    key_prefix = "policy_"
+    key_fields = (
+        key_field("product_codes", default=[], unordered=True),
+        key_field("context.compliance_type", default="general", name="query_type"),
+        key_field("context.policy_version", default="latest")
+    )
     
     def __init__(self):
         super().__init__(
             ttl=7200,  # 2 hours - policies don't change often
-            enabled=True
+            enabled=True,
+            stale_ttl=3600,  # Serve stale for 1 hour while refreshing
+            sources=("policies", "products"),
+            depends_on=("product", "policy")
         )
-    
-    def default_key_func(self, state: Dict[str, Any]) -> str:
-        """Policy RAG cache key"""
-        cache_data = {
-            "product_codes": sorted(state.get("product_codes", [])),
-            "query_type": state.get("context", {}).get("compliance_type", "general"),
-            "policy_version": state.get("context", {}).get("policy_version", "latest")
-        }
-        cache_str = json.dumps(cache_data, sort_keys=True)
-        return f"policy_{hashlib.md5(cache_str.encode()).hexdigest()}"
 
 
 class TargetingCachePolicy(CachePolicy):
     """Cache policy for targeting nodes"""
+
+    key_prefix = "targeting_"
+    key_fields = (
+        key_field("user_id"),
+        key_field("period"),
+        key_field("context.strategy_type", default="standard")
+    )
     
     def __init__(self):
         super().__init__(
             ttl=1800,  # 30 minutes
-            enabled=True
+            enabled=True,
+            stale_ttl=900,  # Serve stale for 15 minutes while refreshing
+            sources=("sales", "clients", "visits"),  # Derived from the rep's sales, clients and visits
+            depends_on=("rep", "period")
         )
+
+
+class ScheduleCachePolicy(CachePolicy):
+    """Cache policy for schedule proposals"""
+
+    key_prefix = "schedule_"
+    key_fields = (
+        key_field("user_id"),
+        key_field("targeting.top_clients", default=[], name="targets"),
+        key_field("context.date_range", default={}, name="date_range"),
+        key_field("context.duration_minutes", name="duration_minutes"),
+        key_field("context.preferred_times", default=[], name="preferred_times")
+    )
     
-    def default_key_func(self, state: Dict[str, Any]) -> str:
-        """Targeting cache key"""
-        cache_data = {
-            "user_id": state.get("user_id"),
-            "analysis": state.get("analysis", {}).get("kpi_summary", {}),
-            "strategy_type": state.get("context", {}).get("strategy_type", "standard")
-        }
-        cache_str = json.dumps(cache_data, sort_keys=True)
-        return f"targeting_{hashlib.md5(cache_str.encode()).hexdigest()}"
+    def __init__(self):
+        super().__init__(
+            ttl=600,  # 10 minutes
+            enabled=True,
+            sources=("events", "clients"),  # Free time on the rep's calendar, client locations
+            depends_on=("rep",)
+        )
 
 
 class DocumentGenerationCachePolicy(CachePolicy):
@@ -140,10 +211,10 @@ NODE_CACHE_POLICIES = {
     "analyze_sales": AnalyticsCachePolicy(),
     "calculate_kpi": AnalyticsCachePolicy(),
     "policy_rag": PolicyRAGCachePolicy(),
-    "targeting": TargetingCachePolicy(),
+    "target_clients": TargetingCachePolicy(),
     "generate_document": DocumentGenerationCachePolicy(),
-    "client_intel": CachePolicy(ttl=1800),  # 30 minutes
-    "schedule_proposal": CachePolicy(ttl=600),  # 10 minutes
+    "gather_client_intel": CachePolicy(ttl=1800, sources=("sales", "clients"), depends_on=("rep", "client")),  # 30 minutes
+    "schedule": ScheduleCachePolicy(),
 }
 
 
@@ -0,0 +1,149 @@
+"""
+Data dependency tags for node cache entries
+
+An entry's dependencies are the data sources it was computed from (sales,
+products, clients, visits, events, policies) plus a constraint per
+dimension: a set of values, or a wildcard when the cached result covers
+every value of that dimension. A data change event names its source and
+the values it touched (e.g. one Sales row: rep, client, product, yyyymm).
+An entry is invalidated when it depends on the event's source and, for
+every dimension named by the event, is tagged with that value or with the
+dimension's wildcard. Periods are tagged per month, so matching is exact
+set algebra over tags and needs no per-entry filtering.
+"""
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Dependency dimensions; "source" never takes a wildcard
+DIMENSIONS = ("rep", "client", "product", "period", "policy", "source")
+WILDCARD = "*"
+
+# Period ranges longer than this are tagged with the period wildcard
+MAX_PERIOD_MONTHS = 240
+
+DataEvent = Dict[str, Any]
+
+
+def tag(dimension: str, value: Any) -> str:
+    """Tag string for one dimension value"""
+    return f"{dimension}:{value}"
+
+
+def _months(start: str, end: str) -> Optional[List[str]]:
+    """yyyymm strings from start to end inclusive, None if too long or invalid"""
+    try:
+        year, month = int(start[:4]), int(start[4:6])
+        end_year, end_month = int(end[:4]), int(end[4:6])
+    except (TypeError, ValueError):
+        return None
+
+    months = []
+    while (year, month) <= (end_year, end_month):
+        months.append(f"{year:04d}{month:02d}")
+        if len(months) > MAX_PERIOD_MONTHS:
+            return None
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return months
+
+
+def build_tags(dependencies: Dict[str, Any]) -> List[str]:
+    """
+    Tags for an entry's dependencies
+    Values are iterables of values, or None for a wildcard; "period" takes
+    a list of (start, end) yyyymm ranges. Dimensions that are not given are
+    wildcards. Entries without sources get no tags and are never invalidated.
+    """
+    if not dependencies.get("source"):
+        return []
+
+    tags: List[str] = []
+    for dimension in DIMENSIONS:
+        values = dependencies.get(dimension)
+        if dimension == "period" and values is not None:
+            months: Set[str] = set()
+            for start, end in values:
+                expanded = _months(start, end)
+                if expanded is None:
+                    months = set()
+                    values = None
+                    break
+                months.update(expanded)
+            else:
+                values = sorted(months)
+
+        if not values:
+            tags.append(tag(dimension, WILDCARD))
+        else:
+            tags.extend(tag(dimension, value) for value in sorted(set(map(str, values))))
+    return tags
+
+
+def event_tag_groups(event: DataEvent) -> List[Tuple[str, str]]:
+    """
+    For each dimension named by the event, the value tag and the wildcard tag
+    A matching entry carries at least one tag of every group
+    """
+    if event.get("source") is None:
+        raise ValueError("Data change events must name their source")
+
+    return [
+        (tag(dimension, event[dimension]), tag(dimension, WILDCARD))
+        for dimension in DIMENSIONS
+        if event.get(dimension) is not None
+    ]
+
+
+class TagIndex:
+    """In-memory tag -> keys index for the L1 node cache"""
+
+    def __init__(self):
+        self._keys: Dict[str, Set[str]] = {}
+        self._tags: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, tags: Iterable[str]) -> None:
+        """Index a key under its tags, replacing any previous tags"""
+        tags = list(tags)
+        with self._lock:
+            self._remove(key)
+            if not tags:
+                return
+            self._tags[key] = tags
+            for t in tags:
+                self._keys.setdefault(t, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        for t in self._tags.pop(key, ()):
+            keys = self._keys.get(t)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys[t]
+
+    def match(self, event: DataEvent) -> Set[str]:
+        """Keys of entries that depend on the data named by the event"""
+        groups = event_tag_groups(event)
+        if not groups:
+            return set()
+
+        with self._lock:
+            candidates = [
+                self._keys.get(value_tag, set()) | self._keys.get(wildcard_tag, set())
+                for value_tag, wildcard_tag in groups
+            ]
+        candidates.sort(key=len)
+        return set.intersection(*candidates)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys.clear()
+            self._tags.clear()
+
+    def __len__(self) -> int:
+        return len(self._tags)
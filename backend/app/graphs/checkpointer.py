@@ -0,0 +1,248 @@
+"""
+Compressed delta checkpoint saver for the workflow graph
+"""
+import zlib
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import aiosqlite
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    copy_checkpoint
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from backend.app.core.config import settings
+from backend.app.core.logging import get_logger
+from backend.app.graphs.state import MessageLog
+
+logger = get_logger(__name__)
+
+
+class CompressedSerializer:
+    """
+    Serializer that encodes values as msgpack and zlib-compresses large payloads
+    Compressed payloads are tagged with a "+zlib" type suffix, so
+    uncompressed data written by the default serializer still loads.
+    Message histories (MessageLog) are written as plain lists.
+    """
+
+    SUFFIX = "+zlib"
+
+    def __init__(
+        self,
+        serde: Optional[SerializerProtocol] = None,
+        compress_threshold: int = 512,
+        compress_level: int = 1
+    ):
+        self.serde = serde or JsonPlusSerializer()
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+
+    def dumps(self, obj: Any) -> bytes:
+        if isinstance(obj, MessageLog):
+            obj = list(obj)
+        return self.serde.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.serde.loads(data)
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        if isinstance(obj, MessageLog):
+            obj = list(obj)
+        type_, data = self.serde.dumps_typed(obj)
+        if data is not None and len(data) > self.compress_threshold:
+            return type_ + self.SUFFIX, zlib.compress(data, self.compress_level)
+        return type_, data
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith(self.SUFFIX):
+            type_ = type_[:-len(self.SUFFIX)]
+            payload = zlib.decompress(payload)
+        return self.serde.loads_typed((type_, payload))
+
+
+class DeltaCheckpointSaver(AsyncSqliteSaver):
+    """
+    SQLite checkpoint saver that stores channel values as deltas
+
+    Each checkpoint row keeps only the channel versions; a channel value is
+    written to checkpoint_blobs once per (channel, version) when it changes.
+    Reads rebuild the full channel_values from the blobs referenced by the
+    checkpoint's channel_versions, with an LRU of recently materialized
+    checkpoints. Checkpoints written by the plain AsyncSqliteSaver (full
+    channel_values) are still read as-is.
+    """
+
+    def __init__(
+        self,
+        conn: aiosqlite.Connection,
+        *,
+        serde: Optional[SerializerProtocol] = None,
+        cache_size: Optional[int] = None
+    ):
+        super().__init__(conn, serde=serde or CompressedSerializer())
+        self.cache_size = cache_size if cache_size is not None else settings.LANGGRAPH_CHECKPOINT_CACHE_SIZE
+        self._materialized: "OrderedDict[Tuple[str, str, str], Checkpoint]" = OrderedDict()
+        self._blobs_ready = False
+
+    async def setup(self) -> None:
+        """Create the checkpoint tables and the channel blob table"""
+        await super().setup()
+        if self._blobs_ready:
+            return
+
+        async with self.lock:
+            if not self._blobs_ready:
+                await self.conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+                        thread_id TEXT NOT NULL,
+                        checkpoint_ns TEXT NOT NULL DEFAULT '',
+                        channel TEXT NOT NULL,
+                        version TEXT NOT NULL,
+                        type TEXT NOT NULL,
+                        blob BLOB,
+                        PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+                    )
+                    """
+                )
+                await self.conn.commit()
+                self._blobs_ready = True
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        """Store changed channels as blobs and the checkpoint without values"""
+        await self.setup()
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        values = checkpoint["channel_values"]
+
+        rows = []
+        for channel, version in new_versions.items():
+            if channel in values:
+                type_, blob = self.serde.dumps_typed(values[channel])
+            else:
+                type_, blob = "empty", None
+            rows.append((thread_id, checkpoint_ns, channel, str(version), type_, blob))
+
+        if rows:
+            async with self.lock:
+                await self.conn.executemany(
+                    "INSERT OR REPLACE INTO checkpoint_blobs (thread_id, checkpoint_ns, channel, version, type, blob) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+
+        skeleton = {**checkpoint, "channel_values": {}}
+        next_config = await super().aput(config, skeleton, metadata, new_versions)
+
+        self._remember((thread_id, checkpoint_ns, checkpoint["id"]), checkpoint)
+        return next_config
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Get a checkpoint tuple with its full channel values"""
+        checkpoint_tuple = await super().aget_tuple(config)
+        if checkpoint_tuple is None:
+            return None
+        return await self._materialize(checkpoint_tuple)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        """List checkpoint tuples with their full channel values"""
+        async for checkpoint_tuple in super().alist(config, filter=filter, before=before, limit=limit):
+            yield await self._materialize(checkpoint_tuple)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Delete checkpoints, writes and channel blobs of a thread"""
+        await super().adelete_thread(thread_id)
+        async with self.lock:
+            await self.conn.execute("DELETE FROM checkpoint_blobs WHERE thread_id = ?", (str(thread_id),))
+            await self.conn.commit()
+
+        for key in [k for k in self._materialized if k[0] == str(thread_id)]:
+            del self._materialized[key]
+
+    async def _materialize(self, checkpoint_tuple: CheckpointTuple) -> CheckpointTuple:
+        """Fill channel_values from the blob table (or the materialized cache)"""
+        configurable = checkpoint_tuple.config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint = checkpoint_tuple.checkpoint
+        key = (thread_id, checkpoint_ns, checkpoint["id"])
+
+        cached = self._materialized.get(key)
+        if cached is not None:
+            self._materialized.move_to_end(key)
+            return checkpoint_tuple._replace(checkpoint=copy_checkpoint(cached))
+
+        # Legacy full checkpoints carry their values; only look up the rest
+        values = dict(checkpoint["channel_values"])
+        wanted = [
+            (channel, str(version))
+            for channel, version in checkpoint["channel_versions"].items()
+            if channel not in values
+        ]
+        values.update(await self._load_blobs(thread_id, checkpoint_ns, wanted))
+
+        checkpoint = {**checkpoint, "channel_values": values}
+        self._remember(key, checkpoint)
+        return checkpoint_tuple._replace(checkpoint=copy_checkpoint(checkpoint))
+
+    async def _load_blobs(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        wanted: List[Tuple[str, str]]
+    ) -> Dict[str, Any]:
+        """
+        Load channel values for (channel, version) pairs
+        Runs without self.lock: alist() holds the lock while it yields
+        """
+        values: Dict[str, Any] = {}
+
+        # Stay below SQLite's bound parameter limit
+        chunk_size = 400
+        for start in range(0, len(wanted), chunk_size):
+            chunk = wanted[start:start + chunk_size]
+            placeholders = ", ".join("(?, ?)" for _ in chunk)
+            params: List[Any] = [thread_id, checkpoint_ns]
+            for channel, version in chunk:
+                params.extend((channel, version))
+
+            async with self.conn.execute(
+                f"SELECT channel, type, blob FROM checkpoint_blobs WHERE thread_id = ? AND checkpoint_ns = ? AND (channel, version) IN (VALUES {placeholders})",
+                params
+            ) as cur:
+                async for channel, type_, blob in cur:
+                    if type_ != "empty":
+                        values[channel] = self.serde.loads_typed((type_, blob))
+
+        return values
+
+    def _remember(self, key: Tuple[str, str, str], checkpoint: Checkpoint) -> None:
+        """Keep a materialized checkpoint in the LRU cache"""
+        if self.cache_size <= 0:
+            return
+
+        self._materialized[key] = copy_checkpoint(checkpoint)
+        self._materialized.move_to_end(key)
+        while len(self._materialized) > self.cache_size:
+            self._materialized.popitem(last=False)
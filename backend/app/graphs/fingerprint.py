@@ -0,0 +1,134 @@
+"""
+Incremental fingerprinting of WorkflowState fields for cache keys
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from backend.app.core.config import settings
+
+_SCALARS = (str, int, float, bool, type(None))
+_MISSING = object()
+
+
+class KeyField(NamedTuple):
+    """A state value that takes part in a cache key"""
+    name: str  # Label in the composed key
+    path: Tuple[str, ...]  # Lookup path into the state, e.g. ("context", "aggregation")
+    default: Any = None  # Value used when the path is missing
+    unordered: bool = False  # Sort list values before hashing
+
+
+def key_field(path: str, default: Any = None, unordered: bool = False, name: Optional[str] = None) -> KeyField:
+    """Build a KeyField from a dotted state path"""
+    return KeyField(name or path, tuple(path.split(".")), default, unordered)
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _canonical(value: Any, unordered: bool) -> bytes:
+    """Stable byte encoding of a JSON-like value"""
+    if unordered and isinstance(value, (list, tuple, set, frozenset)):
+        value = sorted(value, key=repr)
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+
+class StateFingerprinter:
+    """
+    Memoizes per-field digests of state values by object identity
+
+    LangGraph hands every node the same channel objects until a node writes
+    that channel, so a container value (e.g. analysis.kpi_summary) is only
+    serialized and hashed again after it is replaced. The memo keeps a
+    reference to each hashed object so its id cannot be reused while the
+    entry is alive. Values mutated in place after being fingerprinted are
+    not detected; nodes return new values instead of mutating state.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._memo: "OrderedDict[Tuple[int, bool], Tuple[Any, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+
+    def field_digest(self, value: Any, unordered: bool = False) -> bytes:
+        """Digest of a single state value"""
+        if isinstance(value, _SCALARS):
+            # Cheaper to hash directly than to memoize
+            return _digest(_canonical(value, unordered))
+
+        memo_key = (id(value), unordered)
+        with self._lock:
+            cached = self._memo.get(memo_key)
+            if cached is not None and cached[0] is value:
+                self._memo.move_to_end(memo_key)
+                self.hits += 1
+                return cached[1]
+
+        digest = _digest(_canonical(value, unordered))
+        with self._lock:
+            self.misses += 1
+            self._memo[memo_key] = (value, digest)
+            self._memo.move_to_end(memo_key)
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+        return digest
+
+    def fingerprint(self, state: Dict[str, Any], fields: Iterable[KeyField]) -> str:
+        """Compose the digests of the given fields into one hex key"""
+        combined = hashlib.blake2b(digest_size=16)
+        for field in fields:
+            value = _resolve(state, field.path)
+            if value is _MISSING:
+                value = field.default
+            combined.update(field.name.encode())
+            combined.update(b"=")
+            combined.update(self.field_digest(value, field.unordered))
+        return combined.hexdigest()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memo.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._memo),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def _resolve(state: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    """Follow a path through nested dicts; None values count as missing"""
+    value: Any = state
+    for part in path:
+        if not isinstance(value, dict):
+            return _MISSING
+        value = value.get(part)
+        if value is None:
+            return _MISSING
+    return value
+
+
+# Process-wide fingerprinter
+_fingerprinter = StateFingerprinter(max_entries=settings.LANGGRAPH_FINGERPRINT_MEMO_SIZE)
+
+
+def get_fingerprinter() -> StateFingerprinter:
+    """Get the process-wide state fingerprinter"""
+    return _fingerprinter
+
+
+def fingerprint_state(state: Dict[str, Any], fields: Iterable[KeyField]) -> str:
+    """Fingerprint state fields with the process-wide fingerprinter"""
+    return _fingerprinter.fingerprint(state, fields)
@@ -1,15 +1,19 @@
 """
 Main LangGraph workflow orchestrator
 """
-from typing import Dict, Any, List, Literal
+import asyncio
+from contextlib import AsyncExitStack
+from pathlib import Path
+from typing import Dict, Any, List, Literal, Optional
 from datetime import datetime
 from langgraph.graph import StateGraph, END, START
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.prebuilt import ToolNode
 from langgraph.graph import add_messages
 
-from backend.app.graphs.state import WorkflowState
-from backend.app.graphs.cache_policies import NODE_CACHE_POLICIES
+from backend.app.graphs.state import WorkflowState, make_message
+from backend.app.graphs.checkpointer import DeltaCheckpointSaver
+from backend.app.graphs.node_cache import cached_node
 from backend.app.graphs.nodes import (
     analyze_sales_node,
     targeting_node,
@@ -19,6 +23,8 @@ from backend.app.graphs.nodes import (
 )
 from backend.app.core.config import settings
 from backend.app.core.logging import get_logger
+from backend.app.db.database import AsyncSessionLocal
+from backend.app.scheduling import plan_visits
 
 logger = get_logger(__name__)
 
@@ -51,39 +57,62 @@ async def merge_insights_node(state: WorkflowState) -> Dict[str, Any]:
     
     return {
         "strategy": merged_strategy,
-        "messages": state["messages"] + [{
-            "role": "assistant",
-            "content": "Analysis completed and insights merged successfully"
-        }]
+        "messages": [make_message("assistant", "Analysis completed and insights merged successfully")]
     }
 
 
 # Schedule proposal node
 async def schedule_node(state: WorkflowState) -> Dict[str, Any]:
     """
-    Propose optimal schedule based on targeting results
+    Propose visit slots for the top target clients in free time on the rep's calendar,
+    each day's visits ordered to minimize travel
+    context may set date_range ({"start", "end"} ISO dates), duration_minutes and preferred_times
     """
     logger.info("Generating schedule proposals")
     
     target_clients = state.get("targeting", {}).get("top_clients", [])
+    context = state.get("context") or {}
     
-    schedule_proposals = []
-    for i, client in enumerate(target_clients[:5]):  # Top 5 clients
-        schedule_proposals.append({
-            "client_id": client.get("id"),
-            "client_name": client.get("name"),
-            "proposed_date": f"2025-09-{10 + i:02d}",
-            "time_slot": "14:00-15:00",
-            "purpose": "Product presentation",
-            "priority": client.get("priority", "medium")
-        })
+    try:
+        async with AsyncSessionLocal() as session:
+            plan = await plan_visits(
+                session,
+                state.get("user_id"),
+                target_clients[:settings.SCHEDULE_MAX_PROPOSALS],
+                date_range=context.get("date_range"),
+                duration_minutes=context.get("duration_minutes"),
+                preferred_times=context.get("preferred_times")
+            )
+    except Exception as e:
+        logger.error(f"Error in schedule proposal: {str(e)}", exc_info=True)
+        return {
+            "errors": state.get("errors", []) + [{
+                "node": "schedule",
+                "error": str(e),
+                "timestamp": datetime.utcnow().isoformat()
+            }]
+        }
+    
+    schedule_proposals = plan["proposed_slots"]
+    logger.info(
+        "Schedule proposals generated",
+        proposals=len(schedule_proposals),
+        events=len(plan["existing_events"]),
+        conflicts=len(plan["conflicts"]),
+        travel_km=plan["travel_km"],
+        optimization_score=plan["optimization_score"]
+    )
     
+    message = f"Generated {len(schedule_proposals)} schedule proposals"
+    if plan["travel_km"]:
+        message += f" ({plan['travel_km']} km of travel between visits)"
+    if plan["conflicts"]:
+        message += f"; {len(plan['conflicts'])} overlapping events found on the calendar"
     return {
         "schedule_proposal": schedule_proposals,
-        "messages": state["messages"] + [{
-            "role": "assistant",
-            "content": f"Generated {len(schedule_proposals)} schedule proposals"
-        }]
+        "existing_events": plan["existing_events"],
+        "schedule_conflicts": plan["conflicts"],
+        "messages": [make_message("assistant", message)]
     }
 
 
@@ -109,10 +138,7 @@ async def client_intel_node(state: WorkflowState) -> Dict[str, Any]:
     
     return {
         "client_intel": client_intel,
-        "messages": state["messages"] + [{
-            "role": "assistant",
-            "content": f"Gathered intelligence for {len(client_intel)} clients"
-        }]
+        "messages": [make_message("assistant", f"Gathered intelligence for {len(client_intel)} clients")]
     }
 
 
@@ -128,10 +154,7 @@ async def human_review_node(state: WorkflowState) -> Dict[str, Any]:
     # For now, we'll mark it as reviewed
     return {
         "needs_human_review": False,
-        "messages": state["messages"] + [{
-            "role": "system",
-            "content": "Human review completed - proceeding with approved changes"
-        }]
+        "messages": [make_message("system", "Human review completed - proceeding with approved changes")]
     }
 
 
@@ -164,12 +187,10 @@ async def finalize_node(state: WorkflowState) -> Dict[str, Any]:
             "strategy": state.get("strategy"),
             "documents": state.get("draft_doc"),
             "schedule": state.get("schedule_proposal"),
+            "schedule_conflicts": state.get("schedule_conflicts"),
             "compliance": state.get("compliance_result")
         },
-        "messages": state["messages"] + [{
-            "role": "assistant",
-            "content": "Workflow completed successfully. All artifacts are ready."
-        }]
+        "messages": [make_message("assistant", "Workflow completed successfully. All artifacts are ready.")]
     }
 
 
@@ -180,35 +201,39 @@ def create_main_graph() -> StateGraph:
     # Initialize the graph
     graph = StateGraph(WorkflowState)
     
-    # Add nodes
-    graph.add_node("analyze_sales", analyze_sales_node)
-    graph.add_node("targeting", targeting_node)
-    graph.add_node("policy_rag", policy_rag_node)
-    graph.add_node("merge_insights", merge_insights_node)  # Deferred node
-    graph.add_node("schedule", schedule_node)
-    graph.add_node("client_intel", client_intel_node)
-    graph.add_node("generate_document", generate_document_node)
-    graph.add_node("compliance_check", compliance_check_node)
-    graph.add_node("human_review", human_review_node)
-    graph.add_node("finalize", finalize_node)
+    # Add nodes (wrapped by the node cache according to NODE_CACHE_POLICIES)
+    nodes = {
+        "analyze_sales": analyze_sales_node,
+        "target_clients": targeting_node,
+        "policy_rag": policy_rag_node,
+        "merge_insights": merge_insights_node,  # Deferred node
+        "schedule": schedule_node,
+        "gather_client_intel": client_intel_node,
+        "generate_document": generate_document_node,
+        "compliance_check": compliance_check_node,
+        "human_review": human_review_node,
+        "finalize": finalize_node,
+    }
+    for node_name, node_func in nodes.items():
+        graph.add_node(node_name, cached_node(node_name, node_func))
     
     # Set entry point
     graph.set_entry_point("analyze_sales")
     
     # Add parallel execution edges (fan-out)
     graph.add_edge(START, "analyze_sales")
-    graph.add_edge(START, "targeting")
+    graph.add_edge(START, "target_clients")
     graph.add_edge(START, "policy_rag")
     
     # Add edges to deferred merge node (fan-in)
     graph.add_edge("analyze_sales", "merge_insights")
-    graph.add_edge("targeting", "merge_insights")
+    graph.add_edge("target_clients", "merge_insights")
     graph.add_edge("policy_rag", "merge_insights")
     
     # Sequential execution after merge
     graph.add_edge("merge_insights", "schedule")
-    graph.add_edge("schedule", "client_intel")
-    graph.add_edge("client_intel", "generate_document")
+    graph.add_edge("schedule", "gather_client_intel")
+    graph.add_edge("gather_client_intel", "generate_document")
     graph.add_edge("generate_document", "compliance_check")
     
     # Conditional routing based on compliance
@@ -231,15 +256,10 @@ def create_main_graph() -> StateGraph:
     return graph
 
 
-async def compile_graph_with_features():
+async def compile_graph_with_features(checkpointer: Optional[BaseCheckpointSaver] = None):
     """
     Compile the graph with caching, checkpointing, and other features
     """
-    # Create checkpointer for persistence
-    checkpointer = AsyncSqliteSaver.from_conn_string(
-        f"{settings.LANGGRAPH_CHECKPOINT_DIR}/workflow.db"
-    )
-    
     # Create the graph
     graph = create_main_graph()
     
@@ -250,15 +270,64 @@ async def compile_graph_with_features():
         debug=settings.DEBUG
     )
     
-    # Note: In LangGraph 0.6.6, node caching would be configured here
-    # but the exact API may vary. This is a placeholder for the caching setup
+    # Node caching is applied per node in create_main_graph (see node_cache.py)
     
-    logger.info("Graph compiled with checkpointing and interrupts")
+    logger.info("Graph compiled with checkpointing, interrupts and node caching")
     
     return compiled
 
 
+# Process-wide compiled graph and its long-lived checkpointer
+_workflow_graph = None
+_checkpointer_stack: Optional[AsyncExitStack] = None
+_workflow_graph_lock = asyncio.Lock()
+
+
+async def init_workflow_graph():
+    """
+    Compile the workflow graph once and open the shared checkpointer
+    Called from the FastAPI lifespan; safe to call more than once
+    """
+    global _workflow_graph, _checkpointer_stack
+    
+    async with _workflow_graph_lock:
+        if _workflow_graph is not None:
+            return _workflow_graph
+        
+        checkpoint_dir = Path(settings.LANGGRAPH_CHECKPOINT_DIR)
+        checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        
+        stack = AsyncExitStack()
+        try:
+            checkpointer = await stack.enter_async_context(
+                DeltaCheckpointSaver.from_conn_string(str(checkpoint_dir / "workflow.db"))
+            )
+            await checkpointer.setup()
+            _workflow_graph = await compile_graph_with_features(checkpointer)
+        except Exception:
+            await stack.aclose()
+            raise
+        
+        _checkpointer_stack = stack
+        logger.info("Workflow graph initialized", checkpoint_dir=str(checkpoint_dir))
+    
+    return _workflow_graph
+
+
+async def close_workflow_graph():
+    """Close the shared checkpointer and drop the compiled graph"""
+    global _workflow_graph, _checkpointer_stack
+    
+    async with _workflow_graph_lock:
+        if _checkpointer_stack is not None:
+            await _checkpointer_stack.aclose()
+        _workflow_graph = None
+        _checkpointer_stack = None
+
+
 # Export the compiled graph
 async def get_workflow_graph():
-    """Get the compiled workflow graph"""
-    return await compile_graph_with_features()
\ No newline at end of file
+    """Get the process-wide compiled workflow graph"""
+    if _workflow_graph is None:
+        return await init_workflow_graph()
+    return _workflow_graph
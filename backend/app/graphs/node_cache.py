@@ -0,0 +1,480 @@
+"""
+In-process node result cache for LangGraph nodes
+"""
+import asyncio
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from backend.app.core.config import settings
+from backend.app.core.logging import get_logger
+from backend.app.graphs.cache_backends import CacheBackend, NodeCacheCodec, remaining_ttl
+from backend.app.graphs.cache_policies import get_cache_policy, create_redis_cache_key
+from backend.app.graphs.cache_tags import DataEvent, TagIndex, event_tag_groups
+from backend.app.graphs.single_flight import get_single_flight
+
+logger = get_logger(__name__)
+
+NodeFunc = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class LRUTTLCache:
+    """
+    Bounded LRU cache with per-entry TTL and hit/miss/eviction counters
+    Entries may carry a stale window after their TTL during which lookup()
+    still returns them, flagged as stale
+    on_remove is called with the key of every entry that is evicted,
+    expires, or is deleted
+    """
+
+    def __init__(self, max_entries: int = 1024, on_remove: Optional[Callable[[str], None]] = None):
+        self.max_entries = max_entries
+        self.on_remove = on_remove
+        self._entries: "OrderedDict[str, Tuple[float, float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def lookup(self, key: str) -> Tuple[Optional[Any], bool]:
+        """Return (value, is_stale), or (None, False) if missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+
+            expires_at, stale_until, value = entry
+            if stale_until <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                self._removed(key)
+                return None, False
+
+            self._entries.move_to_end(key)
+            if expires_at <= now:
+                self.stale_hits += 1
+                return value, True
+
+            self.hits += 1
+            return value, False
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing, stale or expired"""
+        value, stale = self.lookup(key)
+        return None if stale else value
+
+    def set(self, key: str, value: Any, ttl: float, stale_ttl: float = 0) -> None:
+        """
+        Store a value for ttl seconds (plus stale_ttl seconds of stale grace),
+        evicting least recently used entries
+        """
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (expires_at, expires_at + max(stale_ttl, 0), value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                self._removed(evicted)
+
+    def delete(self, key: str) -> bool:
+        """Remove a single entry"""
+        with self._lock:
+            removed = self._entries.pop(key, None) is not None
+            if removed:
+                self._removed(key)
+            return removed
+
+    def clear(self) -> None:
+        """Remove all entries (counters are kept)"""
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+            for key in keys:
+                self._removed(key)
+
+    def _removed(self, key: str) -> None:
+        if self.on_remove is not None:
+            self.on_remove(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache statistics for monitoring"""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+        }
+
+
+class TieredNodeCache:
+    """
+    Two-tier node cache: in-process L1 backed by an optional shared L2
+    L2 hits populate L1 for the entry's remaining TTL, so workers sharing
+    the L2 store warm each other up
+    Entries carry data dependency tags (see cache_tags); invalidate() drops
+    the entries a data change affects from both tiers and broadcasts the
+    change so other workers drop them from their L1
+    """
+
+    def __init__(
+        self,
+        l1: LRUTTLCache,
+        l2: Optional[CacheBackend] = None,
+        codec: Optional[NodeCacheCodec] = None
+    ):
+        self.l1 = l1
+        self.l2 = l2
+        self.codec = codec or NodeCacheCodec()
+        self.tags = TagIndex()
+        self.l1.on_remove = self.tags.remove
+        self._listener: Optional["asyncio.Task[None]"] = None
+        self._observers: List[Callable[[List[DataEvent]], Any]] = []
+
+        # L2 counters
+        self.l2_hits = 0
+        self.l2_stale_hits = 0
+        self.l2_misses = 0
+        self.l2_writes = 0
+        self.invalidated = 0
+
+    async def lookup(self, key: str) -> Tuple[Optional[Any], bool]:
+        """Look up L1, then L2; returns (entry, is_stale)"""
+        entry, stale = self.l1.lookup(key)
+        if entry is not None or self.l2 is None:
+            return entry, stale
+
+        data = await self.l2.get(key)
+        if data is None:
+            self.l2_misses += 1
+            return None, False
+
+        try:
+            entry, expires_at, stale_until, tags = self.codec.decode(data)
+        except Exception as e:
+            logger.warning("Discarding undecodable L2 cache entry", key=key, error=str(e))
+            self.l2_misses += 1
+            return None, False
+
+        ttl = remaining_ttl(expires_at)
+        if remaining_ttl(stale_until) <= 0:
+            self.l2_misses += 1
+            return None, False
+
+        stale = ttl <= 0
+        if stale:
+            self.l2_stale_hits += 1
+        else:
+            self.l2_hits += 1
+
+        self.l1.set(key, entry, ttl, stale_until - expires_at)
+        self.tags.add(key, tags)
+        return entry, stale
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Look up a fresh entry in L1, then L2"""
+        entry, stale = await self.lookup(key)
+        return None if stale else entry
+
+    async def set(
+        self,
+        key: str,
+        entry: Any,
+        ttl: int,
+        stale_ttl: int = 0,
+        tags: Optional[List[str]] = None
+    ) -> None:
+        """Write through to both tiers"""
+        self.l1.set(key, entry, ttl, stale_ttl)
+        self.tags.add(key, tags or [])
+
+        if self.l2 is None:
+            return
+
+        expires_at = time.time() + ttl
+        try:
+            data = self.codec.encode(entry, expires_at, expires_at + stale_ttl, tags)
+        except Exception as e:
+            logger.warning("Node cache entry is not serializable, kept in L1 only", key=key, error=str(e))
+            return
+
+        await self.l2.set(key, data, ttl + stale_ttl, tags or ())
+        self.l2_writes += 1
+
+    def add_invalidation_observer(self, observer: Callable[[List[DataEvent]], Any]) -> None:
+        """
+        Also pass this worker's data change events to another in-process
+        cache (local and broadcast invalidations alike; idempotent)
+        """
+        if observer not in self._observers:
+            self._observers.append(observer)
+
+    def invalidate_local(self, events: List[DataEvent]) -> int:
+        """Drop L1 entries that depend on the changed data"""
+        removed = 0
+        for event in events:
+            for key in self.tags.match(event):
+                removed += self.l1.delete(key)
+        self.invalidated += removed
+        for observer in self._observers:
+            observer(events)
+        return removed
+
+    async def invalidate(self, events: List[DataEvent]) -> int:
+        """Drop entries that depend on the changed data from both tiers"""
+        removed = self.invalidate_local(events)
+        if self.l2 is None or not events:
+            return removed
+
+        keys: Set[str] = set()
+        for event in events:
+            keys |= await self.l2.match_tags(event_tag_groups(event))
+        if keys:
+            await self.l2.delete(*keys)
+        await self.l2.publish_invalidation(events)
+
+        logger.info("Node cache invalidated", events=len(events), l1=removed, l2=len(keys))
+        return removed + len(keys)
+
+    def start_invalidation_listener(self) -> None:
+        """Apply invalidations broadcast by other workers to this L1"""
+        if self.l2 is None or self._listener is not None:
+            return
+        self._listener = asyncio.ensure_future(self.l2.listen_invalidations(self.invalidate_local))
+
+    async def delete(self, key: str) -> None:
+        """Remove an entry from both tiers"""
+        self.l1.delete(key)
+        if self.l2 is not None:
+            await self.l2.delete(key)
+
+    async def close(self) -> None:
+        """Stop the invalidation listener, detach and close the L2 backend"""
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+        if self.l2 is not None:
+            await self.l2.close()
+            self.l2 = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache statistics for monitoring"""
+        return {
+            "l1": self.l1.stats(),
+            "tagged": len(self.tags),
+            "invalidated": self.invalidated,
+            "l2": {
+                "enabled": self.l2 is not None,
+                "hits": self.l2_hits,
+                "stale_hits": self.l2_stale_hits,
+                "misses": self.l2_misses,
+                "writes": self.l2_writes
+            }
+        }
+
+
+class Revalidator:
+    """
+    Background refreshes for stale-while-revalidate cache entries
+    At most max_concurrent refreshes run at once; further stale serves skip
+    the refresh (the next stale hit retries) instead of queueing
+    """
+
+    def __init__(self, max_concurrent: int = 4):
+        self.max_concurrent = max_concurrent
+        self._tasks: Dict[str, "asyncio.Task[Any]"] = {}
+
+        # Counters
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def schedule(self, key: str, refresh: Callable[[], Awaitable[Any]]) -> bool:
+        """Start a background refresh for key unless one is running or the cap is hit"""
+        if key in self._tasks:
+            return False
+
+        if len(self._tasks) >= self.max_concurrent:
+            self.skipped += 1
+            return False
+
+        self._tasks[key] = asyncio.ensure_future(self._run(key, refresh))
+        self.started += 1
+        return True
+
+    async def _run(self, key: str, refresh: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await refresh()
+            self.completed += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.warning("Background cache refresh failed", key=key, error=str(e))
+        finally:
+            self._tasks.pop(key, None)
+
+    async def aclose(self) -> None:
+        """Cancel running refreshes"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": len(self._tasks),
+            "max_concurrent": self.max_concurrent,
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "skipped": self.skipped
+        }
+
+
+# Process-wide node cache
+_node_cache = TieredNodeCache(LRUTTLCache(max_entries=settings.LANGGRAPH_CACHE_MAX_ENTRIES))
+_revalidator = Revalidator(max_concurrent=settings.LANGGRAPH_CACHE_MAX_REFRESHES)
+
+
+def get_node_cache() -> TieredNodeCache:
+    """Get the process-wide node cache"""
+    return _node_cache
+
+
+def get_revalidator() -> Revalidator:
+    """Get the process-wide stale-while-revalidate refresher"""
+    return _revalidator
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Node cache, coalescing and revalidation statistics for monitoring"""
+    return {
+        **_node_cache.stats(),
+        "single_flight": get_single_flight().stats(),
+        "revalidation": _revalidator.stats()
+    }
+
+
+def configure_node_cache_l2(backend: CacheBackend) -> None:
+    """Attach a shared L2 backend to the process-wide node cache"""
+    _node_cache.l2 = backend
+    _node_cache.start_invalidation_listener()
+    logger.info("Node cache L2 backend configured", backend=type(backend).__name__)
+
+
+async def close_node_cache() -> None:
+    """Stop background refreshes and release the L2 backend"""
+    await _revalidator.aclose()
+    await _node_cache.close()
+
+
+def _to_entry(update: Any, state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Convert a node update into a cacheable entry
+    Messages are stored as the delta the node appended, without ids, so a
+    hit replays them as new messages on top of the caller's own history
+    """
+    if not isinstance(update, dict) or update is state:
+        # Nodes return the input state unchanged when they fail
+        return None
+
+    values = {k: v for k, v in update.items() if k != "messages"}
+    new_messages: Optional[List[Any]] = None
+
+    if "messages" in update:
+        produced = list(update["messages"] or [])
+        history = state.get("messages") or []
+        if history and produced[:len(history)] == history:
+            # Node returned the full history instead of only its new messages
+            produced = produced[len(history):]
+        new_messages = [
+            {k: v for k, v in message.items() if k != "id"} if isinstance(message, dict) else message
+            for message in produced
+        ]
+
+    return copy.deepcopy({"values": values, "messages": new_messages})
+
+
+def _materialize(entry: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild a node update from a cached entry for the current state"""
+    update = copy.deepcopy(entry["values"])
+
+    if entry["messages"] is not None:
+        # The append_messages reducer assigns fresh ids
+        update["messages"] = copy.deepcopy(entry["messages"])
+
+    return update
+
+
+def cached_node(node_name: str, node_func: NodeFunc, cache: Optional[TieredNodeCache] = None) -> NodeFunc:
+    """
+    Wrap a node so its results are served from the node cache
+    Concurrent misses for the same key share one computation (single-flight);
+    stale entries within the policy's stale_ttl are served while a background
+    task refreshes them
+    Nodes without a cache policy are returned unchanged
+    """
+    policy = get_cache_policy(node_name)
+    if policy is None:
+        return node_func
+
+    @wraps(node_func)
+    async def wrapper(state: Dict[str, Any]) -> Dict[str, Any]:
+        if not policy.should_cache(state):
+            return await node_func(state)
+
+        store = cache if cache is not None else get_node_cache()
+        key = create_redis_cache_key(node_name, policy.key_func(state))
+
+        async def compute() -> Tuple[Any, Optional[Dict[str, Any]], Dict[str, Any]]:
+            update = await node_func(state)
+            computed = _to_entry(update, state)
+            if computed is not None and not update.get("errors"):
+                await store.set(key, computed, policy.ttl, policy.stale_ttl, policy.dependency_tags(state))
+            return update, computed, state
+
+        entry, stale = await store.lookup(key)
+        if entry is not None:
+            if stale:
+                logger.debug("Serving stale node cache entry", node=node_name, key=key)
+                get_revalidator().schedule(key, lambda: get_single_flight().do(key, compute))
+            else:
+                logger.debug("Node cache hit", node=node_name, key=key)
+            return _materialize(entry, state)
+
+        update, computed, origin = await get_single_flight().do(key, compute)
+
+        if computed is None:
+            # Uncacheable result (the node's input state, or not a dict): it only
+            # fits the caller that ran the node, so coalesced callers run it themselves
+            if origin is state:
+                return update
+            logger.debug("Uncacheable node result, re-running for coalesced caller", node=node_name, key=key)
+            return await node_func(state)
+
+        return _materialize(computed, state)
+
+    return wrapper
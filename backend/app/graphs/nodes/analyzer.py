@@ -3,8 +3,21 @@ Analytics and KPI calculation nodes
 """
 from typing import Dict, Any, List
 from datetime import datetime, timedelta
-from backend.app.graphs.state import WorkflowState, AnalyticsState
+from backend.app.graphs.state import WorkflowState, AnalyticsState, make_message
+from backend.app.core.config import settings
 from backend.app.core.logging import get_logger
+from backend.app.analytics import pivot_monthly, summarize_trends, trailing_months
+from backend.app.analytics.partials import (
+    PartialFilter,
+    aggregate_partials,
+    analysis_months,
+    client_product_matrix,
+    kpi_months,
+    kpis_from_partials,
+    load_partials
+)
+from backend.app.db.analytics import aggregate_sales, client_product_monthly_sales
+from backend.app.db.database import AsyncSessionLocal
 from backend.app.graphs.hooks import apply_pre_hooks, apply_post_hooks
 
 logger = get_logger(__name__)
@@ -23,53 +36,69 @@ async def analyze_sales_node(state: WorkflowState) -> Dict[str, Any]:
         client_ids = state.get("client_ids", [])
         period = state.get("period", {})
         
-        # TODO: Implement actual database queries
-        # This is a mock implementation
-        
-        # Calculate mock metrics
-        total_revenue = 150000000  # 150M KRW
-        total_quantity = 1500
-        num_clients = len(client_ids) if client_ids else 25
-        
-        # Mock sales by client
-        sales_by_client = []
-        if client_ids:
-            for client_id in client_ids[:5]:  # Top 5 clients
-                sales_by_client.append({
-                    "client_id": client_id,
-                    "client_name": f"Client {client_id}",
-                    "revenue": total_revenue / 5,
-                    "quantity": total_quantity / 5,
-                    "growth_rate": 0.15
-                })
-        
-        # Mock sales by product
-        sales_by_product = []
-        for product_code in product_codes[:3]:  # Top 3 products
-            sales_by_product.append({
-                "product_code": product_code,
-                "product_name": f"Product {product_code}",
-                "revenue": total_revenue / 3,
-                "quantity": total_quantity / 3,
-                "market_share": 0.25
-            })
+        end = period.get("end")
+        months = trailing_months(end, settings.ANALYTICS_TREND_MONTHS) if end else []
+        
+        async with AsyncSessionLocal() as session:
+            if period.get("start") and end:
+                # Every window is assembled from cached per-month partials;
+                # only months not cached yet are read from the monthly rollup, in one query
+                partials = await load_partials(
+                    session,
+                    state.get("user_id"),
+                    analysis_months(period, settings.ANALYTICS_TREND_MONTHS)
+                )
+                cell_filter = await PartialFilter.build(session, product_codes, client_ids)
+                aggregate = await aggregate_partials(
+                    session,
+                    partials,
+                    period,
+                    cell_filter,
+                    limit=settings.ANALYTICS_BREAKDOWN_LIMIT
+                )
+                keys, revenue, _ = await client_product_matrix(session, partials, months, cell_filter)
+            else:
+                # Totals and breakdowns are aggregated by the database in one query
+                aggregate = await aggregate_sales(
+                    session,
+                    rep_user_id=state.get("user_id"),
+                    period=period,
+                    product_codes=product_codes,
+                    client_ids=client_ids,
+                    limit=settings.ANALYTICS_BREAKDOWN_LIMIT
+                )
+                
+                # Trends over every client x product series of the trailing window
+                series_rows = await client_product_monthly_sales(
+                    session,
+                    rep_user_id=state.get("user_id"),
+                    start=months[0],
+                    end=months[-1],
+                    product_codes=product_codes,
+                    client_ids=client_ids
+                ) if months else []
+                keys, revenue, _ = pivot_monthly(series_rows, months)
+        
+        trend_report = summarize_trends(
+            [{"client_id": client_id, "product_code": code} for client_id, code, _ in keys],
+            [client_type for _, _, client_type in keys],
+            revenue,
+            months
+        )
+        
+        total_revenue = aggregate["kpi_summary"]["total_revenue"]
         
         # Create analysis result
         analysis = {
             "kpi_summary": {
-                "total_revenue": total_revenue,
-                "total_quantity": total_quantity,
-                "num_clients": num_clients,
-                "avg_deal_size": total_revenue / num_clients if num_clients > 0 else 0,
+                **aggregate["kpi_summary"],
                 "period": period
             },
-            "sales_by_client": sales_by_client,
-            "sales_by_product": sales_by_product,
-            "trends": {
-                "revenue_trend": "increasing",
-                "growth_areas": ["hospital", "clinic"],
-                "declining_areas": ["pharmacy"]
-            }
+            "sales_by_client": aggregate["sales_by_client"],
+            "sales_by_product": aggregate["sales_by_product"],
+            "trends": trend_report["trends"],
+            "trend_analysis": trend_report["trend_analysis"],
+            "seasonality": trend_report["seasonality"]
         }
         
         # Apply post-hooks
@@ -79,10 +108,7 @@ async def analyze_sales_node(state: WorkflowState) -> Dict[str, Any]:
         
         return {
             "analysis": analysis,
-            "messages": state["messages"] + [{
-                "role": "assistant",
-                "content": f"Sales analysis completed. Total revenue: {total_revenue:,} KRW"
-            }]
+            "messages": [make_message("assistant", f"Sales analysis completed. Total revenue: {total_revenue:,.0f} KRW")]
         }
         
     except Exception as e:
@@ -104,45 +130,24 @@ async def calculate_kpi_node(state: AnalyticsState) -> Dict[str, Any]:
     
     try:
         # Extract current period data
-        period = state.get("period", {})
-        current_year = int(period.get("end", "202412")[:4])
-        current_month = int(period.get("end", "202412")[4:6])
-        
-        # TODO: Implement actual KPI calculations with database
-        # Mock calculations
+        period = state.get("period") or {}
+        end = period.get("end", "202412")
+        period = {"start": period.get("start", f"{end[:4]}01"), "end": end}
         
-        # Year-over-Year (YoY) growth
-        current_revenue = 150000000
-        previous_year_revenue = 130000000
-        yoy_growth = ((current_revenue - previous_year_revenue) / previous_year_revenue) * 100
+        # Monthly totals come from cached per-month partials shared with
+        # analyze_sales_node, so overlapping periods only read new months
+        async with AsyncSessionLocal() as session:
+            partials = await load_partials(session, state.get("user_id"), kpi_months(period))
+            cell_filter = await PartialFilter.build(session, state.get("product_codes"), state.get("client_ids"))
+        kpis = kpis_from_partials(partials, period, cell_filter)
         
-        # Year-to-Date (YTD) achievement
-        ytd_revenue = current_revenue * (current_month / 12)
-        ytd_target = 200000000 * (current_month / 12)
-        ytd_achievement = (ytd_revenue / ytd_target) * 100 if ytd_target > 0 else 0
-        
-        # Monthly target achievement
-        monthly_target = 20000000
-        monthly_revenue = current_revenue / current_month
-        target_achievement_rate = (monthly_revenue / monthly_target) * 100
+        yoy_growth = kpis["yoy_growth"]
+        ytd_achievement = kpis["ytd_achievement"]
+        target_achievement_rate = kpis["target_achievement_rate"]
         
         # Detailed KPI results
         kpi_details = {
-            "yoy_growth": round(yoy_growth, 2),
-            "ytd_achievement": round(ytd_achievement, 2),
-            "target_achievement_rate": round(target_achievement_rate, 2),
-            "metrics": {
-                "current_revenue": current_revenue,
-                "ytd_revenue": ytd_revenue,
-                "ytd_target": ytd_target,
-                "monthly_avg": monthly_revenue,
-                "quarterly_performance": {
-                    "Q1": current_revenue * 0.2,
-                    "Q2": current_revenue * 0.25,
-                    "Q3": current_revenue * 0.3,
-                    "Q4": current_revenue * 0.25
-                }
-            },
+            **kpis,
             "insights": {
                 "performance_status": "on_track" if target_achievement_rate >= 90 else "below_target",
                 "growth_status": "positive" if yoy_growth > 0 else "negative",
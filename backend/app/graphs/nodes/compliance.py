@@ -3,7 +3,7 @@ Compliance checking and auto-fix nodes
 """
 from typing import Dict, Any, List
 from datetime import datetime
-from backend.app.graphs.state import WorkflowState, ComplianceState
+from backend.app.graphs.state import WorkflowState, ComplianceState, make_message
 from backend.app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -115,10 +115,7 @@ async def compliance_check_node(state: WorkflowState) -> Dict[str, Any]:
             "compliance_result": compliance_result,
             "is_compliant": status == "green",
             "needs_human_review": status == "yellow",
-            "messages": state["messages"] + [{
-                "role": "assistant",
-                "content": f"Compliance check completed: {status}. Found {len(violations)} violations."
-            }]
+            "messages": [make_message("assistant", f"Compliance check completed: {status}. Found {len(violations)} violations.")]
         }
         
     except Exception as e:
@@ -3,7 +3,7 @@ Document generation nodes
 """
 from typing import Dict, Any
 from datetime import datetime
-from backend.app.graphs.state import WorkflowState, DocumentState
+from backend.app.graphs.state import WorkflowState, DocumentState, make_message
 from backend.app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -89,10 +89,7 @@ async def generate_document_node(state: WorkflowState) -> Dict[str, Any]:
         
         return {
             "draft_doc": draft_doc,
-            "messages": state["messages"] + [{
-                "role": "assistant",
-                "content": f"Generated {doc_type} document successfully"
-            }]
+            "messages": [make_message("assistant", f"Generated {doc_type} document successfully")]
         }
         
     except Exception as e:
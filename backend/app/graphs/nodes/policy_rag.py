@@ -2,7 +2,7 @@
 Policy and regulation RAG (Retrieval-Augmented Generation) nodes
 """
 from typing import Dict, Any, List
-from backend.app.graphs.state import WorkflowState
+from backend.app.graphs.state import WorkflowState, make_message
 from backend.app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -68,10 +68,7 @@ async def policy_rag_node(state: WorkflowState) -> Dict[str, Any]:
         
         return {
             "policy_context": policy_context,
-            "messages": state["messages"] + [{
-                "role": "assistant",
-                "content": f"Retrieved {len(policy_results)} relevant policies and regulations"
-            }]
+            "messages": [make_message("assistant", f"Retrieved {len(policy_results)} relevant policies and regulations")]
         }
         
     except Exception as e:
@@ -1,96 +1,116 @@
 """
 Targeting and whitespace analysis nodes
 """
+from datetime import datetime
 from typing import Dict, Any, List
-from backend.app.graphs.state import WorkflowState
+from backend.app.analytics.lookalike import find_lookalikes
+from backend.app.analytics.partials import lookup_by_id
+from backend.app.analytics.scoring import load_client_features, top_targets
+from backend.app.analytics.whitespace import find_whitespace, load_purchase_matrix
+from backend.app.graphs.state import WorkflowState, make_message
+from backend.app.core.config import settings
 from backend.app.core.logging import get_logger
+from backend.app.db.database import AsyncSessionLocal
+from backend.app.db.models import Client
 
 logger = get_logger(__name__)
 
+# Top targets whose lookalikes among the rep's clients are listed
+_LOOKALIKE_SEEDS = 3
+
+
+async def _whitespace(session, state: WorkflowState) -> Dict[str, List[Dict[str, Any]]]:
+    """Segment whitespace of the rep's clients, with client names on the gap clients"""
+    matrix = await load_purchase_matrix(session, state.get("period"))
+    whitespace = find_whitespace(matrix, state.get("user_id"))
+    names = await lookup_by_id(session, Client.id, (Client.name,), [c["client_id"] for c in whitespace["clients"]])
+    for client in whitespace["clients"]:
+        client["client_name"] = names.get(client["client_id"], (None,))[0]
+    return whitespace
+
 
 async def targeting_node(state: WorkflowState) -> Dict[str, Any]:
     """
-    Identify target clients based on analysis
+    Identify target clients based on analysis, with the segment whitespace
+    of the rep's clients and lookalikes of the best targets
     """
     logger.info("Starting targeting analysis")
     
     try:
-        analysis = state.get("analysis", {})
-        kpi_summary = analysis.get("kpi_summary", {})
-        
-        # Mock targeting logic
-        top_clients = [
-            {
-                "id": 1,
-                "name": "Seoul Medical Center",
-                "score": 95,
-                "potential_revenue": 50000000,
-                "priority": "high",
-                "reason": "High growth potential and strategic location"
-            },
-            {
-                "id": 2,
-                "name": "Busan Clinic",
-                "score": 85,
-                "potential_revenue": 30000000,
-                "priority": "medium",
-                "reason": "Steady purchase history"
-            },
-            {
-                "id": 3,
-                "name": "Daegu Pharmacy",
-                "score": 75,
-                "potential_revenue": 20000000,
-                "priority": "medium",
-                "reason": "Expanding operations"
-            }
-        ]
-        
-        whitespace_opportunities = [
-            {
-                "segment": "Private Clinics",
-                "potential_clients": 15,
-                "estimated_revenue": 75000000,
-                "penetration_rate": 0.3
-            },
-            {
-                "segment": "Regional Hospitals",
-                "potential_clients": 8,
-                "estimated_revenue": 120000000,
-                "penetration_rate": 0.2
-            }
-        ]
+        # Score the rep's whole portfolio in one vectorized pass, keeping the top k
+        async with AsyncSessionLocal() as session:
+            features = await load_client_features(session, state.get("user_id"), state.get("period"))
+            top_clients = top_targets(features, settings.TARGETING_TOP_K)
+            whitespace = await _whitespace(session, state)
+            similar = await find_lookalikes(
+                session, [c["id"] for c in top_clients[:_LOOKALIKE_SEEDS]], owner_user_id=state.get("user_id")
+            )
+        whitespace_opportunities = whitespace["opportunities"]
         
         targeting_result = {
             "top_clients": top_clients,
             "whitespace_opportunities": whitespace_opportunities,
+            "whitespace_clients": whitespace["clients"],
+            # The rep's clients most like the best targets
+            "lookalikes": [
+                {"client_id": c["id"], "name": c["name"], "similar_clients": similar[c["id"]]}
+                for c in top_clients[:_LOOKALIKE_SEEDS]
+                if c["id"] in similar
+            ],
             "total_potential": sum(c["potential_revenue"] for c in top_clients),
-            "recommended_focus": "Private Clinics" if kpi_summary.get("total_revenue", 0) < 200000000 else "Regional Hospitals"
+            "recommended_focus": whitespace_opportunities[0]["segment"] if whitespace_opportunities else None
         }
         
-        logger.info(f"Identified {len(top_clients)} target clients")
+        logger.info(f"Identified {len(top_clients)} target clients", scored=len(features["client_id"]))
         
         return {
             "targeting": targeting_result,
             "client_ids": [c["id"] for c in top_clients],
-            "messages": state["messages"] + [{
-                "role": "assistant",
-                "content": f"Targeting analysis complete. Identified {len(top_clients)} priority clients."
-            }]
+            "messages": [make_message("assistant", f"Targeting analysis complete. Identified {len(top_clients)} priority clients.")]
         }
         
     except Exception as e:
-        logger.error(f"Error in targeting analysis: {str(e)}")
-        return state
+        logger.error(f"Error in targeting analysis: {str(e)}", exc_info=True)
+        return {
+            "errors": state.get("errors", []) + [{
+                "node": "target_clients",
+                "error": str(e),
+                "timestamp": datetime.utcnow().isoformat()
+            }]
+        }
 
 
 async def find_whitespace_node(state: WorkflowState) -> Dict[str, Any]:
     """
     Find whitespace opportunities in the market
+    Products the rep's clients' segment peers buy but they do not, from the
+    sparse purchase matrix (see analytics.whitespace)
     """
     logger.info("Finding whitespace opportunities")
     
-    # This would typically analyze market data and existing client coverage
-    # Mock implementation for now
-    
-    return state
\ No newline at end of file
+    try:
+        async with AsyncSessionLocal() as session:
+            whitespace = await _whitespace(session, state)
+        
+        targeting = {
+            **state.get("targeting", {}),
+            "whitespace_opportunities": whitespace["opportunities"],
+            "whitespace_clients": whitespace["clients"]
+        }
+        
+        logger.info(f"Found {len(whitespace['opportunities'])} whitespace segments")
+        
+        return {
+            "targeting": targeting,
+            "messages": [make_message("assistant", f"Whitespace analysis complete. Found {len(whitespace['opportunities'])} segments with untapped products.")]
+        }
+        
+    except Exception as e:
+        logger.error(f"Error in whitespace analysis: {str(e)}", exc_info=True)
+        return {
+            "errors": state.get("errors", []) + [{
+                "node": "find_whitespace",
+                "error": str(e),
+                "timestamp": datetime.utcnow().isoformat()
+            }]
+        }
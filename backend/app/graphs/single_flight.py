@@ -0,0 +1,92 @@
+"""
+Single-flight request coalescing for cacheable graph nodes
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from backend.app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class _Call:
+    """An in-flight computation and the number of callers awaiting it"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one in-flight computation
+    All waiters receive the same result, or the same exception
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+
+        # Counters
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run func for key, or join the computation already running for key
+        The computation runs in its own task so a cancelled caller does not
+        cancel it for the others; it is cancelled once no waiters remain
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task, key=key, call=call: self._forget(key, call))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+            logger.debug("Joined in-flight computation", key=key, waiters=call.waiters + 1)
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call) -> None:
+        """Drop a finished computation so the next caller starts a fresh one"""
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+        # Mark the exception as retrieved even if every waiter went away
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def in_flight(self, key: str) -> bool:
+        """Whether a computation is currently running for key"""
+        return key in self._calls
+
+    def waiter_counts(self) -> Dict[str, int]:
+        """Number of callers awaiting each in-flight key"""
+        return {key: call.waiters for key, call in self._calls.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        """Coalescing statistics for monitoring"""
+        return {
+            "in_flight": len(self._calls),
+            "waiters": sum(call.waiters for call in self._calls.values()),
+            "executions": self.executions,
+            "coalesced": self.coalesced
+        }
+
+
+# Process-wide single-flight group for node computations
+_single_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    """Get the process-wide single-flight group"""
+    return _single_flight
@@ -1,9 +1,144 @@
 """
 LangGraph State Definitions
 """
-from typing import TypedDict, List, Dict, Any, Optional, Annotated
+import threading
+from collections.abc import Sequence
+from typing import TypedDict, List, Dict, Any, Iterable, Iterator, Optional, Annotated, Tuple, Union
 from datetime import datetime
-from langgraph.graph import add_messages
+from itertools import islice
+from uuid import uuid4
+
+
+class MessageLog(Sequence):
+    """
+    Immutable message history over an append-only list shared by successive
+    versions of a thread's history, each seeing its first `length` entries
+    Appending to the newest version extends the shared list in place and
+    returns a new view, so a step costs O(new messages) while earlier
+    versions (e.g. checkpoints still being serialized) never change.
+    Appending to an older version (a forked history) or replacing a message
+    copies the list first. The id -> position index is shared the same way.
+    Checkpoints store it as a plain list (see checkpointer.CompressedSerializer).
+    """
+    
+    __slots__ = ("_items", "_index", "_length")
+    
+    def __init__(self, messages: Iterable[Any] = ()):
+        self._items = list(messages)
+        self._length = len(self._items)
+        self._index: Dict[str, int] = {}
+        for position, message in enumerate(self._items):
+            message_id = _message_id(message)
+            if message_id is not None:
+                self._index[message_id] = position
+    
+    @classmethod
+    def _view(cls, items: List[Any], index: Dict[str, int], length: int) -> "MessageLog":
+        log = cls.__new__(cls)
+        log._items, log._index, log._length = items, index, length
+        return log
+    
+    def __len__(self) -> int:
+        return self._length
+    
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, slice):
+            return self._items[:self._length][key]
+        if key < 0:
+            key += self._length
+        if not 0 <= key < self._length:
+            raise IndexError("message index out of range")
+        return self._items[key]
+    
+    def __iter__(self) -> Iterator[Any]:
+        return islice(self._items, self._length)
+    
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, (list, tuple, MessageLog)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+    
+    __hash__ = None  # type: ignore[assignment]
+    
+    def __add__(self, other: Iterable[Any]) -> List[Any]:
+        return list(self) + list(other)
+    
+    def __radd__(self, other: Iterable[Any]) -> List[Any]:
+        return list(other) + list(self)
+    
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (MessageLog, (list(self),))
+    
+    def __repr__(self) -> str:
+        return f"MessageLog({list(self)!r})"
+    
+    def extended(self, messages: List[Any]) -> "MessageLog":
+        """
+        New version with messages appended, or replacing the message with the
+        same id in place
+        """
+        with _extend_lock:
+            if self._length == len(self._items):
+                items, index = self._items, self._index
+            else:
+                # Another version already extended the shared list: fork it
+                items = self._items[:self._length]
+                index = {k: v for k, v in self._index.items() if v < self._length}
+            
+            for message in messages:
+                message_id = _message_id(message)
+                position = index.get(message_id) if message_id is not None else None
+                if position is None or position >= len(items):
+                    if message_id is not None:
+                        index[message_id] = len(items)
+                    items.append(message)
+                elif items[position] is not message:
+                    if items is self._items:
+                        # Earlier versions see this position: copy before writing
+                        items, index = items[:], dict(index)
+                    items[position] = message
+            
+            return MessageLog._view(items, index, len(items))
+
+
+# Serializes the check-and-extend of a shared message list
+_extend_lock = threading.Lock()
+
+
+def make_message(role: str, content: str, **extra: Any) -> Dict[str, Any]:
+    """Create a message dict with a unique id"""
+    return {"id": str(uuid4()), "role": role, "content": content, **extra}
+
+
+def _message_id(message: Any) -> Optional[str]:
+    if isinstance(message, dict):
+        return message.get("id")
+    return getattr(message, "id", None)
+
+
+def append_messages(left: Optional[Sequence[Any]], right: Union[List[Any], Dict[str, Any]]) -> Sequence[Any]:
+    """
+    Reducer for the append-only message channel
+    Nodes return only their new messages. A message whose id is already in
+    the history replaces it in place (dedupe); others are appended. Work is
+    proportional to the new messages only: the history is a MessageLog
+    extended without copying (see MessageLog).
+    """
+    if not isinstance(right, list):
+        right = [right]
+    if left is None:
+        left = []
+    if not right:
+        return left
+    
+    if not isinstance(left, MessageLog):
+        # History restored from a checkpoint: index it once
+        left = MessageLog(left)
+    
+    return left.extended([
+        {**message, "id": str(uuid4())} if isinstance(message, dict) and not message.get("id") else message
+        for message in right
+    ])
 
 
 class WorkflowState(TypedDict):
@@ -13,7 +148,7 @@ class WorkflowState(TypedDict):
     user_id: int
     session_id: str
     thread_id: str
-    messages: Annotated[List[Dict], add_messages]
+    messages: Annotated[List[Dict], append_messages]  # Nodes return only new messages
     
     # User input
     query: str
@@ -35,6 +170,8 @@ class WorkflowState(TypedDict):
     
     # Schedule and planning
     schedule_proposal: List[Dict[str, Any]]  # Proposed schedule slots
+    existing_events: List[Dict[str, Any]]  # Rep's calendar events in the scheduling horizon
+    schedule_conflicts: List[Dict[str, Any]]  # Overlapping events already on the calendar
     selected_slots: List[Dict[str, Any]]  # User-selected slots
     
     # Client intelligence
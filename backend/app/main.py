@@ -10,10 +10,17 @@ import structlog
 
 from backend.app.core.config import settings
 from backend.app.core.logging import get_logger
-from backend.app.db.database import init_db, close_db
-
-# Import routers (will be created next)
-# from backend.app.api.routers import auth, workflow, analytics, documents, compliance, clients
+from backend.app.analytics import init_sales_cube
+from backend.app.db.database import AsyncSessionLocal, init_db, close_db
+from backend.app.db.rollup import register_rollup_maintenance
+from backend.app.graphs.cache_backends import RedisCacheBackend
+from backend.app.graphs.cache_invalidation import register_cache_invalidation
+from backend.app.graphs.main_graph import init_workflow_graph, close_workflow_graph
+from backend.app.graphs.node_cache import configure_node_cache_l2, close_node_cache
+
+# Import routers
+from backend.app.api.routers import workflow, analytics
+# from backend.app.api.routers import auth, documents, compliance, clients
 
 logger = get_logger(__name__)
 
@@ -29,13 +36,35 @@ async def lifespan(app: FastAPI):
         await init_db()
         logger.info("Database initialized")
     
+    # Share node cache results across workers through Redis
+    if settings.LANGGRAPH_CACHE_L2_ENABLED:
+        configure_node_cache_l2(RedisCacheBackend.from_url(settings.REDIS_URL))
+    
+    # Keep the monthly sales rollup in step with Sales writes
+    register_rollup_maintenance()
+    
+    # Drop cached node results when the data they were computed from changes
+    register_cache_invalidation()
+    
+    # Map the latest sales cube snapshot and catch up on newer rows
+    if settings.ANALYTICS_CUBE_ENABLED:
+        async with AsyncSessionLocal() as session:
+            cube = await init_sales_cube(session, settings.ANALYTICS_CUBE_DIR)
+        logger.info("Sales cube ready", rows=len(cube))
+    
+    # Compile the workflow graph once and open the shared checkpointer
+    await init_workflow_graph()
+    logger.info("Workflow graph ready")
+    
     # Initialize other services here
-    # TODO: Initialize ChromaDB, Redis, etc.
+    # TODO: Initialize ChromaDB, etc.
     
     yield
     
     # Shutdown
     logger.info("Shutting down application")
+    await close_workflow_graph()
+    await close_node_cache()
     await close_db()
 
 
@@ -120,10 +149,10 @@ async def health_check():
     }
 
 
-# Include routers (uncomment when created)
+# Include routers (uncomment the rest when created)
 # app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
-# app.include_router(workflow.router, prefix="/api/workflow", tags=["Workflow"])
-# app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"])
+app.include_router(workflow.router, prefix="/api/workflow", tags=["Workflow"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"])
 # app.include_router(documents.router, prefix="/api/documents", tags=["Documents"])
 # app.include_router(compliance.router, prefix="/api/compliance", tags=["Compliance"])
 # app.include_router(clients.router, prefix="/api/clients", tags=["Clients"])
@@ -0,0 +1,18 @@
+"""
+Calendar-aware visit scheduling and daily routes
+"""
+from .intervals import BusyIntervals
+from .proposals import WINDOW_NAMES, parse_time_windows, plan_visits, propose_slots
+from .routes import get_territory_cache, haversine_matrix, optimize_route, route_proposals
+
+__all__ = [
+    "BusyIntervals",
+    "WINDOW_NAMES",
+    "get_territory_cache",
+    "haversine_matrix",
+    "optimize_route",
+    "parse_time_windows",
+    "plan_visits",
+    "propose_slots",
+    "route_proposals"
+]
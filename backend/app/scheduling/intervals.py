@@ -0,0 +1,132 @@
+"""
+Interval index of busy calendar time
+
+BusyIntervals keeps a calendar's busy time as sorted, disjoint [start, end)
+intervals (minutes since the epoch) in two arrays, merged once when built.
+A max segment tree over the free gaps between consecutive intervals makes
+every query O(log n) however many events the calendar holds:
+    is_free     - whether [start, end) is free (one binary search)
+    first_free  - earliest free slot of a duration in a window (a binary
+                  search, then a tree descent to the first long enough gap)
+add() merges an accepted slot in; it is O(n) (array insert and tree
+rebuild) and only runs once per proposal.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_EPOCH = datetime(1970, 1, 1)
+# Length of the gap after the last interval
+_UNBOUNDED = np.iinfo(np.int64).max
+
+
+def to_minutes(moment: datetime) -> int:
+    """Minutes since the epoch of a naive datetime"""
+    return (moment - _EPOCH) // timedelta(minutes=1)
+
+
+def from_minutes(minutes: int) -> datetime:
+    return _EPOCH + timedelta(minutes=int(minutes))
+
+
+def overlapping(starts: np.ndarray, ends: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    (i, j) index pairs of intervals where i starts before j, an interval
+    started earlier (the one reaching furthest), has ended
+    """
+    if not len(starts):
+        return []
+    order = np.lexsort((ends, starts))
+    sorted_ends = ends[order]
+    reach = np.maximum.accumulate(sorted_ends)
+    # Position of the interval holding the running end
+    holder = np.maximum.accumulate(np.where(sorted_ends == reach, np.arange(len(order)), 0))
+    clash = np.flatnonzero(starts[order][1:] < reach[:-1]) + 1
+    return list(zip(order[clash].tolist(), order[holder[clash - 1]].tolist()))
+
+
+class BusyIntervals:
+    """Sorted, disjoint busy intervals with a max segment tree over the gaps between them"""
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray):
+        self.starts = starts
+        self.ends = ends
+        self._build_tree()
+
+    @classmethod
+    def from_intervals(cls, starts: Sequence[int], ends: Sequence[int]) -> "BusyIntervals":
+        """Union of possibly overlapping intervals; touching ones are merged"""
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        keep = ends > starts
+        starts, ends = starts[keep], ends[keep]
+        if not len(starts):
+            return cls(starts, ends)
+
+        order = np.argsort(starts, kind="stable")
+        starts, ends = starts[order], ends[order]
+        reach = np.maximum.accumulate(ends)
+        first = np.flatnonzero(np.concatenate([[True], starts[1:] > reach[:-1]]))
+        return cls(starts[first], np.maximum.reduceat(ends, first))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _build_tree(self) -> None:
+        count = len(self.starts)
+        self._size = 1 << max(count - 1, 0).bit_length()
+        tree = np.zeros(2 * self._size, dtype=np.int64)
+        if count:
+            tree[self._size:self._size + count - 1] = self.starts[1:] - self.ends[:-1]
+            tree[self._size + count - 1] = _UNBOUNDED
+            width = self._size
+            while width > 1:
+                tree[width // 2:width] = tree[width:2 * width].reshape(-1, 2).max(axis=1)
+                width //= 2
+        # Lists: scalar indexing during the descent is much faster than on arrays
+        self._tree = tree.tolist()
+        self._starts = self.starts.tolist()
+        self._ends = self.ends.tolist()
+
+    def _first_gap(self, index: int, length: int) -> int:
+        """First interval at or after index followed by a gap of at least length"""
+        tree, size = self._tree, self._size
+        position = index + size
+        if tree[position] < length:
+            # Climb until a right sibling holds a long enough gap, then descend into it
+            while not (position % 2 == 0 and tree[position + 1] >= length):
+                position //= 2
+            position += 1
+            while position < size:
+                position = 2 * position if tree[2 * position] >= length else 2 * position + 1
+        return position - size
+
+    def _after(self, moment: int) -> int:
+        """Index of the first interval ending after moment"""
+        return int(np.searchsorted(self.ends, moment, side="right"))
+
+    def is_free(self, start: int, end: int) -> bool:
+        index = self._after(start)
+        return index == len(self._starts) or self._starts[index] >= end
+
+    def first_free(self, window_start: int, window_end: int, duration: int) -> Optional[int]:
+        """Start of the earliest free [t, t + duration) inside the window, None if there is none"""
+        index = self._after(window_start)
+        if index == len(self._starts) or self._starts[index] >= window_start + duration:
+            start = window_start
+        else:
+            start = self._ends[self._first_gap(index, duration)]
+        return start if start + duration <= window_end else None
+
+    def add(self, start: int, end: int) -> None:
+        """Mark [start, end) busy"""
+        if end <= start:
+            return
+        first = int(np.searchsorted(self.ends, start, side="left"))
+        last = int(np.searchsorted(self.starts, end, side="right"))
+        if first < last:
+            start, end = min(start, self._starts[first]), max(end, self._ends[last - 1])
+        self.starts = np.concatenate([self.starts[:first], [start], self.starts[last:]])
+        self.ends = np.concatenate([self.ends[:first], [end], self.ends[last:]])
+        self._build_tree()
@@ -0,0 +1,201 @@
+"""
+Visit slot proposals against a rep's calendar
+
+The rep's events in the horizon are read in one range query on
+idx_events_user_date and turned into a BusyIntervals index, padded by
+SCHEDULE_BUFFER_MINUTES on each side for travel. Each client, in priority
+order, gets the earliest slot of the requested duration on the first
+working day (with room under SCHEDULE_MAX_VISITS_PER_DAY) that has one in
+a preferred time window, tried in the order given; an accepted slot is
+added to the index so later clients cannot take it. Each slot lookup is
+O(log n) in the number of events.
+
+Preferred times are "HH:MM-HH:MM" windows, "HH:MM" exact start times or
+one of WINDOW_NAMES. Overlapping events already on the calendar are
+reported as conflicts. Each day's visits are then ordered along a short
+route (see scheduling.routes).
+"""
+import re
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.core.config import settings
+from backend.app.db.models import Event
+from backend.app.scheduling.intervals import BusyIntervals, from_minutes, overlapping, to_minutes
+from backend.app.scheduling.routes import route_proposals
+
+WINDOW_NAMES = {"morning": "09:00-12:00", "afternoon": "13:00-18:00", "evening": "18:00-20:00"}
+
+_TIME = re.compile(r"^([01]?\d|2[0-3]):([0-5]\d)$")
+# Events starting this long before the horizon are still read, in case they run into it
+_MAX_EVENT_SPAN = timedelta(days=7)
+
+
+def _clock(value: str) -> int:
+    match = _TIME.match(value.strip())
+    if not match:
+        raise ValueError(f"Invalid time of day: {value!r} (expected HH:MM)")
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+
+def parse_time_windows(preferred_times: Optional[Sequence[str]], duration: int) -> List[Tuple[int, int]]:
+    """(start, end) minutes after midnight of each preferred time, in the given order; the workday by default"""
+    windows = []
+    for value in preferred_times or [settings.SCHEDULE_WORKDAY]:
+        value = WINDOW_NAMES.get(value.strip().lower(), value)
+        if "-" in value:
+            start, end = (_clock(part) for part in value.split("-", 1))
+        else:
+            start = _clock(value)
+            end = start + duration
+        if end <= start:
+            raise ValueError(f"Empty time window: {value!r}")
+        windows.append((start, end))
+    return windows
+
+
+def working_days(first: date, last: date) -> List[date]:
+    """Monday to Friday dates from first to last inclusive"""
+    return [first + timedelta(days=i) for i in range((last - first).days + 1) if (first + timedelta(days=i)).weekday() < 5]
+
+
+def date_range_days(date_range: Optional[Dict[str, str]], today: Optional[date] = None) -> List[date]:
+    """Working days of a {"start", "end"} ISO date range; the next SCHEDULE_HORIZON_DAYS from tomorrow by default"""
+    today = today or date.today()
+    start = date.fromisoformat(date_range["start"]) if date_range and date_range.get("start") else today + timedelta(days=1)
+    end = date.fromisoformat(date_range["end"]) if date_range and date_range.get("end") else start + timedelta(days=settings.SCHEDULE_HORIZON_DAYS - 1)
+    return working_days(start, end)
+
+
+async def load_events(session: AsyncSession, user_id: int, start: datetime, end: datetime) -> List[Tuple[Any, ...]]:
+    """(id, client id, title, starts_at, ends_at) of the user's events overlapping [start, end), cancelled ones excluded"""
+    result = await session.execute(
+        select(Event.id, Event.client_id, Event.title, Event.starts_at, Event.ends_at)
+        .where(Event.user_id == user_id)
+        .where(Event.starts_at >= start - _MAX_EVENT_SPAN, Event.starts_at < end)
+        .where(Event.ends_at > start)
+        .where(or_(Event.status.is_(None), Event.status != "cancelled"))
+    )
+    return result.all()
+
+
+def _conflicts(events: List[Tuple[Any, ...]], starts: np.ndarray, ends: np.ndarray) -> List[Dict[str, Any]]:
+    return [
+        {
+            "event_id": events[i][0],
+            "title": events[i][2],
+            "starts_at": events[i][3].isoformat(),
+            "ends_at": events[i][4].isoformat(),
+            "overlaps_event_id": events[j][0]
+        }
+        for i, j in overlapping(starts, ends)
+    ]
+
+
+def propose_slots(
+    busy: BusyIntervals,
+    clients: Sequence[Dict[str, Any]],
+    days: Sequence[date],
+    windows: Sequence[Tuple[int, int]],
+    duration: int,
+    buffer: int = 0,
+    max_per_day: Optional[int] = None,
+    not_before: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """
+    A slot per client (in the order given, skipping clients with no free
+    slot), earliest day first, windows in preference order; busy (padded
+    by buffer around every entry) is updated with the accepted slots
+    """
+    max_per_day = max_per_day or settings.SCHEDULE_MAX_VISITS_PER_DAY
+    earliest = to_minutes(not_before) if not_before else None
+    day_starts = [to_minutes(datetime.combine(day, time())) for day in days]
+    booked = [0] * len(days)
+
+    proposals = []
+    for client in clients:
+        slot = None
+        for d, day_start in enumerate(day_starts):
+            if booked[d] >= max_per_day:
+                continue
+            for window_start, window_end in windows:
+                start = day_start + window_start
+                if earliest is not None:
+                    start = max(start, earliest)
+                found = busy.first_free(start, day_start + window_end, duration)
+                if found is not None:
+                    slot = (d, found)
+                    break
+            if slot is not None:
+                break
+        if slot is None:
+            continue
+
+        d, start = slot
+        busy.add(start - buffer, start + duration + buffer)
+        booked[d] += 1
+        starts_at, ends_at = from_minutes(start), from_minutes(start + duration)
+        proposals.append({
+            "client_id": client.get("id"),
+            "client_name": client.get("name"),
+            "proposed_date": starts_at.date().isoformat(),
+            "time_slot": f"{starts_at:%H:%M}-{ends_at:%H:%M}",
+            "starts_at": starts_at.isoformat(),
+            "ends_at": ends_at.isoformat(),
+            "purpose": "Product presentation",
+            "priority": client.get("priority", "medium")
+        })
+    return proposals
+
+
+async def plan_visits(
+    session: AsyncSession,
+    user_id: int,
+    clients: Sequence[Dict[str, Any]],
+    date_range: Optional[Dict[str, str]] = None,
+    duration_minutes: Optional[int] = None,
+    preferred_times: Optional[Sequence[str]] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Proposed visit slots for the clients on the user's calendar, routed
+    per day, with the calendar's conflicts and the route's travel_km;
+    keys follow graphs.state.ScheduleState
+    """
+    now = now or datetime.now()
+    duration = duration_minutes or settings.SCHEDULE_DURATION_MINUTES
+    buffer = settings.SCHEDULE_BUFFER_MINUTES
+    windows = parse_time_windows(preferred_times, duration)
+    days = date_range_days(date_range, now.date())
+    if not days:
+        return {"proposed_slots": [], "conflicts": [], "existing_events": [], "optimization_score": 0.0, "travel_km": 0.0}
+
+    horizon_start = datetime.combine(days[0], time())
+    horizon_end = datetime.combine(days[-1] + timedelta(days=1), time())
+    events = await load_events(session, user_id, horizon_start, horizon_end)
+    starts = np.fromiter((to_minutes(event[3]) for event in events), dtype=np.int64, count=len(events))
+    ends = np.fromiter((to_minutes(event[4]) for event in events), dtype=np.int64, count=len(events))
+
+    busy = BusyIntervals.from_intervals(starts - buffer, ends + buffer)
+    proposals = propose_slots(busy, clients, days, windows, duration, buffer, not_before=now)
+    route = await route_proposals(session, user_id, proposals)
+    return {
+        "proposed_slots": route["proposed_slots"],
+        "optimization_score": route["optimization_score"],
+        "travel_km": route["travel_km"],
+        "conflicts": _conflicts(events, starts, ends),
+        "existing_events": [
+            {
+                "event_id": event_id,
+                "client_id": client_id,
+                "title": title,
+                "starts_at": starts_at.isoformat(),
+                "ends_at": ends_at.isoformat()
+            }
+            for event_id, client_id, title, starts_at, ends_at in events
+        ]
+    }
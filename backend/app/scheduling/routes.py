@@ -0,0 +1,357 @@
+"""
+Daily visit routes over cached territory distance matrices
+
+A rep's territory is the clients they own that have coordinates. Its
+pairwise great-circle distances (haversine, km, float32) are computed in
+row blocks of one vectorized pass and kept in TerritoryDistanceCache, an
+LRU bounded by SCHEDULE_ROUTE_CACHE_CELLS; client change events for the
+rep (coordinates or ownership) drop it. A territory larger than
+SCHEDULE_ROUTE_MAX_TERRITORY keeps only its coordinates, and stops outside
+the territory are located with one query; their distances are computed
+directly.
+
+Each day's visits are an open path (there is no depot, the day starts at
+its first client). Nearest neighbour builds one from every start in turn,
+then 2-opt improves the best, each pass over a segment start vectorized
+over all segment ends; a dummy stop at zero distance from every other
+closes the path into a tour, so 2-opt also moves the endpoints. Extra
+starts and 2-opt stop at a deadline SCHEDULE_ROUTE_BUDGET_MS after the
+plan's routing began, shared by all its days. A route is never longer than
+the proposed order. The day's slots keep their times; clients are assigned
+to them in route order.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.core.config import settings
+from backend.app.db.models import Client
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Matrix rows per haversine block
+_BLOCK_ROWS = 1024
+# Shortest saving (km) that counts as a 2-opt improvement
+_EPSILON = 1e-4
+
+
+def haversine_matrix(
+    latitudes: Sequence[float],
+    longitudes: Sequence[float],
+    other_latitudes: Optional[Sequence[float]] = None,
+    other_longitudes: Optional[Sequence[float]] = None
+) -> np.ndarray:
+    """Great-circle distances in km from each point to each other point (degrees); within the first set by default"""
+    lat_a = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon_a = np.radians(np.asarray(longitudes, dtype=np.float64))
+    if other_latitudes is None:
+        lat_b, lon_b = lat_a, lon_a
+    else:
+        lat_b = np.radians(np.asarray(other_latitudes, dtype=np.float64))
+        lon_b = np.radians(np.asarray(other_longitudes, dtype=np.float64))
+
+    distance = np.empty((len(lat_a), len(lat_b)), dtype=np.float32)
+    cos_b = np.cos(lat_b)
+    for start in range(0, len(lat_a), _BLOCK_ROWS):
+        stop = start + _BLOCK_ROWS
+        lat, lon = lat_a[start:stop, None], lon_a[start:stop, None]
+        h = np.sin((lat_b - lat) / 2) ** 2 + np.cos(lat) * cos_b * np.sin((lon_b - lon) / 2) ** 2
+        distance[start:stop] = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+    return distance
+
+
+def path_length(distance: np.ndarray, order: Sequence[int]) -> float:
+    order = np.asarray(order, dtype=np.int64)
+    return float(distance[order[:-1], order[1:]].sum()) if len(order) > 1 else 0.0
+
+
+def nearest_neighbour(distance: np.ndarray, start: int) -> np.ndarray:
+    """Open path from start, always moving to the closest unvisited point"""
+    count = len(distance)
+    order = np.empty(count, dtype=np.int64)
+    order[0] = start
+    remaining = np.ones(count, dtype=bool)
+    remaining[start] = False
+    for step in range(1, count):
+        order[step] = np.argmin(np.where(remaining, distance[order[step - 1]], np.inf))
+        remaining[order[step]] = False
+    return order
+
+
+def two_opt(distance: np.ndarray, order: Sequence[int], deadline: float) -> np.ndarray:
+    """The open path improved by 2-opt moves until none shortens it or the deadline (perf_counter) passes"""
+    count = len(order)
+    if count < 3:
+        return np.asarray(order, dtype=np.int64)
+
+    # The dummy stop (last row) closes the path into a tour and stays at its head
+    closed = np.zeros((count + 1, count + 1), dtype=np.float64)
+    closed[:count, :count] = distance
+    tour = np.concatenate([[count], order]).astype(np.int64)
+    size = count + 1
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(size - 2):
+            # Reversing tour[i + 1:j + 1] swaps edges (a, b), (c, d) for (a, c), (b, d)
+            a, b = tour[i], tour[i + 1]
+            ends = np.arange(i + 2, size)
+            c, d = tour[ends], tour[(ends + 1) % size]
+            delta = closed[a, c] + closed[b, d] - closed[a, b] - closed[c, d]
+            best = int(np.argmin(delta))
+            if delta[best] < -_EPSILON:
+                j = i + 2 + best
+                tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1].copy()
+                improved = True
+            if time.perf_counter() >= deadline:
+                break
+    return tour[1:]
+
+
+def optimize_route(distance: np.ndarray, deadline: float) -> np.ndarray:
+    """
+    Short open path through every point of a distance matrix: nearest
+    neighbour from each start (the first always, others until the
+    deadline), then 2-opt on the best; the given order if nothing is shorter
+    """
+    count = len(distance)
+    best = np.arange(count)
+    if count < 3:
+        return best
+
+    best_length = path_length(distance, best)
+    for start in range(count):
+        if start and time.perf_counter() >= deadline:
+            break
+        order = nearest_neighbour(distance, start)
+        length = path_length(distance, order)
+        if length < best_length - _EPSILON:
+            best, best_length = order, length
+    return two_opt(distance, best, deadline)
+
+
+class TerritoryDistances:
+    """A rep's clients with coordinates (by id) and, for small enough territories, their distance matrix"""
+
+    def __init__(self, client_ids: np.ndarray, latitudes: np.ndarray, longitudes: np.ndarray):
+        self.client_ids = client_ids
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.matrix = haversine_matrix(latitudes, longitudes) if len(client_ids) <= settings.SCHEDULE_ROUTE_MAX_TERRITORY else None
+
+    @classmethod
+    async def build(cls, session: AsyncSession, rep_user_id: int) -> "TerritoryDistances":
+        result = await session.execute(
+            select(Client.id, Client.latitude, Client.longitude)
+            .where(Client.owner_user_id == rep_user_id)
+            .where(Client.latitude.isnot(None), Client.longitude.isnot(None))
+            .order_by(Client.id)
+        )
+        rows = result.all()
+        return cls(
+            np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows)),
+            np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+        )
+
+    def __len__(self) -> int:
+        return len(self.client_ids)
+
+    @property
+    def cells(self) -> int:
+        # A territory without a matrix still costs an entry per client
+        return self.matrix.size if self.matrix is not None else max(len(self), 1)
+
+    def positions(self, client_ids: Sequence[int]) -> np.ndarray:
+        """Row of each client, -1 for clients outside the territory"""
+        ids = np.asarray(client_ids, dtype=np.int64)
+        rows = np.searchsorted(self.client_ids, ids)
+        found = rows < len(self.client_ids)
+        found[found] = self.client_ids[rows[found]] == ids[found]
+        return np.where(found, rows, -1)
+
+    def distances(self, rows: np.ndarray) -> np.ndarray:
+        """Distance matrix between territory rows"""
+        if self.matrix is not None:
+            return self.matrix[np.ix_(rows, rows)]
+        return haversine_matrix(self.latitudes[rows], self.longitudes[rows])
+
+
+class TerritoryDistanceCache:
+    """
+    LRU cache of territories per rep bounded by the distance matrix cells
+    held, with a TTL per entry and hit/miss/eviction counters
+    """
+
+    def __init__(self, max_cells: int, ttl: float):
+        self.max_cells = max_cells
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[float, TerritoryDistances]]" = OrderedDict()
+        self._cells = 0
+        # Bumped by every invalidation, so a territory read before one is not stored
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get(self, session: AsyncSession, rep_user_id: int) -> TerritoryDistances:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(rep_user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(rep_user_id)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._remove(rep_user_id)
+            self.misses += 1
+            generation = self._generation
+
+        territory = await TerritoryDistances.build(session, rep_user_id)
+        if territory.cells > self.max_cells:
+            return territory
+        with self._lock:
+            if generation != self._generation:
+                return territory
+            if rep_user_id in self._entries:
+                self._remove(rep_user_id)
+            self._entries[rep_user_id] = (time.monotonic() + self.ttl, territory)
+            self._cells += territory.cells
+            while self._cells > self.max_cells:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return territory
+
+    def _remove(self, rep_user_id: int) -> None:
+        _, territory = self._entries.pop(rep_user_id)
+        self._cells -= territory.cells
+
+    def invalidate(self, events: Sequence[Dict[str, Any]]) -> int:
+        """Drop the territories of client change events (node cache events); an event without a rep drops all"""
+        removed = 0
+        with self._lock:
+            for event in events:
+                if event.get("source") != "clients":
+                    continue
+                self._generation += 1
+                rep = event.get("rep")
+                for key in [key for key in self._entries if rep is None or key == rep]:
+                    self._remove(key)
+                    removed += 1
+            self.invalidations += removed
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._cells = 0
+            self._generation += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "cells": self._cells,
+            "max_cells": self.max_cells,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# Process-wide territory distances
+_territory_cache = TerritoryDistanceCache(settings.SCHEDULE_ROUTE_CACHE_CELLS, settings.SCHEDULE_ROUTE_CACHE_TTL)
+
+
+def get_territory_cache() -> TerritoryDistanceCache:
+    return _territory_cache
+
+
+async def _stop_distances(session: AsyncSession, rep_user_id: int, client_ids: List[int]) -> Tuple[List[int], np.ndarray]:
+    """The clients with coordinates and their distance matrix, from the rep's territory when it holds them all"""
+    territory = await _territory_cache.get(session, rep_user_id)
+    rows = territory.positions(client_ids)
+    if (rows >= 0).all():
+        return client_ids, territory.distances(rows)
+
+    result = await session.execute(
+        select(Client.id, Client.latitude, Client.longitude)
+        .where(Client.id.in_(client_ids))
+        .where(Client.latitude.isnot(None), Client.longitude.isnot(None))
+    )
+    located = {client_id: (latitude, longitude) for client_id, latitude, longitude in result.all()}
+    located_ids = [client_id for client_id in client_ids if client_id in located]
+    return located_ids, haversine_matrix(
+        [located[client_id][0] for client_id in located_ids],
+        [located[client_id][1] for client_id in located_ids]
+    )
+
+
+async def route_proposals(
+    session: AsyncSession,
+    rep_user_id: int,
+    proposals: Sequence[Dict[str, Any]],
+    budget_ms: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    The proposals in time order with each day's clients reassigned to its
+    slots along a short route; each gains route_position (in its day) and
+    travel_km from the previous stop (None for clients without coordinates,
+    which go last). Also returns the total travel_km, baseline_km (in the
+    proposed order) and optimization_score, the share of travel saved
+    """
+    deadline = time.perf_counter() + (budget_ms or settings.SCHEDULE_ROUTE_BUDGET_MS) / 1000
+    client_ids = list(dict.fromkeys(p["client_id"] for p in proposals if p.get("client_id") is not None))
+    located_ids, distance = await _stop_distances(session, rep_user_id, client_ids) if client_ids else ([], np.zeros((0, 0)))
+    row_of = {client_id: row for row, client_id in enumerate(located_ids)}
+
+    days: Dict[str, List[Dict[str, Any]]] = {}
+    for proposal in proposals:
+        days.setdefault(proposal["proposed_date"], []).append(proposal)
+
+    routed, travel, baseline = [], 0.0, 0.0
+    for day in sorted(days):
+        slots = sorted(days[day], key=lambda proposal: proposal["starts_at"])
+        stops = [proposal for proposal in slots if proposal.get("client_id") in row_of]
+        rows = np.array([row_of[proposal["client_id"]] for proposal in stops], dtype=np.int64)
+        day_distance = distance[np.ix_(rows, rows)]
+        order = optimize_route(day_distance, deadline)
+        baseline += path_length(day_distance, np.arange(len(stops)))
+        travel += path_length(day_distance, order)
+
+        visits = [stops[i] for i in order] + [proposal for proposal in slots if proposal.get("client_id") not in row_of]
+        for position, (slot, visit) in enumerate(zip(slots, visits)):
+            if position >= len(stops):
+                leg = None
+            else:
+                leg = round(float(day_distance[order[position - 1], order[position]]), 1) if position else 0.0
+            routed.append({
+                **visit,
+                "time_slot": slot["time_slot"],
+                "starts_at": slot["starts_at"],
+                "ends_at": slot["ends_at"],
+                "route_position": position + 1,
+                "travel_km": leg
+            })
+
+    return {
+        "proposed_slots": routed,
+        "travel_km": round(travel, 1),
+        "baseline_km": round(baseline, 1),
+        "optimization_score": round(1 - travel / baseline, 4) if baseline > 0 else 0.0
+    }
@@ -0,0 +1,178 @@
+"""
+Benchmark: analytics nodes across data scale tiers
+
+For each tier, recreates a temporary SQLite database, fills it with
+db.synthetic (deterministic for a seed) and times analyze_sales_node,
+calculate_kpi_node and targeting_node for the rep with the most sales over
+the last year of data, cold (in-process caches cleared before every run)
+and warm. Results, with the environment and data set sizes, are written as
+JSON for regression tracking.
+
+Tiers: 10k, 1m, 10m sales rows (10m takes several minutes to generate).
+
+Usage:
+    python backend/benchmarks/bench_analytics.py [--tiers 10k,1m,10m] [--repeat 5] [--seed 42] [--output bench_analytics.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+DB_PATH = Path(tempfile.mkdtemp()) / "bench_analytics.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+
+import numpy as np
+from sqlalchemy import func, select
+
+from backend.app.analytics.partials import get_partial_cache
+from backend.app.db.database import AsyncSessionLocal, Base, engine, init_db
+from backend.app.db.models import Sales
+from backend.app.db.synthetic import generate_synthetic_data
+from backend.app.graphs.nodes.analyzer import analyze_sales_node, calculate_kpi_node
+from backend.app.graphs.nodes.targeter import targeting_node
+
+TIERS = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+END = "202412"
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def environment() -> dict:
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sqlite": sqlite3.sqlite_version,
+        "numpy": np.__version__
+    }
+
+
+async def reset_database() -> None:
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+    async with engine.connect() as connection:
+        await connection.exec_driver_sql("VACUUM")
+    await init_db()
+
+
+async def busiest_rep() -> int:
+    async with AsyncSessionLocal() as session:
+        return await session.scalar(
+            select(Sales.rep_user_id).group_by(Sales.rep_user_id).order_by(func.count().desc(), Sales.rep_user_id).limit(1)
+        )
+
+
+async def time_node(name: str, node, state: dict, repeat: int, cold: bool) -> dict:
+    timings = []
+    for _ in range(repeat):
+        if cold:
+            get_partial_cache().clear()
+        started = time.perf_counter()
+        result = await node(dict(state))
+        timings.append((time.perf_counter() - started) * 1000)
+        assert not result.get("errors"), f"{name}: {result['errors']}"
+    return {
+        "runs": repeat,
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "max_ms": round(max(timings), 3)
+    }
+
+
+async def run_tier(tier: str, sales: int, args) -> dict:
+    await reset_database()
+    async with AsyncSessionLocal() as session:
+        data = await generate_synthetic_data(session, sales, end=END, seed=args.seed)
+    async with engine.connect() as connection:
+        await connection.exec_driver_sql("ANALYZE")
+
+    rep_user_id = await busiest_rep()
+    async with AsyncSessionLocal() as session:
+        rep_sales = await session.scalar(select(func.count()).where(Sales.rep_user_id == rep_user_id))
+    state = {
+        "user_id": rep_user_id,
+        "period": {"start": f"{END[:4]}01", "end": END},
+        "messages": [],
+        "errors": []
+    }
+
+    nodes = {}
+    for name, node in (
+        ("analyze_sales_node", analyze_sales_node),
+        ("calculate_kpi_node", calculate_kpi_node),
+        ("targeting_node", targeting_node)
+    ):
+        nodes[name] = {
+            "cold": await time_node(name, node, state, args.repeat, cold=True),
+            "warm": await time_node(name, node, state, args.repeat, cold=False)
+        }
+        print(
+            f"  {name:<20} cold {nodes[name]['cold']['median_ms']:10.1f}ms"
+            f"   warm {nodes[name]['warm']['median_ms']:10.1f}ms"
+        )
+
+    return {
+        "tier": tier,
+        "data": data,
+        "rep_user_id": rep_user_id,
+        "rep_sales": rep_sales,
+        "period": state["period"],
+        "nodes": nodes
+    }
+
+
+async def run(args) -> dict:
+    results = {"benchmark": "bench_analytics", "environment": environment(), "seed": args.seed, "tiers": []}
+    for tier in args.tiers:
+        print(f"\n=== {tier} ({TIERS[tier]:,} sales rows)")
+        result = await run_tier(tier, TIERS[tier], args)
+        print(
+            f"  generated in {result['data']['seconds']:.1f}s; rep {result['rep_user_id']} "
+            f"has {result['rep_sales']:,} sales rows"
+        )
+        results["tiers"].append(result)
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiers", default="10k,1m,10m", help=f"Comma-separated tiers out of {', '.join(TIERS)}")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_analytics.json", help="JSON results file")
+    args = parser.parse_args()
+
+    args.tiers = [tier.strip().lower() for tier in args.tiers.split(",") if tier.strip()]
+    unknown = [tier for tier in args.tiers if tier not in TIERS]
+    if unknown:
+        parser.error(f"unknown tiers: {', '.join(unknown)}")
+
+    results = asyncio.run(run(args))
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    print(f"\nresults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: team KPI computation, per-rep scalar loop vs vectorized batch
+
+Builds a random rep x month revenue/target matrix and computes YoY, YTD,
+target achievement and quarterly revenue for every rep, once by calling
+the scalar compute_kpis() per rep (the calculate_kpi_node path) and once
+with batch_kpis() over the whole matrix. Checks both agree.
+
+Usage:
+    python backend/benchmarks/bench_batch_kpis.py [--reps 1000] [--months 36] [--repeat 5]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import numpy as np
+
+from backend.app.analytics import batch_kpis, kpi_records, month_range
+from backend.app.db.analytics import compute_kpis
+
+
+def scalar_loop(revenue: np.ndarray, target: np.ndarray, months: list, period: dict) -> list:
+    """One compute_kpis call per rep over a month -> totals dict"""
+    results = []
+    for rep in range(revenue.shape[0]):
+        monthly = {
+            month: {"revenue": float(revenue[rep, i]), "quantity": 0, "target": float(target[rep, i])}
+            for i, month in enumerate(months)
+        }
+        results.append(compute_kpis(monthly, period))
+    return results
+
+
+def time_it(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reps", type=int, default=1000)
+    parser.add_argument("--months", type=int, default=36)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    months = month_range("202301", "209912")[:args.months]
+    revenue = rng.gamma(2.0, 5_000_000, size=(args.reps, args.months)).round(2)
+    target = np.full_like(revenue, 10_000_000.0)
+
+    # Last twelve months, so the previous-year window is inside the matrix
+    period = {"start": months[-12], "end": months[-1]}
+
+    scalar = scalar_loop(revenue, target, months, period)
+    batch = kpi_records(list(range(args.reps)), batch_kpis(revenue, target, months, period))
+    for expected, actual in zip(scalar, batch):
+        assert abs(expected["yoy_growth"] - actual["yoy_growth"]) < 0.011
+        assert abs(expected["ytd_achievement"] - actual["ytd_achievement"]) < 0.011
+        assert abs(expected["metrics"]["current_revenue"] - actual["metrics"]["current_revenue"]) < 1e-3 * max(1.0, expected["metrics"]["current_revenue"])
+
+    scalar_ms = time_it(lambda: scalar_loop(revenue, target, months, period), args.repeat)
+    kernel_ms = time_it(lambda: batch_kpis(revenue, target, months, period), args.repeat)
+    records_ms = time_it(lambda: kpi_records(list(range(args.reps)), batch_kpis(revenue, target, months, period)), args.repeat)
+
+    print(f"{args.reps} reps x {args.months} months, period {period['start']}-{period['end']}")
+    print(f"{'scalar compute_kpis loop':<28} {scalar_ms:10.2f}ms")
+    print(f"{'batch_kpis (arrays)':<28} {kernel_ms:10.2f}ms  ({scalar_ms / kernel_ms:.0f}x)")
+    print(f"{'batch_kpis + kpi_records':<28} {records_ms:10.2f}ms  ({scalar_ms / records_ms:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: node cache key computation cost against state size
+
+Compares the previous key functions (rebuild a dict, json.dumps with
+sort_keys and MD5 it on every lookup) with the memoized field fingerprints
+used by the cache policies now. Each round simulates the lookups made
+between node writes: the state objects stay the same, so fingerprints are
+served from the memo after the first computation.
+
+Usage:
+    python backend/benchmarks/bench_cache_keys.py [--clients 100 1000 10000] [--lookups 200]
+"""
+import argparse
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from backend.app.graphs.cache_policies import NODE_CACHE_POLICIES
+from backend.app.graphs.fingerprint import get_fingerprinter
+
+
+def previous_targeting_key(state: dict) -> str:
+    """Key function of TargetingCachePolicy before fingerprinting"""
+    cache_data = {
+        "user_id": state.get("user_id"),
+        "analysis": state.get("analysis", {}).get("kpi_summary", {}),
+        "strategy_type": state.get("context", {}).get("strategy_type", "standard")
+    }
+    cache_str = json.dumps(cache_data, sort_keys=True)
+    return f"targeting_{hashlib.md5(cache_str.encode()).hexdigest()}"
+
+
+def previous_analytics_key(state: dict) -> str:
+    """Key function of AnalyticsCachePolicy before fingerprinting"""
+    cache_data = {
+        "user_id": state.get("user_id"),
+        "product_codes": sorted(state.get("product_codes", [])),
+        "period": state.get("period"),
+        "aggregation": state.get("context", {}).get("aggregation", "monthly")
+    }
+    cache_str = json.dumps(cache_data, sort_keys=True)
+    return f"analytics_{hashlib.md5(cache_str.encode()).hexdigest()}"
+
+
+def build_state(clients: int) -> dict:
+    """WorkflowState-like state with a KPI summary covering n clients"""
+    return {
+        "user_id": 42,
+        "query": "quarterly review",
+        "product_codes": [f"P{i:04d}" for i in range(50, 0, -1)],
+        "client_ids": list(range(clients)),
+        "period": {"start": "202401", "end": "202412"},
+        "context": {"aggregation": "monthly", "strategy_type": "standard"},
+        "analysis": {
+            "kpi_summary": {
+                f"client_{i}": {"revenue": i * 1000.0, "growth": i % 17 / 10, "visits": i % 9}
+                for i in range(clients)
+            }
+        }
+    }
+
+
+def time_per_call(func, state: dict, lookups: int) -> float:
+    start = time.perf_counter()
+    for _ in range(lookups):
+        func(state)
+    return (time.perf_counter() - start) / lookups * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    targeting = NODE_CACHE_POLICIES["target_clients"]
+    analytics = NODE_CACHE_POLICIES["analyze_sales"]
+
+    print(f"{'clients':>8} {'policy':<10} {'previous':>12} {'first':>12} {'memoized':>12}")
+    for clients in args.clients:
+        state = build_state(clients)
+        for label, previous, policy in (
+            ("targeting", previous_targeting_key, targeting),
+            ("analytics", previous_analytics_key, analytics)
+        ):
+            get_fingerprinter().clear()
+            first_start = time.perf_counter()
+            policy.key_func(state)
+            first = (time.perf_counter() - first_start) * 1e6
+
+            print(
+                f"{clients:>8} {label:<10} "
+                f"{time_per_call(previous, state, args.lookups):>10.1f}us "
+                f"{first:>10.1f}us "
+                f"{time_per_call(policy.key_func, state, args.lookups):>10.1f}us"
+            )
+
+    print(f"fingerprint memo: {get_fingerprinter().stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: checkpoint size and write latency, full vs delta checkpoints
+
+Runs a ten-step graph over a WorkflowState-like state carrying large
+dicts, once with the plain AsyncSqliteSaver and once with
+DeltaCheckpointSaver, and reports database size and time per run.
+
+Usage:
+    python backend/benchmarks/bench_checkpoints.py [--threads 20] [--rows 2000]
+"""
+import argparse
+import asyncio
+import operator
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Annotated, Any, Dict, List, TypedDict
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.graph import StateGraph, START, END
+
+from backend.app.graphs.checkpointer import DeltaCheckpointSaver
+
+STEPS = ["analysis", "targeting", "policy_context", "strategy", "schedule", "client_intel",
+         "draft_doc", "compliance_result", "artifacts", "metadata"]
+
+
+class BenchState(TypedDict):
+    analysis: Dict[str, Any]
+    targeting: Dict[str, Any]
+    policy_context: Dict[str, Any]
+    strategy: Dict[str, Any]
+    schedule: Dict[str, Any]
+    client_intel: Dict[str, Any]
+    draft_doc: Dict[str, Any]
+    compliance_result: Dict[str, Any]
+    artifacts: Dict[str, Any]
+    metadata: Dict[str, Any]
+    messages: Annotated[List[Dict[str, Any]], operator.add]
+
+
+def build_graph(rows: int) -> StateGraph:
+    """Sequential graph where each node writes one large field"""
+    graph = StateGraph(BenchState)
+
+    def make_node(field: str):
+        async def node(state: BenchState) -> Dict[str, Any]:
+            payload = {
+                "rows": [
+                    {"client_id": i, "revenue": i * 1000.0, "label": f"{field}-{i}"}
+                    for i in range(rows)
+                ]
+            }
+            return {field: payload, "messages": [{"role": "assistant", "content": f"{field} done"}]}
+        return node
+
+    previous = START
+    for field in STEPS:
+        graph.add_node(f"step_{field}", make_node(field))
+        graph.add_edge(previous, f"step_{field}")
+        previous = f"step_{field}"
+    graph.add_edge(previous, END)
+    return graph
+
+
+async def run(label: str, saver_cls, db_path: str, threads: int, rows: int) -> None:
+    async with saver_cls.from_conn_string(db_path) as saver:
+        compiled = build_graph(rows).compile(checkpointer=saver)
+
+        start = time.perf_counter()
+        for i in range(threads):
+            config = {"configurable": {"thread_id": f"bench-{i}"}}
+            await compiled.ainvoke({"messages": []}, config)
+        elapsed = time.perf_counter() - start
+
+        # Read back the final state to include reconstruction cost
+        read_start = time.perf_counter()
+        for i in range(threads):
+            await compiled.aget_state({"configurable": {"thread_id": f"bench-{i}"}})
+        read_elapsed = time.perf_counter() - read_start
+
+    size_mb = os.path.getsize(db_path) / (1024 * 1024)
+    print(
+        f"{label:<24} db={size_mb:8.2f}MB  write={elapsed / threads * 1000:8.2f}ms/run  "
+        f"read={read_elapsed / threads * 1000:6.2f}ms/state"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        await run("AsyncSqliteSaver", AsyncSqliteSaver, f"{tmp_dir}/full.db", args.threads, args.rows)
+        await run("DeltaCheckpointSaver", DeltaCheckpointSaver, f"{tmp_dir}/delta.db", args.threads, args.rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
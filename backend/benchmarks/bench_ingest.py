@@ -0,0 +1,112 @@
+"""
+Benchmark: streaming sales import
+
+Writes a synthetic sales CSV (distinct rep x client x product x month
+cells, client and product codes, rep emails for a share of the rows) into a
+temporary SQLite database, imports it with import_sales_file and imports it
+again, so the second run measures the upsert path over existing cells.
+Checks row counts and that the rollup matches the sales table.
+
+Usage:
+    python backend/benchmarks/bench_ingest.py [--rows 1000000] [--batch-size 20000]
+"""
+import argparse
+import asyncio
+import csv
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+WORK_DIR = Path(tempfile.mkdtemp())
+DB_PATH = WORK_DIR / "bench_ingest.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+
+from backend.app.db.database import AsyncSessionLocal, engine, init_db
+from backend.app.db.ingest import import_sales_file
+
+
+def populate(connection: sqlite3.Connection, reps: int, clients: int, products: int) -> None:
+    rng = random.Random(7)
+    connection.executemany(
+        "INSERT INTO users (id, email, hashed_password, role, is_active) VALUES (?, ?, 'x', 'rep', 1)",
+        [(i, f"rep{i}@example.com") for i in range(1, reps + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO clients (id, code, name, type, owner_user_id) VALUES (?, ?, ?, ?, ?)",
+        [(i, f"C{i:06d}", f"Client {i}", rng.choice(["hospital", "clinic", "pharmacy"]), (i - 1) % reps + 1)
+         for i in range(1, clients + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO products (id, code, name, is_active) VALUES (?, ?, ?, 1)",
+        [(i, f"PROD{i:03d}", f"Product {i}") for i in range(1, products + 1)]
+    )
+    connection.commit()
+
+
+def write_csv(path: Path, rows: int, reps: int, clients: int, products: int) -> None:
+    """Distinct cells: each client buys a run of products every month, walking back from 2025-12"""
+    rng = random.Random(42)
+    months = [f"{year}-{month:02d}" for year in range(2025, 2015, -1) for month in range(12, 0, -1)]
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["client_code", "product_code", "yyyymm", "quantity", "revenue", "target", "rep_email"])
+        written = 0
+        for month in months:
+            for client in range(1, clients + 1):
+                for product in range(1, products + 1):
+                    if written == rows:
+                        return
+                    # A quarter of the rows name the rep; the rest use the client's owner
+                    rep = f"rep{(client - 1) % reps + 1}@example.com" if client % 4 == 0 else ""
+                    writer.writerow([
+                        f"C{client:06d}", f"PROD{product:03d}", month, rng.randint(1, 50),
+                        f"{rng.uniform(1e4, 5e6):,.2f}", "1000000", rep
+                    ])
+                    written += 1
+
+
+async def run(args) -> None:
+    await init_db()
+    connection = sqlite3.connect(DB_PATH)
+    populate(connection, args.reps, args.clients, args.products)
+
+    csv_path = WORK_DIR / "sales.csv"
+    start = time.perf_counter()
+    write_csv(csv_path, args.rows, args.reps, args.clients, args.products)
+    print(f"wrote {args.rows} rows ({csv_path.stat().st_size / 1e6:.0f} MB) in {time.perf_counter() - start:.1f}s")
+
+    for label in ("insert", "upsert again"):
+        async with AsyncSessionLocal() as session:
+            report = await import_sales_file(session, str(csv_path), args.batch_size)
+        assert report["imported"] == args.rows and not report["rejected"], report["errors"]
+        print(
+            f"{label:<13} {report['seconds']:7.1f}s total, {report['load_seconds']:7.1f}s load "
+            f"({report['rows_per_second']:,} rows/s), {report['batches']} batches, "
+            f"{report['lookup_queries']} lookup queries, {report['rollup_cells']} rollup cells"
+        )
+
+    sales = connection.execute("SELECT count(*), sum(revenue) FROM sales").fetchone()
+    rollup = connection.execute("SELECT sum(row_count), sum(revenue) FROM sales_monthly_rollup").fetchone()
+    assert sales[0] == args.rows == rollup[0] and abs(sales[1] - rollup[1]) < 1e-3 * sales[1], (sales, rollup)
+    connection.close()
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--reps", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=5_000)
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=20_000)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: lookalike client search
+
+Fills a temporary SQLite database with db.synthetic and times on the
+lookalike index:
+    build       - full index build (three grouped queries + vectors)
+    query       - k nearest clients of one client (index only)
+    lookup      - find_lookalikes for one client (index query + names)
+    batch       - k nearest clients of --batch clients in one query
+    refresh     - incremental refresh after --dirty clients changed
+plus a brute-force check of the batch results.
+
+Usage:
+    python backend/benchmarks/bench_lookalike.py [--clients 100000] [--sales 1000000] [--k 10] [--repeat 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+DB_PATH = Path(tempfile.mkdtemp()) / "bench_lookalike.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+
+import numpy as np
+
+from backend.app.analytics.lookalike import find_lookalikes, get_lookalike_cache
+from backend.app.db.database import AsyncSessionLocal, engine, init_db
+from backend.app.db.synthetic import generate_synthetic_data
+
+
+def median_ms(timings: list) -> float:
+    return statistics.median(timings) * 1000
+
+
+async def run(args) -> None:
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        data = await generate_synthetic_data(session, args.sales, clients=args.clients, seed=args.seed)
+    print(f"generated {data['clients']:,} clients, {data['sales']:,} sales rows, {data['visits']:,} visits in {data['seconds']:.1f}s")
+
+    cache = get_lookalike_cache()
+    timings = []
+    for _ in range(args.repeat):
+        cache.clear()
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as session:
+            index = await cache.get(session)
+        timings.append(time.perf_counter() - started)
+    print(f"index: {len(index):,} clients x {index.vectors.shape[1]} features ({index.vectors.nbytes / 2 ** 20:.1f} MiB)")
+    print(f"  build    {median_ms(timings):10.2f}ms")
+
+    rng = np.random.default_rng(args.seed)
+    rows = rng.integers(0, len(index), max(args.repeat, args.batch))
+
+    timings = []
+    for row in rows[:args.repeat]:
+        started = time.perf_counter()
+        index.query(np.array([row]), args.k)
+        timings.append(time.perf_counter() - started)
+    print(f"  query    {median_ms(timings):10.2f}ms")
+
+    timings = []
+    for row in rows[:args.repeat]:
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as session:
+            await find_lookalikes(session, [int(index.client_ids[row])], args.k)
+        timings.append(time.perf_counter() - started)
+    print(f"  lookup   {median_ms(timings):10.2f}ms")
+
+    batch = rows[:args.batch]
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        neighbours, _ = index.query(batch, args.k)
+        timings.append(time.perf_counter() - started)
+    print(f"  batch    {median_ms(timings):10.2f}ms for {len(batch)} clients")
+
+    # Brute force over the full distance matrix of the batch
+    vectors = index.vectors.astype(np.float64)
+    exact = 0
+    for i, row in enumerate(batch[:20].tolist()):
+        distance = ((vectors - vectors[row]) ** 2).sum(axis=1)
+        distance[row] = np.inf
+        expected = np.lexsort((index.client_ids, distance))[:args.k]
+        exact += np.allclose(distance[expected], distance[neighbours[i]], atol=1e-5)
+    print(f"  exact    {exact}/{min(20, len(batch))} queries match brute force")
+
+    timings = []
+    for _ in range(args.repeat):
+        dirty = rng.choice(index.client_ids, args.dirty, replace=False).tolist()
+        cache.invalidate([{"source": "visits", "client": client_id} for client_id in dirty])
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as session:
+            await cache.get(session)
+        timings.append(time.perf_counter() - started)
+    print(f"  refresh  {median_ms(timings):10.2f}ms for {args.dirty} changed clients ({cache.stats()['refreshes']} refreshes)")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100_000)
+    parser.add_argument("--sales", type=int, default=1_000_000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--dirty", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: message channel cost over long-running threads
+
+Simulates a thread of N node steps. The previous pattern has every node
+return state["messages"] + [new_msg] through the add_messages reducer; the
+current pattern returns only [new_msg] through append_messages. Reports
+total and last-step time per history length so growth can be compared.
+
+Usage:
+    python backend/benchmarks/bench_message_history.py [--lengths 500 1000 2000 4000 8000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langgraph.graph import add_messages
+
+from backend.app.graphs.state import append_messages, make_message
+
+
+def run_previous(steps: int) -> tuple:
+    """Nodes copy the whole history and add_messages re-merges it"""
+    history = add_messages([], [{"role": "user", "content": "start"}])
+    last = 0.0
+    start = time.perf_counter()
+    for i in range(steps):
+        step_start = time.perf_counter()
+        update = history + [{"role": "assistant", "content": f"step {i}"}]
+        history = add_messages(history, update)
+        last = time.perf_counter() - step_start
+    return time.perf_counter() - start, last
+
+
+def run_current(steps: int) -> tuple:
+    """Nodes emit only their new message"""
+    history = append_messages([], [make_message("user", "start")])
+    last = 0.0
+    start = time.perf_counter()
+    for i in range(steps):
+        step_start = time.perf_counter()
+        history = append_messages(history, [make_message("assistant", f"step {i}")])
+        last = time.perf_counter() - step_start
+    return time.perf_counter() - start, last
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[500, 1000, 2000, 4000, 8000])
+    args = parser.parse_args()
+
+    print(f"{'steps':>8} {'previous total':>16} {'previous last':>15} {'current total':>15} {'current last':>14}")
+    for steps in args.lengths:
+        prev_total, prev_last = run_previous(steps)
+        cur_total, cur_last = run_current(steps)
+        print(
+            f"{steps:>8} {prev_total * 1000:>14.1f}ms {prev_last * 1e6:>13.1f}us "
+            f"{cur_total * 1000:>13.1f}ms {cur_last * 1e6:>12.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
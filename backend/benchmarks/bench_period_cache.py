@@ -0,0 +1,186 @@
+"""
+Benchmark: overlapping period ranges with the monthly partial cache
+
+Builds a synthetic SQLite database and runs analyze_sales_node followed by
+calculate_kpi_node for a sequence of overlapping periods
+(202401-202412, 202401-202411, 202402-202412, ...) three ways:
+    sql   - the SQL path (aggregate_sales, trend series and KPIs from the rollup)
+    cold  - monthly partials with the cache cleared before every request
+    warm  - monthly partials with the cache kept between requests
+and prints the median time per request and the months read from the rollup.
+
+Usage:
+    python backend/benchmarks/bench_period_cache.py [--sales 500000] [--reps 20] [--repeat 3]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+DB_PATH = Path(tempfile.mkdtemp()) / "bench_period_cache.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+
+from sqlalchemy import func, select
+
+from backend.app.analytics import pivot_monthly, summarize_trends, trailing_months
+from backend.app.analytics.partials import get_partial_cache, kpi_months
+from backend.app.core.config import settings
+from backend.app.db.analytics import aggregate_sales, client_product_monthly_sales, compute_kpis, money
+from backend.app.db.database import AsyncSessionLocal, engine, init_db
+from backend.app.db.models import SalesMonthlyRollup
+from backend.app.db.rollup import rebuild_sales_rollup
+from backend.app.graphs.nodes.analyzer import analyze_sales_node, calculate_kpi_node
+
+PERIODS = [
+    ("202401", "202412"),
+    ("202401", "202411"),
+    ("202402", "202412"),
+    ("202403", "202412"),
+    ("202401", "202406"),
+    ("202407", "202412"),
+    ("202312", "202411")
+]
+
+
+def populate(connection: sqlite3.Connection, sales: int, reps: int, clients: int, products: int) -> None:
+    rng = random.Random(42)
+    connection.executemany(
+        "INSERT INTO users (id, email, hashed_password, role, is_active) VALUES (?, ?, 'x', 'rep', 1)",
+        [(i, f"rep{i}@example.com") for i in range(1, reps + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO clients (id, name, type, owner_user_id) VALUES (?, ?, ?, ?)",
+        [(i, f"Client {i}", rng.choice(["hospital", "clinic", "pharmacy"]), rng.randint(1, reps)) for i in range(1, clients + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO products (id, code, name, is_active) VALUES (?, ?, ?, 1)",
+        [(i, f"PROD{i:03d}", f"Product {i}") for i in range(1, products + 1)]
+    )
+    months = [f"{year}{month:02d}" for year in (2021, 2022, 2023, 2024) for month in range(1, 13)]
+    connection.executemany(
+        "INSERT OR IGNORE INTO sales (client_id, product_id, rep_user_id, yyyymm, period, quantity, revenue, target) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (rng.randint(1, clients), rng.randint(1, products), rng.randint(1, reps), month, int(month),
+             rng.randint(1, 50), round(rng.uniform(1e4, 5e6), 2), 1e6)
+            for month in (rng.choice(months) for _ in range(sales))
+        )
+    )
+    connection.commit()
+
+
+async def kpis_from_rollup(session, rep_user_id: int, period: dict) -> dict:
+    """KPIs from one grouped query per request over the rollup, as calculate_kpi_node did before partials"""
+    months = kpi_months(period)
+    rows = await session.execute(
+        select(
+            SalesMonthlyRollup.period,
+            func.sum(SalesMonthlyRollup.revenue),
+            func.sum(SalesMonthlyRollup.quantity),
+            func.sum(SalesMonthlyRollup.target)
+        )
+        .where(
+            SalesMonthlyRollup.rep_user_id == rep_user_id,
+            SalesMonthlyRollup.period.between(int(months[0]), int(months[-1]))
+        )
+        .group_by(SalesMonthlyRollup.period)
+    )
+    totals = {
+        f"{month:06d}": {"revenue": money(revenue), "quantity": int(quantity or 0), "target": money(target)}
+        for month, revenue, quantity, target in rows
+    }
+    return compute_kpis(totals, period)
+
+
+async def sql_request(rep_user_id: int, period: dict) -> None:
+    """The work both nodes did on the SQL path, before partials"""
+    months = trailing_months(period["end"], settings.ANALYTICS_TREND_MONTHS)
+    async with AsyncSessionLocal() as session:
+        await aggregate_sales(session, rep_user_id, period, limit=settings.ANALYTICS_BREAKDOWN_LIMIT)
+        rows = await client_product_monthly_sales(session, rep_user_id, months[0], months[-1])
+        await kpis_from_rollup(session, rep_user_id, period)
+    keys, revenue, _ = pivot_monthly(rows, months)
+    summarize_trends(
+        [{"client_id": client_id, "product_code": code} for client_id, code, _ in keys],
+        [client_type for _, _, client_type in keys],
+        revenue,
+        months
+    )
+
+
+async def node_request(rep_user_id: int, period: dict) -> None:
+    state = {"user_id": rep_user_id, "period": period, "messages": [], "errors": []}
+    result = await analyze_sales_node(state)
+    assert "analysis" in result, result.get("errors")
+    await calculate_kpi_node(state)
+
+
+async def run_mode(mode: str, rep_user_id: int, repeat: int) -> list:
+    cache = get_partial_cache()
+    timings = {period: [] for period in PERIODS}
+    fetched = {period: 0 for period in PERIODS}
+    for _ in range(repeat):
+        cache.clear()
+        for start, end in PERIODS:
+            period = {"start": start, "end": end}
+            if mode == "cold":
+                cache.clear()
+            misses = cache.misses
+            began = time.perf_counter()
+            if mode == "sql":
+                await sql_request(rep_user_id, period)
+            else:
+                await node_request(rep_user_id, period)
+            timings[(start, end)].append(time.perf_counter() - began)
+            # Distinct months read from the rollup by the last repetition
+            fetched[(start, end)] = cache.misses - misses
+    return [(period, statistics.median(timings[period]) * 1000, fetched[period]) for period in PERIODS]
+
+
+async def run(args) -> None:
+    await init_db()
+    connection = sqlite3.connect(DB_PATH)
+    populate(connection, args.sales, args.reps, args.clients, args.products)
+    connection.execute("ANALYZE")
+    connection.close()
+    async with AsyncSessionLocal() as session:
+        await rebuild_sales_rollup(session)
+        await session.commit()
+
+    print(f"{args.sales} sales rows, {args.reps} reps, {args.clients} clients ({DB_PATH})")
+    results = {mode: await run_mode(mode, 1, args.repeat) for mode in ("sql", "cold", "warm")}
+
+    print(f"\n{'period':<15} {'sql':>10} {'cold':>10} {'warm':>10} {'months read (warm)':>20}")
+    for i, (period, _, _) in enumerate(results["sql"]):
+        sql_ms, cold_ms, (_, warm_ms, fetched) = results["sql"][i][1], results["cold"][i][1], results["warm"][i]
+        print(f"{period[0]}-{period[1]}  {sql_ms:8.1f}ms {cold_ms:8.1f}ms {warm_ms:8.1f}ms {fetched:>20}")
+
+    totals = {mode: sum(ms for _, ms, _ in rows) for mode, rows in results.items()}
+    print(
+        f"\nsequence total: sql {totals['sql']:.1f}ms, cold {totals['cold']:.1f}ms, warm {totals['warm']:.1f}ms "
+        f"({totals['sql'] / totals['warm']:.1f}x vs sql)"
+    )
+    print(f"cache: {get_partial_cache().stats()}")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sales", type=int, default=500_000)
+    parser.add_argument("--reps", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=5_000)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Benchmark: analytics query plans, single-column vs composite covering indexes
+
+Builds a synthetic SQLite database, captures the SQL the analytics
+functions issue (aggregate_sales, load_partials for the KPI months,
+team_monthly_sales)
+and, for the previous single-column indexes and for the composite indexes
+declared on the models, prints EXPLAIN QUERY PLAN and the median runtime of
+each statement.
+
+Usage:
+    python backend/benchmarks/bench_query_plans.py [--sales 300000] [--reps 50] [--repeat 5]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+DB_PATH = Path(tempfile.mkdtemp()) / "bench_query_plans.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+
+from sqlalchemy import event
+
+from backend.app.analytics.partials import kpi_months, load_partials
+from backend.app.db.analytics import aggregate_sales, team_monthly_sales
+from backend.app.db.database import AsyncSessionLocal, engine, init_db
+from backend.app.db.rollup import rebuild_sales_rollup
+
+# Single-column indexes the tables had before the integer period key
+LEGACY_INDEXES = {
+    "sales": [("idx_sales_rep", "rep_user_id"), ("idx_sales_period", "period"), ("idx_sales_client", "client_id"), ("idx_sales_product", "product_id")],
+    "sales_monthly_rollup": [("idx_rollup_rep_period", "rep_user_id, period"), ("idx_rollup_period", "period")],
+}
+
+
+def populate(connection: sqlite3.Connection, sales: int, reps: int, clients: int, products: int) -> None:
+    rng = random.Random(42)
+    connection.executemany(
+        "INSERT INTO users (id, email, hashed_password, role, is_active) VALUES (?, ?, 'x', 'rep', 1)",
+        [(i, f"rep{i}@example.com") for i in range(1, reps + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO clients (id, name, type, owner_user_id) VALUES (?, ?, ?, ?)",
+        [(i, f"Client {i}", rng.choice(["hospital", "clinic", "pharmacy"]), rng.randint(1, reps)) for i in range(1, clients + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO products (id, code, name, is_active) VALUES (?, ?, ?, 1)",
+        [(i, f"PROD{i:03d}", f"Product {i}") for i in range(1, products + 1)]
+    )
+    months = [f"{year}{month:02d}" for year in (2022, 2023, 2024) for month in range(1, 13)]
+    connection.executemany(
+        "INSERT OR IGNORE INTO sales (client_id, product_id, rep_user_id, yyyymm, period, quantity, revenue, target) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (rng.randint(1, clients), rng.randint(1, products), rng.randint(1, reps), month, int(month),
+             rng.randint(1, 50), round(rng.uniform(1e4, 5e6), 2), 1e6)
+            for month in (rng.choice(months) for _ in range(sales))
+        )
+    )
+    connection.commit()
+
+
+async def capture_statements(rep_user_id: int) -> dict:
+    """Run the analytics functions once and record the SQL they execute"""
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    period = {"start": "202401", "end": "202412"}
+    statements = {}
+    async with AsyncSessionLocal() as session:
+        for label, call in (
+            ("aggregate_sales", lambda: aggregate_sales(session, rep_user_id, period, limit=20)),
+            ("load_partials", lambda: load_partials(session, rep_user_id, kpi_months(period))),
+            ("team_monthly_sales", lambda: team_monthly_sales(session, "202301", "202412"))
+        ):
+            captured.clear()
+            await call()
+            statements[label] = captured[-1]
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+    return statements
+
+
+def use_indexes(connection: sqlite3.Connection, legacy: bool, model_indexes: dict) -> None:
+    for table, indexes in model_indexes.items():
+        for name, _ in indexes + LEGACY_INDEXES[table]:
+            connection.execute(f"DROP INDEX IF EXISTS {name}")
+        if legacy:
+            for name, columns in LEGACY_INDEXES[table]:
+                connection.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+        else:
+            for _, sql in indexes:
+                connection.execute(sql)
+    connection.execute("ANALYZE")
+    connection.commit()
+
+
+def time_it(connection: sqlite3.Connection, statement: str, parameters, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        connection.execute(statement, parameters).fetchall()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+async def prepare(args) -> dict:
+    await init_db()
+    connection = sqlite3.connect(DB_PATH)
+    populate(connection, args.sales, args.reps, args.clients, args.products)
+    connection.close()
+
+    async with AsyncSessionLocal() as session:
+        await rebuild_sales_rollup(session)
+        await session.commit()
+
+    statements = await capture_statements(rep_user_id=1)
+    await engine.dispose()
+    return statements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sales", type=int, default=300_000)
+    parser.add_argument("--reps", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=5_000)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    statements = asyncio.run(prepare(args))
+
+    connection = sqlite3.connect(DB_PATH)
+    model_indexes = {
+        table: [
+            (name, sql)
+            for name, sql in connection.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+            )
+        ]
+        for table in LEGACY_INDEXES
+    }
+
+    print(f"{args.sales} sales rows, {args.reps} reps, {args.clients} clients ({DB_PATH})")
+    results = {}
+    for legacy in (True, False):
+        use_indexes(connection, legacy, model_indexes)
+        label = "single-column indexes" if legacy else "composite covering indexes"
+        print(f"\n=== {label}")
+        for name, (statement, parameters) in statements.items():
+            plan = connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            ms = time_it(connection, statement, parameters, args.repeat)
+            results.setdefault(name, []).append(ms)
+            rows = len(connection.execute(statement, parameters).fetchall())
+            print(f"\n{name}: {ms:.2f}ms, {rows} rows")
+            for row in plan:
+                print(f"    {row[-1]}")
+
+    print("\n=== summary")
+    for name, (legacy_ms, composite_ms) in results.items():
+        print(f"{name:<22} {legacy_ms:9.2f}ms -> {composite_ms:9.2f}ms  ({legacy_ms / composite_ms:.1f}x)")
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
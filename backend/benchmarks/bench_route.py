@@ -0,0 +1,154 @@
+"""
+Benchmark: daily visit routes
+
+1. optimize_route alone on random points around a city: time and length
+   against the given order and a single nearest neighbour path, and
+   against the optimum (all permutations) for small days.
+2. Territory distance matrices in a temporary SQLite database
+   (db.synthetic, --clients clients over --reps reps): cold build per rep
+   and a cache hit.
+3. route_proposals for a rep's --days days of --per-day visits each, with
+   the SCHEDULE_ROUTE_BUDGET_MS budget.
+
+Usage:
+    python backend/benchmarks/bench_route.py [--clients 20000] [--reps 20] [--per-day 8] [--days 10] [--repeat 5]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+DB_PATH = Path(tempfile.mkdtemp()) / "bench_route.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+
+import numpy as np
+from sqlalchemy import select
+
+from backend.app.core.config import settings
+from backend.app.db.database import AsyncSessionLocal, engine, init_db
+from backend.app.db.models import Client
+from backend.app.db.synthetic import generate_synthetic_data
+from backend.app.scheduling import get_territory_cache, haversine_matrix, optimize_route, route_proposals
+from backend.app.scheduling.routes import nearest_neighbour, path_length
+
+
+def median_ms(timings: list) -> float:
+    return statistics.median(timings) * 1000
+
+
+def optimum(distance: np.ndarray) -> float:
+    """Reference: shortest open path over all permutations"""
+    return min(path_length(distance, order) for order in itertools.permutations(range(len(distance))))
+
+
+def bench_optimizer(repeat: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    budget = settings.SCHEDULE_ROUTE_BUDGET_MS / 1000
+    print(f"optimize_route, random points within ~15 km ({settings.SCHEDULE_ROUTE_BUDGET_MS}ms budget)")
+    for count in (3, 5, 8, 15, 30, 100, 300):
+        timings, given, greedy, routed, optimal = [], [], [], [], []
+        for _ in range(repeat):
+            points = rng.normal([37.5665, 126.9780], 0.07, (count, 2))
+            distance = haversine_matrix(points[:, 0], points[:, 1])
+            started = time.perf_counter()
+            order = optimize_route(distance, started + budget)
+            timings.append(time.perf_counter() - started)
+            assert sorted(order.tolist()) == list(range(count))
+            given.append(path_length(distance, np.arange(count)))
+            greedy.append(path_length(distance, nearest_neighbour(distance, 0)))
+            routed.append(path_length(distance, order))
+            if count <= 8:
+                optimal.append(optimum(distance))
+        line = (
+            f"  {count:>4} stops: {median_ms(timings):8.2f}ms, {np.mean(routed):7.1f} km "
+            f"(given order {np.mean(given):7.1f}, nearest neighbour {np.mean(greedy):7.1f}"
+        )
+        if optimal:
+            line += f", optimum {np.mean(optimal):6.1f}, {sum(r <= o + 1e-3 for r, o in zip(routed, optimal))}/{repeat} optimal"
+        print(line + ")")
+
+
+async def bench_territories(args) -> None:
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        data = await generate_synthetic_data(session, 10_000, reps=args.reps, clients=args.clients, seed=args.seed)
+    first_rep = data["first_rep_id"]
+    rep_ids = list(range(first_rep, first_rep + args.reps))
+    print(f"\nterritories, {data['clients']:,} clients over {args.reps} reps")
+
+    cache = get_territory_cache()
+    cache.clear()
+    timings = []
+    for rep_id in rep_ids:
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as session:
+            territory = await cache.get(session, rep_id)
+        timings.append(time.perf_counter() - started)
+    print(f"  cold     {median_ms(timings):8.2f}ms per rep ({len(territory):,} clients, {territory.cells * 4 / 2 ** 20:.1f} MiB)")
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as session:
+            await cache.get(session, first_rep)
+        timings.append(time.perf_counter() - started)
+    stats = cache.stats()
+    print(f"  cached   {median_ms(timings):8.2f}ms ({stats['entries']} territories, {stats['cells']:,} cells held, {stats['evictions']} evictions)")
+
+    rng = np.random.default_rng(args.seed)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(Client.id, Client.name).where(Client.owner_user_id == first_rep))
+        clients = result.all()
+    first_day = datetime(2025, 1, 6, 9)
+    timings, saved = [], []
+    for _ in range(args.repeat):
+        picked = rng.choice(len(clients), args.days * args.per_day, replace=False)
+        proposals = []
+        for i, row in enumerate(picked.tolist()):
+            starts_at = first_day + timedelta(days=i // args.per_day, minutes=75 * (i % args.per_day))
+            proposals.append({
+                "client_id": clients[row][0],
+                "client_name": clients[row][1],
+                "proposed_date": starts_at.date().isoformat(),
+                "time_slot": f"{starts_at:%H:%M}-{starts_at + timedelta(hours=1):%H:%M}",
+                "starts_at": starts_at.isoformat(),
+                "ends_at": (starts_at + timedelta(hours=1)).isoformat()
+            })
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as session:
+            route = await route_proposals(session, first_rep, proposals)
+        timings.append(time.perf_counter() - started)
+        saved.append((route["baseline_km"], route["travel_km"]))
+    baseline, travel = np.mean(saved, axis=0)
+    print(
+        f"\nroute_proposals, {args.days} days x {args.per_day} visits: {median_ms(timings):8.2f}ms, "
+        f"{travel:.1f} km against {baseline:.1f} km in proposed order ({1 - travel / baseline:.1%} saved)"
+    )
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20_000)
+    parser.add_argument("--reps", type=int, default=20)
+    parser.add_argument("--per-day", type=int, default=8)
+    parser.add_argument("--days", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    bench_optimizer(args.repeat, args.seed)
+    asyncio.run(bench_territories(args))
+
+
+if __name__ == "__main__":
+    main()
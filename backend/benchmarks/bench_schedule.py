@@ -0,0 +1,126 @@
+"""
+Benchmark: schedule proposals on busy calendars
+
+1. BusyIntervals alone: build time and first_free latency for calendars of
+   1k to 1M random events, against a linear scan over the sorted events.
+2. plan_visits end to end for a rep with --events calendar events in a
+   temporary SQLite database (db.synthetic, one rep), proposing slots for
+   5 and 50 clients over two working weeks.
+
+Usage:
+    python backend/benchmarks/bench_schedule.py [--events 1500] [--repeat 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+DB_PATH = Path(tempfile.mkdtemp()) / "bench_schedule.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+
+import numpy as np
+
+from backend.app.db.database import AsyncSessionLocal, engine, init_db
+from backend.app.db.synthetic import generate_synthetic_data
+from backend.app.scheduling import BusyIntervals, plan_visits
+
+QUERIES = 2_000
+DATE_RANGE = {"start": "2025-01-06", "end": "2025-01-17"}
+
+
+def median_ms(timings: list) -> float:
+    return statistics.median(timings) * 1000
+
+
+def linear_first_free(starts: list, ends: list, window_start: int, window_end: int, duration: int):
+    """Reference: walk the events sorted by start"""
+    candidate = window_start
+    for start, end in zip(starts, ends):
+        if end <= candidate:
+            continue
+        if start >= candidate + duration:
+            break
+        candidate = max(candidate, end)
+    return candidate if candidate + duration <= window_end else None
+
+
+def bench_index(repeat: int) -> None:
+    rng = np.random.default_rng(0)
+    print("interval index, first_free on random calendars (minutes)")
+    for count in (1_000, 10_000, 100_000, 1_000_000):
+        span = count * 60
+        starts = rng.integers(0, span, count)
+        ends = starts + rng.choice([30, 60, 90], count)
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            index = BusyIntervals.from_intervals(starts, ends)
+            timings.append(time.perf_counter() - started)
+        build = median_ms(timings)
+
+        windows = rng.integers(0, span, QUERIES)
+        durations = rng.choice([30, 60, 120], QUERIES)
+        started = time.perf_counter()
+        found = [index.first_free(int(w), int(w) + 600, int(d)) for w, d in zip(windows, durations)]
+        query_us = (time.perf_counter() - started) / QUERIES * 1e6
+
+        order = np.argsort(starts)
+        sorted_starts, sorted_ends = starts[order].tolist(), ends[order].tolist()
+        sample = min(QUERIES, 200 if count >= 100_000 else QUERIES)
+        started = time.perf_counter()
+        expected = [linear_first_free(sorted_starts, sorted_ends, int(w), int(w) + 600, int(d)) for w, d in zip(windows[:sample], durations[:sample])]
+        linear_us = (time.perf_counter() - started) / sample * 1e6
+        assert found[:sample] == expected
+
+        print(f"  {count:>9,} events: build {build:8.2f}ms, merged {len(index):>9,}, query {query_us:7.2f}us, linear scan {linear_us:10.2f}us")
+
+
+async def bench_plan(args) -> None:
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        data = await generate_synthetic_data(
+            session, 10_000, reps=1, clients=200, events=args.events, end="202412", seed=args.seed
+        )
+    rep_user_id = data["first_rep_id"]
+    clients = [{"id": i, "name": f"Client {i}", "priority": "high"} for i in range(1, 51)]
+    print(f"\nplan_visits, rep with {data['events']:,} events (2024-12 to 2025-03), {DATE_RANGE['start']} to {DATE_RANGE['end']}")
+
+    for count, preferred in ((5, None), (50, None), (50, ["morning", "evening"])):
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            async with AsyncSessionLocal() as session:
+                plan = await plan_visits(
+                    session, rep_user_id, clients[:count], DATE_RANGE,
+                    preferred_times=preferred, now=datetime(2025, 1, 1)
+                )
+            timings.append(time.perf_counter() - started)
+        print(
+            f"  {count:>3} clients, {','.join(preferred or ['workday']):<16} {median_ms(timings):8.2f}ms: "
+            f"{len(plan['proposed_slots'])} slots, {len(plan['existing_events'])} events read, {len(plan['conflicts'])} conflicts"
+        )
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1_500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    bench_index(args.repeat)
+    asyncio.run(bench_plan(args))
+
+
+if __name__ == "__main__":
+    main()
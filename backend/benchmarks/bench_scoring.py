@@ -0,0 +1,122 @@
+"""
+Benchmark: vectorized client scoring for targeting_node
+
+Fills a temporary SQLite database with db.synthetic, with one rep owning
+every client, then times for that rep:
+    load   - load_client_features (three grouped queries)
+    score  - feature matrix, weighted scores, priority buckets and top-k
+    node   - targeting_node end to end
+plus the scoring pass alone on random features of the same size, and a
+check that tied scores (clients without sales or visits) are not ranked up.
+
+Usage:
+    python backend/benchmarks/bench_scoring.py [--clients 50000] [--sales 1000000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+DB_PATH = Path(tempfile.mkdtemp()) / "bench_scoring.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+
+import numpy as np
+
+from backend.app.analytics.scoring import load_client_features, top_targets
+from backend.app.core.config import settings
+from backend.app.db.database import AsyncSessionLocal, engine, init_db
+from backend.app.db.synthetic import generate_synthetic_data
+from backend.app.graphs.nodes.targeter import targeting_node
+
+PERIOD = {"start": "202401", "end": "202412"}
+
+
+def median_ms(timings: list) -> float:
+    return statistics.median(timings) * 1000
+
+
+def random_features(clients: int) -> dict:
+    rng = np.random.default_rng(0)
+    revenue = rng.lognormal(16, 1.5, clients) * (rng.random(clients) < 0.9)
+    return {
+        "client_id": np.arange(1, clients + 1),
+        "name": [f"Client {i}" for i in range(1, clients + 1)],
+        "tier": rng.choice([0.0, 1 / 3, 2 / 3, 1.0], clients),
+        "tier_name": [None] * clients,
+        "revenue": revenue,
+        "previous_revenue": revenue * rng.uniform(0.5, 1.5, clients) * (rng.random(clients) < 0.8),
+        "active_months": rng.integers(0, 13, clients).astype(np.float64),
+        "window_months": 12,
+        "days_since_visit": np.where(rng.random(clients) < 0.7, rng.integers(0, 400, clients), np.nan)
+    }
+
+
+def check_ties() -> None:
+    """A new rep's clients all score the same: none is high priority, none is new business"""
+    features = random_features(3)
+    features["revenue"] = features["previous_revenue"] = np.zeros(3)
+    features["active_months"] = features["tier"] = np.zeros(3)
+    features["days_since_visit"] = np.full(3, np.nan)
+    targets = top_targets(features, 3)
+    assert len({target["score"] for target in targets}) == 1
+    assert all(target["priority"] == "low" for target in targets), targets
+    assert all(target["reason"].startswith("No purchases this period") for target in targets), targets
+
+
+async def run(args) -> None:
+    check_ties()
+    features = random_features(args.clients)
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        top_targets(features, settings.TARGETING_TOP_K)
+        timings.append(time.perf_counter() - started)
+    print(f"score only, {args.clients:,} random clients: {median_ms(timings):8.2f}ms")
+
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        data = await generate_synthetic_data(session, args.sales, reps=1, clients=args.clients, seed=args.seed)
+    rep_user_id = data["first_rep_id"]
+    print(f"generated {data['sales']:,} sales rows, {data['visits']:,} visits in {data['seconds']:.1f}s")
+
+    load, score, node = [], [], []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as session:
+            features = await load_client_features(session, rep_user_id, PERIOD)
+        loaded = time.perf_counter()
+        targets = top_targets(features, settings.TARGETING_TOP_K)
+        scored = time.perf_counter()
+        result = await targeting_node({"user_id": rep_user_id, "period": PERIOD, "messages": []})
+        node.append(time.perf_counter() - scored)
+        load.append(loaded - started)
+        score.append(scored - loaded)
+
+    assert [c["id"] for c in result["targeting"]["top_clients"]] == [c["id"] for c in targets]
+    print(f"rep {rep_user_id}: {len(features['client_id']):,} clients scored")
+    print(f"  load   {median_ms(load):8.2f}ms")
+    print(f"  score  {median_ms(score):8.2f}ms")
+    print(f"  node   {median_ms(node):8.2f}ms")
+    for client in targets[:3]:
+        print(f"  {client['id']:>7} {client['score']:5.1f} {client['priority']:<6} {client['reason']}")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50_000)
+    parser.add_argument("--sales", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: client ranking, full sort vs streaming top-k
+
+Ranks random per-client revenue rows by revenue (ties by client id) four
+ways: sorted() over all rows, the bounded-heap TopK fed from a row
+iterator, and for arrays np.argsort vs top_k_indices (argpartition).
+Checks that all four return the same clients.
+
+Usage:
+    python backend/benchmarks/bench_topk.py [--clients 100000] [--k 20] [--repeat 5]
+"""
+import argparse
+import statistics
+import sys
+import time
+from operator import itemgetter
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import numpy as np
+
+from backend.app.analytics import TopK, top_k_indices
+
+
+def rows(ids: np.ndarray, revenue: np.ndarray):
+    """Row iterator, as the node gets them from the database"""
+    for client_id, value in zip(ids.tolist(), revenue.tolist()):
+        yield {"client_id": client_id, "revenue": value}
+
+
+def full_sort(ids: np.ndarray, revenue: np.ndarray, k: int) -> list:
+    ranked = sorted(rows(ids, revenue), key=lambda row: (-row["revenue"], row["client_id"]))
+    return [row["client_id"] for row in ranked[:k]]
+
+
+def heap_top_k(ids: np.ndarray, revenue: np.ndarray, k: int) -> list:
+    ranking = TopK(k, key=itemgetter("revenue"), tie_break=itemgetter("client_id"))
+    ranking.extend(rows(ids, revenue))
+    return [row["client_id"] for row in ranking.result()]
+
+
+def array_sort(ids: np.ndarray, revenue: np.ndarray, k: int) -> list:
+    return ids[np.lexsort((ids, -revenue))[:k]].tolist()
+
+
+def array_top_k(ids: np.ndarray, revenue: np.ndarray, k: int) -> list:
+    return ids[top_k_indices(revenue, k, tie_break=ids)].tolist()
+
+
+def time_it(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100_000)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    ids = rng.permutation(args.clients) + 1
+    # Rounded to 10k KRW so there are ties to break
+    revenue = (rng.lognormal(16, 1.2, args.clients) // 10_000 * 10_000).astype(float)
+
+    expected = full_sort(ids, revenue, args.k)
+    for func in (heap_top_k, array_sort, array_top_k):
+        assert func(ids, revenue, args.k) == expected, func.__name__
+
+    # Cost of producing the rows alone, shared by both iterator variants
+    iterate_ms = time_it(lambda: sum(1 for _ in rows(ids, revenue)), args.repeat)
+
+    print(f"{args.clients} clients, k={args.k} (row iteration alone: {iterate_ms:.2f}ms)")
+    baseline = {}
+    for label, func, base in (
+        ("sorted() over rows", full_sort, None),
+        ("TopK heap over rows", heap_top_k, "sorted() over rows"),
+        ("np.lexsort", array_sort, None),
+        ("top_k_indices", array_top_k, "np.lexsort")
+    ):
+        ms = time_it(lambda: func(ids, revenue, args.k), args.repeat)
+        baseline[label] = ms
+        speedup = f"  ({baseline[base] / ms:.1f}x)" if base else ""
+        print(f"{label:<24} {ms:10.2f}ms{speedup}")
+
+
+if __name__ == "__main__":
+    main()
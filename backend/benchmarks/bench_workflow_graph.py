@@ -0,0 +1,86 @@
+"""
+Benchmark: per-request workflow graph overhead
+
+Compares compiling the graph and opening a fresh SQLite checkpointer on
+every request (previous behaviour of get_workflow_graph) with reusing the
+process-wide compiled graph and checkpointer.
+
+Usage:
+    python backend/benchmarks/bench_workflow_graph.py [--requests 200]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from backend.app.core.config import settings
+from backend.app.graphs.main_graph import (
+    compile_graph_with_features,
+    init_workflow_graph,
+    close_workflow_graph,
+    get_workflow_graph
+)
+
+
+async def per_request_compile(checkpoint_path: str) -> None:
+    """Previous behaviour: build, compile and open a checkpointer per request"""
+    async with AsyncSqliteSaver.from_conn_string(checkpoint_path) as checkpointer:
+        await checkpointer.setup()
+        await compile_graph_with_features(checkpointer)
+
+
+async def measure(label: str, func, requests: int) -> dict:
+    """Time func over a number of simulated requests"""
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    result = {
+        "label": label,
+        "requests": requests,
+        "mean_ms": statistics.mean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[int(len(timings) * 0.95) - 1]
+    }
+    print(
+        f"{label:<28} mean={result['mean_ms']:.3f}ms "
+        f"p50={result['p50_ms']:.3f}ms p95={result['p95_ms']:.3f}ms"
+    )
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        settings.LANGGRAPH_CHECKPOINT_DIR = tmp_dir
+        checkpoint_path = str(Path(tmp_dir) / "workflow.db")
+
+        before = await measure(
+            "compile per request",
+            lambda: per_request_compile(checkpoint_path),
+            args.requests
+        )
+
+        await init_workflow_graph()
+        after = await measure("process-wide graph", get_workflow_graph, args.requests)
+        await close_workflow_graph()
+
+    print(f"\nPer-request overhead: {before['mean_ms']:.3f}ms -> {after['mean_ms']:.3f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())